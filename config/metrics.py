@@ -0,0 +1,68 @@
+import time
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+# Metrics of the request being handled, set by RequestMetricsMiddleware on
+# sampled requests only.
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Timings collected for one request.
+
+    Instances are installed as a `connection.execute_wrapper`, so every
+    query run while handling the request is counted and timed.
+
+    :ivar queries: Number of SQL statements executed.
+    :type queries: int
+    :ivar sql_ms: Time spent executing them.
+    :type sql_ms: float
+    :ivar template_ms: Time spent rendering templates, including the
+        queries run while rendering.
+    :type template_ms: float
+    """
+
+    __slots__ = ("queries", "sql_ms", "template_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing renders of sampled requests.
+
+    Only templates loaded through the backend are timed; their `extends`
+    and `include` are rendered inside them, so nothing is counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
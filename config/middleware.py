@@ -0,0 +1,121 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from config.metrics import RequestMetrics, current_metrics
+from config.routers import PIN_COOKIE, track_writes
+
+logger = logging.getLogger("config.metrics")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more queries than `QUERY_BUDGETS` allows."""
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures SQL, template and total time of a sample of requests.
+
+    A `REQUEST_METRICS_SAMPLE_RATE` fraction of requests have every query
+    counted and timed through `connection.execute_wrapper`; unsampled
+    requests pay for one `random.random()` call. Sampled responses get a
+    `Server-Timing` header, readable in the browser's network panel, and
+    one JSON log line on the `config.metrics` logger. Template time is
+    recorded by the `TimedDjangoTemplates` backend.
+
+    Views named in `QUERY_BUDGETS` (`{"app:url-name": max_queries}`) are
+    checked against their budget: with `QUERY_BUDGET_STRICT` an overrun
+    raises `QueryBudgetExceeded`, so tests fail on an N+1 regression,
+    otherwise it is logged as a warning. Queries run while a streaming
+    response is iterated happen after the middleware returns and are not
+    counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response["Server-Timing"] = ", ".join(
+            (
+                f'sql;dur={metrics.sql_ms:.1f};desc="{metrics.queries} queries"',
+                f"tpl;dur={metrics.template_ms:.1f}",
+                f"total;dur={total_ms:.1f}",
+            )
+        )
+        view = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(
+            json.dumps(
+                {
+                    "view": view,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "queries": metrics.queries,
+                    "sql_ms": round(metrics.sql_ms, 2),
+                    "template_ms": round(metrics.template_ms, 2),
+                    "total_ms": round(total_ms, 2),
+                }
+            )
+        )
+        self.check_budget(view, metrics.queries)
+        return response
+
+    @staticmethod
+    def check_budget(view, queries):
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or queries <= budget:
+            return
+        message = f"{view} ran {queries} queries, over its budget of {budget}."
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins a client to the primary database for a while after it writes.
+
+    When a request wrote anything, checkout or a review for instance, the
+    response sets `PIN_COOKIE` for `DATABASE_REPLICA_PIN_SECONDS`, and
+    `ReplicaReadMixin` keeps that client's reads on the primary meanwhile,
+    so it never sees a replica that has not caught up with its own write.
+    Does nothing without `DATABASE_REPLICAS`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        with track_writes() as writes:
+            response = self.get_response(request)
+        if writes:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,96 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+# Set on a client that wrote, so its reads stay on the primary until the
+# replicas have caught up with the write.
+PIN_COOKIE = "db_primary"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_request_writes = ContextVar("request_writes", default=None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let reads made inside the block go to `DATABASE_REPLICAS`."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def track_writes():
+    """
+    Record whether anything was written to the primary inside the block.
+
+    :return: A list that gets an item per routed write.
+    :rtype: list
+    """
+    writes = []
+    token = _request_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _request_writes.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random read replica where it is safe, all else to the
+    primary.
+
+    Reads only leave the primary inside `replica_reads()`, which views opt
+    into with `ReplicaReadMixin`. Inside a transaction, and for the rest of
+    the block once something was written, reads stay on the primary so a
+    view always sees its own writes. Replicas get their schema through
+    replication, so migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not _replica_reads.get()
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _replica_reads.set(False)
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model._meta.label)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """
+    Serves GET and HEAD requests of a read-only view from the replicas.
+
+    Clients carrying `PIN_COOKIE`, set by `ReplicaPinMiddleware` after they
+    wrote, keep reading from the primary. Template responses are rendered
+    inside the block, so the querysets they evaluate are routed too.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        enabled = request.method in ("GET", "HEAD") and PIN_COOKIE not in (
+            request.COOKIES
+        )
+        with replica_reads(enabled):
+            response = super().dispatch(request, *args, **kwargs)
+            if enabled and not getattr(response, "is_rendered", True):
+                response.render()
+        return response
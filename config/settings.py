@@ -6,8 +6,15 @@ load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
-DEBUG = True
-ALLOWED_HOSTS = ["0.0.0.0", "127.0.0.1", "localhost"]
+
+# DJANGO_PROFILE=production is the serving setup run under gunicorn behind
+# nginx (see compose.yaml): DEBUG off, static files served compressed from a
+# hashed manifest, media by the proxy and a cache shared by the workers.
+# Anything else is development.
+DJANGO_PROFILE = os.getenv("DJANGO_PROFILE", "development")
+PRODUCTION = DJANGO_PROFILE == "production"
+DEBUG = os.getenv("DJANGO_DEBUG", "0" if PRODUCTION else "1") == "1"
+ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "0.0.0.0,127.0.0.1,localhost").split(",")
 AUTH_USER_MODEL = "users.User"
 
 INSTALLED_APPS = [
@@ -25,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.middleware.RequestMetricsMiddleware",
+    "config.middleware.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -34,11 +43,53 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if PRODUCTION:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+        "whitenoise.middleware.WhiteNoiseMiddleware",
+    )
+
 ROOT_URLCONF = "config.urls"
 
+# Fraction of requests whose queries and timings RequestMetricsMiddleware
+# records, reports in a Server-Timing header and logs to "config.metrics".
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv("REQUEST_METRICS_SAMPLE_RATE", "1.0" if DEBUG else "0.05")
+)
+# Most queries a view may run, by URL name, on a cold cache and counting the
+# session and user lookups of a signed-in request. Overruns raise
+# QueryBudgetExceeded when strict (development and tests) and log otherwise.
+QUERY_BUDGETS = {
+    "products:product-list": 6,
+    "products:product-detail": 4,
+    "products:product-reviews": 5,
+    "api:product-list": 1,
+    "api:product-detail": 1,
+    "sitemap": 2,
+    "orders:cart": 3,
+    "orders:order-detail": 5,
+    "admin-dashboard": 6,
+}
+QUERY_BUDGET_STRICT = DEBUG
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "config.metrics": {
+            "handlers": ["console"],
+            "level": os.getenv("METRICS_LOG_LEVEL", "WARNING" if DEBUG else "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Without explicit loaders Django wraps the filesystem and app loaders in the
+# cached loader, so each worker compiles a template once.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "config.metrics.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -53,13 +104,93 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
-DATABASES = {
+# SQLite writers take the write lock when their transaction begins and
+# wait up to `timeout` seconds for it, so concurrent checkouts queue up
+# instead of failing with "database is locked". Tests run against a file,
+# not the shared in-memory database, for the same reason.
+SQLITE_DATABASE = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "db.sqlite3",
+    "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+    "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    # Under ASGI every request runs in its own thread, so connections
+    # kept past the request are never reused; keep this at 0 there and
+    # use the driver's connection pool instead.
+    "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "0")),
+    "CONN_HEALTH_CHECKS": True,
+}
+
+# DB_ENGINE=postgresql (set in compose.yaml) uses the POSTGRES_* variables.
+# Every process keeps a psycopg pool of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE
+# connections per alias, and requests borrow one instead of connecting;
+# size it so workers x max size stays under the server's max_connections.
+# Django requires CONN_MAX_AGE to be 0 with a pool.
+POSTGRES_DATABASE = {
+    "ENGINE": "django.db.backends.postgresql",
+    "NAME": os.getenv("POSTGRES_DB", "postgres"),
+    "USER": os.getenv("POSTGRES_USER", "postgres"),
+    "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+    "HOST": os.getenv("POSTGRES_HOST", "localhost"),
+    "PORT": os.getenv("POSTGRES_PORT", "5432"),
+    "CONN_MAX_AGE": 0,
+    "OPTIONS": {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    },
+}
+
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+PRIMARY_DATABASE = POSTGRES_DATABASE if DB_ENGINE == "postgresql" else SQLITE_DATABASE
+DATABASES = {"default": PRIMARY_DATABASE}
+
+# Read replicas, comma separated: host[:port] of Postgres standbys, or
+# database files with SQLite (the primary's own file works for trying the
+# routing out locally). Views using config.routers.ReplicaReadMixin read
+# from a random one; tests mirror them to the primary. A client that wrote
+# reads from the primary for DATABASE_REPLICA_PIN_SECONDS, longer than the
+# replicas' usual lag.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(","))
+):
+    alias = f"replica{number + 1}"
+    if DB_ENGINE == "postgresql":
+        host, _, port = location.partition(":")
+        replica = {**PRIMARY_DATABASE, "HOST": host, "PORT": port or "5432"}
+    else:
+        replica = {**PRIMARY_DATABASE, "NAME": location}
+    DATABASES[alias] = {**replica, "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["config.routers.ReplicaRouter"]
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+
+# Local memory by default so no Redis is needed; point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (and CACHE_LOCATION at
+# a directory) to share entries between worker processes.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "hop-and-barley"),
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
+# Console by default; set EMAIL_BACKEND (and the usual EMAIL_HOST/...
+# settings) to deliver order notifications for real.
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "shop@hopandbarley.local")
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -82,9 +213,26 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # In production `collectstatic` writes content-hashed, pre-compressed
+    # copies that WhiteNoise serves with far-future cache headers.
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if PRODUCTION
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        )
+    },
+}
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Whether Django serves MEDIA_URL itself, which is only fit for development;
+# in production the proxy serves the media volume.
+SERVE_MEDIA = os.getenv("SERVE_MEDIA", "1" if DEBUG else "0") == "1"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -95,8 +243,88 @@ LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/users/login/"
 
 PRODUCTS_QUERY_MAP = {
-    "rating": "-rating",
-    "price_asc": "price",
-    "price_desc": "-price",
+    "rating": "-rating_avg",
+    "price_asc": "price_base",
+    "price_desc": "-price_base",
     "new": "-created_at",
 }
+
+# Keyset pagination for the catalog; `?cursor=` opts in per request.
+PRODUCTS_CURSOR_PAGINATION = False
+
+# Catalog counts (paginator totals and sidebar category counts) are served
+# from the cache for CATALOG_FACETS_FRESH_SECONDS, then for up to
+# CATALOG_FACETS_STALE_SECONDS more while a background thread recounts.
+# On a cold cache, filters the planner estimates to match more than
+# PRODUCTS_APPROXIMATE_COUNT_THRESHOLD products are paginated with that
+# estimate instead of waiting for the count (PostgreSQL only).
+CATALOG_FACETS_FRESH_SECONDS = 30
+CATALOG_FACETS_STALE_SECONDS = 600
+CATALOG_FACETS_ASYNC = True
+PRODUCTS_APPROXIMATE_COUNT_THRESHOLD = 100000
+# Upper bounds of the price histogram buckets in the catalog sidebar; the
+# last bucket is open-ended.
+CATALOG_PRICE_BUCKETS = (5, 10, 20, 50, 100)
+
+# Catalog sorting, price filters and buckets compare prices converted to
+# BASE_CURRENCY at the stored exchange rates. Each process memoizes the
+# rates and checks the cache for a reload every
+# EXCHANGE_RATES_RECHECK_SECONDS.
+BASE_CURRENCY = "USD"
+EXCHANGE_RATES_RECHECK_SECONDS = 60
+
+# Seconds a slug redirect lookup, found or not, stays cached.
+SLUG_REDIRECT_CACHE_TIMEOUT = 86400
+
+# Reviews shown on the product page and per page of the full review list.
+PRODUCT_RECENT_REVIEWS = 3
+PRODUCT_REVIEWS_PER_PAGE = 10
+
+# Seconds the prebuilt category tree stays cached between invalidations,
+# and whether `categories=` filtering includes subcategories by default.
+CATEGORY_TREE_TIMEOUT = 300
+PRODUCTS_CATEGORY_DESCENDANTS = True
+
+# Seconds anonymous storefront pages and template fragments stay cached.
+STOREFRONT_PAGE_CACHE_TIMEOUT = 60
+STOREFRONT_FRAGMENT_CACHE_TIMEOUT = 600
+
+# Responsive derivatives built for product images and user avatars.
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024)
+IMAGE_DERIVATIVE_FORMATS = ("avif", "webp", "jpeg")
+IMAGE_DERIVATIVES_ASYNC = True
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Seconds cart lines hold product stock for the shopper (0 disables
+# reservations) and the largest quantity of one product per cart.
+CART_RESERVATION_SECONDS = 0
+CART_MAX_QUANTITY = 999
+
+# Staff addresses notified of new orders, and how the outbox worker retries
+# failed deliveries: exponential backoff from OUTBOX_BACKOFF_SECONDS up to
+# OUTBOX_BACKOFF_MAX_SECONDS, giving up after OUTBOX_MAX_ATTEMPTS. Claimed
+# messages are leased for OUTBOX_LEASE_SECONDS so a crashed worker's batch
+# is picked up again.
+ORDER_NOTIFICATION_EMAILS = [
+    address
+    for address in os.getenv(
+        "ORDER_NOTIFICATION_EMAILS", "orders@hopandbarley.local"
+    ).split(",")
+    if address
+]
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 300
+
+# Default and largest page size of the read-only catalog API.
+API_PAGE_SIZE = 24
+API_MAX_PAGE_SIZE = 100
+
+# Absolute URL prefix of links in pre-built feeds, where pre-built feeds are
+# written, and the id range covered by each sitemap/merchant feed section.
+# The sitemap protocol allows 50,000 URLs per file; smaller sections keep
+# each streamed response well under a second.
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
+FEEDS_ROOT = MEDIA_ROOT / "feeds"
+FEED_SECTION_SIZE = 10000
@@ -1,17 +1,58 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from config.settings import DEBUG, MEDIA_URL, MEDIA_ROOT
+from django.views.static import serve
+from config.settings import DEBUG
+from orders.views import SalesDashboardView
+from products.views import (
+    CategorySitemapView,
+    MerchantFeedView,
+    ProductSitemapView,
+    SitemapIndexView,
+)
 
 urlpatterns = [
+    path(
+        "admin/dashboard/",
+        admin.site.admin_view(SalesDashboardView.as_view()),
+        name="admin-dashboard",
+    ),
     path("admin/", admin.site.urls),
     path("users/", include("users.urls", namespace="users")),
     path("products/", include("products.urls", namespace="products")),
+    path("orders/", include("orders.urls", namespace="orders")),
+    path("api/", include("products.api.urls", namespace="api")),
+    path("sitemap.xml", SitemapIndexView.as_view(), name="sitemap"),
+    path(
+        "sitemap-categories.xml",
+        CategorySitemapView.as_view(),
+        name="sitemap-categories",
+    ),
+    path(
+        "sitemap-products-<int:section>.xml",
+        ProductSitemapView.as_view(),
+        name="sitemap-products",
+    ),
+    path(
+        "feeds/merchant-<int:section>.xml",
+        MerchantFeedView.as_view(),
+        name="merchant-feed",
+    ),
 ]
 
-# Serve media files during development
+
+def serve_media(request, path):
+    """Serve an uploaded file from `MEDIA_ROOT`, read per request."""
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+# Product images are uploaded at runtime, so unlike static files WhiteNoise
+# cannot serve them. Django only does in development; in production the
+# proxy of compose.yaml serves them from the media volume.
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media)
+    ]
+
 if DEBUG:
     import debug_toolbar
-
-    urlpatterns += static(MEDIA_URL, document_root=MEDIA_ROOT)
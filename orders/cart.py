@@ -0,0 +1,230 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from orders.models import StockReservation
+from products.models import Product
+
+CART_SESSION_KEY = "cart"
+CART_ID_SESSION_KEY = "cart_id"
+LINE_FIELDS = (
+    "id",
+    "name",
+    "slug",
+    "price",
+    "currency",
+    "unit_measure",
+    "stock",
+    "available",
+    "image",
+    "image_derivatives",
+)
+
+
+class InsufficientStock(Exception):
+    """Raised when a quantity can't be reserved for the shopper."""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(f"Only {available} of {product} left in stock.")
+
+
+class CartLine:
+    """
+    A resolved cart entry.
+
+    :ivar product: The product, loaded with `LINE_FIELDS` only.
+    :type product: Product
+    :ivar quantity: Requested quantity.
+    :type quantity: int
+    :ivar available: Units this shopper can still buy, after stock held by
+        other shoppers' reservations.
+    :type available: int
+    :ivar total: `price * quantity`.
+    :type total: decimal.Decimal
+    """
+
+    __slots__ = ("product", "quantity", "available", "total")
+
+    def __init__(self, product, quantity, available):
+        self.product = product
+        self.quantity = quantity
+        self.available = available
+        self.total = product.price * quantity
+
+    @property
+    def problem(self):
+        if not self.product.available:
+            return "This product is no longer available."
+        if self.quantity > self.available:
+            return f"Only {self.available} left in stock."
+        return None
+
+
+class Cart:
+    """
+    Shopping cart stored in the session as a compact `{product_id: qty}` map.
+
+    Lines are resolved with one `in_bulk` query over `Product` (plus one
+    grouped query over active reservations when they are enabled), so the
+    cost of rendering a cart doesn't depend on how many lines it holds.
+    Totals are computed in `Decimal` from the loaded prices.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.items = self.session.get(CART_SESSION_KEY, {})
+        self._lines = None
+
+    def __len__(self):
+        return sum(self.items.values())
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def quantity_of(self, product_id):
+        return self.items.get(str(product_id), 0)
+
+    def add(self, product, quantity=1, override=False):
+        """
+        Add `quantity` units of `product`, or set the quantity if `override`.
+
+        :raises InsufficientStock: If the product is unavailable or its stock
+            (less other shoppers' holds, when reservations are enabled)
+            can't cover the new quantity.
+        """
+        quantity = quantity if override else self.quantity_of(product.pk) + quantity
+        quantity = min(quantity, settings.CART_MAX_QUANTITY)
+        if quantity <= 0:
+            return self.remove(product.pk)
+        if settings.CART_RESERVATION_SECONDS:
+            reserve_stock(self.cart_id, product.pk, quantity)
+        elif not product.available or quantity > product.stock:
+            raise InsufficientStock(product, product.stock if product.available else 0)
+        self.items[str(product.pk)] = quantity
+        self.save()
+
+    def remove(self, product_id):
+        if self.items.pop(str(product_id), None) is not None:
+            if settings.CART_RESERVATION_SECONDS:
+                release_stock(self.cart_id, [product_id])
+            self.save()
+
+    def clear(self):
+        if settings.CART_RESERVATION_SECONDS and self.items:
+            release_stock(self.cart_id, [int(pk) for pk in self.items])
+        self.items = {}
+        self.save()
+
+    def save(self):
+        self.session[CART_SESSION_KEY] = self.items
+        self.session.modified = True
+        self._lines = None
+
+    @property
+    def cart_id(self):
+        """
+        Random id the cart's reservations are held under.
+
+        It lives in the session data rather than being the session key,
+        which `login()` cycles, so signing in keeps the shopper's holds.
+        """
+        cart_id = self.session.get(CART_ID_SESSION_KEY)
+        if cart_id is None:
+            cart_id = self.session[CART_ID_SESSION_KEY] = uuid.uuid4().hex
+        return cart_id
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self._resolve()
+        return self._lines
+
+    def _resolve(self):
+        ids = [int(pk) for pk in self.items]
+        products = Product.objects.only(*LINE_FIELDS).in_bulk(ids)
+        held = {}
+        if settings.CART_RESERVATION_SECONDS and ids:
+            held = reserved_by_others(self.cart_id, ids)
+        lines = []
+        for pk in ids:
+            product = products.get(pk)
+            if product is None:
+                continue
+            available = max(product.stock - held.get(pk, 0), 0)
+            lines.append(CartLine(product, self.items[str(pk)], available))
+        return lines
+
+    @property
+    def total(self):
+        return sum((line.total for line in self.lines), Decimal("0.00"))
+
+    @property
+    def is_valid(self):
+        return bool(self.lines) and not any(line.problem for line in self.lines)
+
+
+def reserved_by_others(cart_id, product_ids):
+    """Units of each product held by other carts' unexpired reservations."""
+    return dict(
+        StockReservation.objects.filter(
+            product_id__in=product_ids, expires_at__gt=timezone.now()
+        )
+        .exclude(cart_id=cart_id)
+        .order_by()
+        .values_list("product_id")
+        .annotate(held=models.Sum("quantity"))
+    )
+
+
+def reserve_stock(cart_id, product_id, quantity):
+    """
+    Hold `quantity` units of a product for `CART_RESERVATION_SECONDS`.
+
+    The product row is locked while the holds of other carts are summed, so
+    two shoppers can't both reserve the last units.
+
+    :raises InsufficientStock: If not enough unreserved stock is left.
+    """
+    with transaction.atomic():
+        product = (
+            Product.objects.select_for_update()
+            .only("id", "name", "stock", "available")
+            .get(pk=product_id)
+        )
+        held = reserved_by_others(cart_id, [product_id]).get(product_id, 0)
+        available = max(product.stock - held, 0) if product.available else 0
+        if quantity > available:
+            raise InsufficientStock(product, available)
+        StockReservation.objects.update_or_create(
+            product_id=product_id,
+            cart_id=cart_id,
+            defaults={
+                "quantity": quantity,
+                "expires_at": timezone.now()
+                + timedelta(seconds=settings.CART_RESERVATION_SECONDS),
+            },
+        )
+
+
+def release_stock(cart_id, product_ids=None):
+    reservations = StockReservation.objects.filter(cart_id=cart_id)
+    if product_ids is not None:
+        reservations = reservations.filter(product_id__in=product_ids)
+    reservations.delete()
+
+
+def purge_expired_reservations():
+    """Delete lapsed reservations; they no longer count against stock."""
+    deleted, _ = StockReservation.objects.filter(
+        expires_at__lte=timezone.now()
+    ).delete()
+    return deleted
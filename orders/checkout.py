@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+
+from orders.cart import release_stock, reserved_by_others
+from orders.models import Order, OrderItem
+from orders.outbox import enqueue_order_created
+from products.models import Product
+
+
+class CheckoutError(Exception):
+    """Raised when an order can't be placed."""
+
+
+class OutOfStock(CheckoutError):
+    """
+    Raised when some products can't cover the requested quantities.
+
+    :ivar shortages: Units still in stock, keyed by product id.
+    :type shortages: dict[int, int]
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(
+            "Not enough stock for products " + ", ".join(map(str, sorted(shortages)))
+        )
+
+
+def _ordered_quantity(quantities):
+    """`CASE` expression mapping each product row to a quantity of it."""
+    return models.Case(
+        *(
+            models.When(pk=pk, then=models.Value(quantity))
+            for pk, quantity in quantities.items()
+        ),
+        default=models.Value(0),
+        output_field=models.PositiveIntegerField(),
+    )
+
+
+def place_order(user, quantities, shipping_address, cart_id=None):
+    """
+    Turn `{product_id: quantity}` into a paid-for `Order` in one transaction.
+
+    The product rows are locked with `select_for_update` in primary key
+    order, so concurrent checkouts over overlapping carts queue up instead
+    of deadlocking. Stock is then decremented by a single conditional
+    `UPDATE` that only touches rows still holding enough units; if it
+    updates fewer rows than expected the whole transaction rolls back.
+    When cart reservations are enabled, units held by other carts don't
+    count as available, and the buyer's own holds are released with the
+    order.
+    Item prices are snapshotted from the locked rows and written with one
+    `bulk_create`, so checkout costs the same number of queries whatever
+    the size of the cart. Order notifications are queued in the same
+    transaction and sent later by the outbox worker.
+
+    :param user: The buyer.
+    :param quantities: Quantity ordered per product id.
+    :type quantities: dict[int, int]
+    :param shipping_address: Free-form delivery address.
+    :param cart_id: `Cart.cart_id` of the buyer's cart, whose reservations
+        the order consumes.
+    :raises OutOfStock: If a product is missing, unavailable or short.
+    :raises CheckoutError: If there is nothing to order.
+    :rtype: Order
+    """
+    quantities = {int(pk): qty for pk, qty in quantities.items() if qty > 0}
+    if not quantities:
+        raise CheckoutError("The cart is empty.")
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=quantities, available=True)
+            .only("id", "price", "stock")
+            .order_by("pk")
+        )
+        held = {}
+        if settings.CART_RESERVATION_SECONDS:
+            held = reserved_by_others(cart_id, list(quantities))
+        stock = {
+            product.pk: max(product.stock - held.get(product.pk, 0), 0)
+            for product in products
+        }
+        shortages = {
+            pk: stock.get(pk, 0)
+            for pk, qty in quantities.items()
+            if stock.get(pk, 0) < qty
+        }
+        if shortages:
+            raise OutOfStock(shortages)
+
+        ordered = _ordered_quantity(quantities)
+        required = _ordered_quantity(
+            {pk: qty + held.get(pk, 0) for pk, qty in quantities.items()}
+        )
+        updated = (
+            Product.objects.filter(pk__in=quantities, available=True)
+            .filter(stock__gte=required)
+            .update(stock=models.F("stock") - ordered)
+        )
+        if updated != len(quantities):
+            # Only reachable where row locks aren't enforced; the
+            # conditional update is what guarantees nothing is oversold.
+            raise OutOfStock(
+                dict(
+                    Product.objects.filter(pk__in=quantities).values_list("pk", "stock")
+                )
+            )
+
+        items = [
+            OrderItem(
+                product_id=product.pk,
+                price=product.price,
+                quantity=quantities[product.pk],
+            )
+            for product in products
+        ]
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(
+                (item.price * item.quantity for item in items), Decimal("0.00")
+            ),
+            shipping_address=shipping_address,
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        if settings.CART_RESERVATION_SECONDS and cart_id:
+            release_stock(cart_id, list(quantities))
+        enqueue_order_created(order)
+    return order
@@ -0,0 +1,28 @@
+from django import forms
+
+from config.settings import CART_MAX_QUANTITY
+
+
+class CartAddForm(forms.Form):
+    quantity = forms.IntegerField(min_value=0, max_value=CART_MAX_QUANTITY, initial=1)
+    override = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+
+class CheckoutForm(forms.Form):
+    PAYMENT_METHODS = (
+        ("debit", "Debit Card"),
+        ("wallet", "Digital Wallet"),
+        ("cod", "Cash On Delivery"),
+    )
+
+    full_name = forms.CharField(max_length=150)
+    phone = forms.CharField(max_length=32)
+    city = forms.CharField(max_length=100)
+    address = forms.CharField(max_length=300, widget=forms.Textarea)
+    payment_method = forms.ChoiceField(choices=PAYMENT_METHODS, initial="debit")
+
+    def shipping_address(self):
+        data = self.cleaned_data
+        return (
+            f"{data['full_name']}, {data['phone']}\n{data['address']}\n{data['city']}"
+        )
@@ -0,0 +1,152 @@
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from orders.rollups import DAY, SALE_STATUSES, TOP_PRODUCTS, dashboard_summary, day_of
+from products.benchmarks import measure, rolled_back
+from products.models import Category, Product
+
+
+def live_summary(days=7):
+    """The dashboard's headline numbers aggregated straight from the orders."""
+    end = day_of(timezone.now()) + DAY
+    start = end - days * DAY
+    orders = Order.objects.filter(
+        created_at__gte=start - days * DAY, created_at__lt=end
+    )
+    totals = list(
+        orders.annotate(day=TruncDay("created_at"))
+        .values("day", "status")
+        .annotate(orders=models.Count("id"), revenue=models.Sum("total_price"))
+    )
+    items = OrderItem.objects.filter(
+        order__created_at__gte=start,
+        order__created_at__lt=end,
+        order__status__in=SALE_STATUSES,
+    )
+    revenue = models.Sum(models.F("price") * models.F("quantity"))
+    top_products = list(
+        items.values("product_id", "product__name")
+        .annotate(units=models.Sum("quantity"), revenue=revenue)
+        .order_by("-revenue")[:TOP_PRODUCTS]
+    )
+    categories = list(
+        items.values("product__category_id", "product__category__name")
+        .annotate(units=models.Sum("quantity"), revenue=revenue)
+        .order_by("-revenue")
+    )
+    return totals, top_products, categories
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the admin dashboard read from rollups against the same numbers "
+        "aggregated live, as the order history grows at a steady number of "
+        "orders per day. Seeded data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--history",
+            default="30,180,720",
+            help="Comma separated history lengths, in days, to measure at.",
+        )
+        parser.add_argument("--orders-per-day", type=int, default=100)
+        parser.add_argument("--days", type=int, default=7, help="Dashboard window.")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        lengths = sorted(int(days) for days in options["history"].split(","))
+        rng = random.Random(options["seed"])
+        results = []
+        with rolled_back():
+            products = self.seed_products(rng)
+            user = get_user_model().objects.create(
+                email="bench-dashboard@example.com", image=""
+            )
+            seeded = 0
+            for length in lengths:
+                self.seed_orders(
+                    range(seeded, length),
+                    options["orders_per_day"],
+                    user,
+                    products,
+                    rng,
+                )
+                seeded = length
+                call_command("rollup_sales", all=True, stdout=StringIO())
+                days = options["days"]
+                row = {"history_days": length, "orders": Order.objects.count()}
+                row["rollups"] = measure(
+                    lambda: dashboard_summary(days), repeat=options["repeat"]
+                )
+                row["live"] = measure(
+                    lambda: live_summary(days), repeat=options["repeat"]
+                )
+                results.append(row)
+                if not options["json"]:
+                    self.stdout.write(
+                        f"{row['orders']:>8} orders  rollups p50={row['rollups']['p50']:.2f}ms "
+                        f"live p50={row['live']['p50']:.2f}ms"
+                    )
+        if options["json"]:
+            self.stdout.write(json.dumps({"days": options["days"], "results": results}))
+
+    @staticmethod
+    def seed_products(rng, count=200):
+        categories = Category.objects.bulk_create(
+            Category(name=f"Bench {n}", slug=f"bench-dashboard-{n}") for n in range(8)
+        )
+        return Product.objects.bulk_create(
+            Product(
+                name=f"Bench product {n}",
+                slug=f"bench-dashboard-{n}",
+                category=rng.choice(categories),
+                price=Decimal(rng.randint(100, 10000)) / 100,
+                stock=1000,
+            )
+            for n in range(count)
+        )
+
+    @staticmethod
+    def seed_orders(days_ago, per_day, user, products, rng):
+        """Place `per_day` orders on each of the days `days_ago` days back."""
+        statuses = [status for status, _ in Order.STATUSES]
+        now = timezone.now()
+        for day in days_ago:
+            orders = []
+            items = []
+            for _ in range(per_day):
+                lines = rng.sample(products, rng.randint(1, 4))
+                quantities = [rng.randint(1, 5) for _ in lines]
+                orders.append(
+                    Order(
+                        user=user,
+                        status=rng.choice(statuses),
+                        total_price=sum(p.price * q for p, q in zip(lines, quantities)),
+                        shipping_address="Bench",
+                    )
+                )
+                items.append(list(zip(lines, quantities)))
+            orders = Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, price=product.price, quantity=q)
+                for order, lines in zip(orders, items)
+                for product, q in lines
+            )
+            # `auto_now_add` ignores values passed to `bulk_create`.
+            Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+                created_at=now - timedelta(days=day, hours=rng.randint(0, 23))
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.cart import purge_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Delete cart stock reservations that have expired."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired reservations."))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from orders.models import Order
+from orders.rollups import DAY, HOUR, day_of, hour_of, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the sales rollups behind the admin dashboard. By default "
+        "only recent hours are reconciled; run with --all to backfill."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=48,
+            help="Recompute the last N hours (default: 48).",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Recompute the whole order history."
+        )
+
+    def handle(self, *args, **options):
+        end = hour_of(timezone.now()) + HOUR
+        if options["all"]:
+            bounds = Order.objects.aggregate(
+                first=Min("created_at"), last=Max("created_at")
+            )
+            if bounds["first"] is None:
+                self.stdout.write("No orders to roll up.")
+                return
+            start = day_of(bounds["first"])
+            end = max(end, hour_of(bounds["last"]) + HOUR)
+        else:
+            start = end - options["hours"] * HOUR
+
+        days = 0
+        # One day at a time keeps each transaction and grouped query small.
+        while start < end:
+            refresh_rollups(start, min(end, day_of(start) + DAY))
+            start = day_of(start) + DAY
+            days += 1
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} days of sales."))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import drain, outbox_lag
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued order emails, notifications and sales rollup "
+        "refreshes from the outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Threads delivering each batch; 1 delivers inline.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new messages instead of exiting once drained.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep between polls with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            counts = drain(batch_size=options["batch_size"], workers=options["workers"])
+            lag = outbox_lag()
+            if any(counts.values()) or not options["loop"]:
+                self.stdout.write(
+                    f"sent={counts['sent']} retrying={counts['pending']} "
+                    f"failed={counts['failed']} backlog={lag['pending']} "
+                    f"dead={lag['failed']} lag={lag['lag_seconds']}s"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+def drop_session_reservations(apps, schema_editor):
+    # Held under session keys no cart will ask for again; they would only
+    # block stock until they expire.
+    apps.get_model("orders", "StockReservation").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_session_reservations, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="stockreservation",
+            name="reservation_product_session_uniq",
+        ),
+        migrations.RenameField(
+            model_name="stockreservation",
+            old_name="session_key",
+            new_name="cart_id",
+        ),
+        migrations.AddConstraint(
+            model_name="stockreservation",
+            constraint=models.UniqueConstraint(
+                fields=("product", "cart_id"), name="reservation_product_cart_uniq"
+            ),
+        ),
+    ]
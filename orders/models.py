@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 from products.models import JournalizedModel
 
@@ -18,9 +19,224 @@ class Order(JournalizedModel):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = models.TextField(max_length=500)
 
+    class Meta(JournalizedModel.Meta):
+        indexes = [models.Index(fields=["created_at"], name="order_created_idx")]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey("products.Product", on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
+
+
+class StockReservation(models.Model):
+    """
+    Short-lived hold on product stock for one shopper's cart.
+
+    Reservations are keyed by the cart id kept in the session, so anonymous
+    carts can hold stock too and signing in doesn't orphan the holds. They
+    stop counting against availability once `expires_at` passes.
+
+    :ivar product: The product whose stock is held.
+    :type product: Product
+    :ivar cart_id: `Cart.cart_id` of the cart holding the stock.
+    :type cart_id: str
+    :ivar quantity: Units held.
+    :type quantity: int
+    :ivar expires_at: When the hold lapses.
+    :type expires_at: datetime
+    """
+
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="reservations"
+    )
+    cart_id = models.CharField(max_length=40)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "cart_id"],
+                name="reservation_product_cart_uniq",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["product", "expires_at"],
+                name="reservation_product_exp_idx",
+            ),
+            models.Index(fields=["expires_at"], name="reservation_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for {self.cart_id}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect (such as an email) recorded for delivery after commit.
+
+    Messages are written in the same transaction as the change that causes
+    them and delivered later by `manage.py run_outbox`, so a slow or failing
+    mail server never slows down or breaks the request that queued them.
+
+    :ivar kind: Name of the handler in `orders.outbox.HANDLERS`.
+    :type kind: str
+    :ivar idempotency_key: Unique key; queuing the same key twice is a no-op
+        and deliveries carry it so receivers can drop duplicates.
+    :type idempotency_key: str
+    :ivar payload: JSON arguments for the handler.
+    :type payload: dict
+    :ivar status: Delivery state.
+    :type status: str
+    :ivar attempts: Number of delivery attempts so far.
+    :type attempts: int
+    :ivar available_at: Earliest time the next attempt may be made.
+    :type available_at: datetime
+    :ivar sent_at: When delivery succeeded.
+    :type sent_at: datetime
+    :ivar last_error: Error raised by the last failed attempt.
+    :type last_error: str
+    """
+
+    STATUSES = (
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    )
+
+    kind = models.CharField(max_length=50)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                name="outbox_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.idempotency_key})"
+
+
+class SalesRollup(models.Model):
+    """
+    Orders placed in one hour or day, totalled per order status.
+
+    Rows are derived from `Order` by `orders.rollups`, never edited by
+    hand, so the admin dashboard reads a few rows per day instead of
+    scanning the order history.
+
+    :ivar period: `"hour"` or `"day"`.
+    :type period: str
+    :ivar bucket: Start of the hour or day.
+    :type bucket: datetime
+    :ivar status: Order status the totals are for.
+    :type status: str
+    :ivar orders: Number of orders.
+    :type orders: int
+    :ivar units: Units ordered.
+    :type units: int
+    :ivar revenue: Sum of the order totals.
+    :type revenue: Decimal
+    """
+
+    PERIODS = (("hour", "Hour"), ("day", "Day"))
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUSES)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "bucket", "status"], name="sales_rollup_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.status}"
+
+
+class RollupDay(models.Model):
+    """
+    One row per day whose rollups have been refreshed.
+
+    `orders.rollups.refresh_rollups` locks the rows of the days it rebuilds,
+    so refreshes of the same day take turns without locking any order.
+
+    :ivar day: Start of the day.
+    :type day: datetime
+    :ivar refreshed_at: When the day's rollups were last rebuilt.
+    :type refreshed_at: datetime
+    """
+
+    day = models.DateTimeField(unique=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d}"
+
+
+class ProductSalesRollup(models.Model):
+    """
+    Sales of one product in one hour or day, per order status.
+
+    The product's category is copied in so category totals are a single
+    grouped query over the rollups too.
+
+    :ivar period: `"hour"` or `"day"`.
+    :type period: str
+    :ivar bucket: Start of the hour or day.
+    :type bucket: datetime
+    :ivar status: Status of the orders the totals are for.
+    :type status: str
+    :ivar product: The product sold.
+    :type product: Product
+    :ivar category: Category of `product`.
+    :type category: Category
+    :ivar orders: Number of orders containing the product.
+    :type orders: int
+    :ivar units: Units sold.
+    :type units: int
+    :ivar revenue: Sum of `price * quantity` of the order items.
+    :type revenue: Decimal
+    """
+
+    period = models.CharField(max_length=4, choices=SalesRollup.PERIODS)
+    bucket = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUSES)
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="+"
+    )
+    category = models.ForeignKey(
+        "products.Category", on_delete=models.CASCADE, related_name="+"
+    )
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "bucket", "status", "product"],
+                name="product_sales_rollup_uniq",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.product_id}"
@@ -0,0 +1,224 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import close_old_connections, models, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from orders.models import Order, OutboxMessage
+from orders.rollups import day_of, refresh_day_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(messages):
+    """
+    Queue `(kind, idempotency_key, payload)` triples in one insert.
+
+    Call it inside the transaction that makes the change, so messages only
+    exist if the change commits. Keys that are already queued are skipped.
+    """
+    OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(kind=kind, idempotency_key=key, payload=payload)
+            for kind, key, payload in messages
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_order_created(order):
+    enqueue(
+        [
+            (
+                "order_created_customer",
+                f"order:{order.pk}:customer",
+                {"order": order.pk},
+            ),
+            ("order_created_staff", f"order:{order.pk}:staff", {"order": order.pk}),
+        ]
+    )
+
+
+def enqueue_rollup_refresh(moment):
+    """
+    Queue a refresh of the sales rollups of the day holding `moment`.
+
+    The day's key is shared while the message is pending, so the changes of
+    a busy day coalesce into one refresh; `refresh_rollups_day` frees it
+    before reading the orders, so later changes queue the next one.
+    """
+    day = day_of(moment).isoformat()
+    enqueue([("refresh_rollups", f"rollups:{day}", {"day": day})])
+
+
+def _order_email(message, recipients, template):
+    order = (
+        Order.objects.select_related("user")
+        .prefetch_related("items__product")
+        .get(pk=message.payload["order"])
+    )
+    recipients = recipients(order)
+    if not recipients:
+        return
+    context = {"order": order, "items": order.items.all()}
+    EmailMessage(
+        subject=f"Hop & Barley order #{order.pk}",
+        body=render_to_string(template, context),
+        to=recipients,
+        headers={
+            # A stable Message-ID lets mail servers drop the duplicate sent
+            # if a worker dies between sending and recording the delivery.
+            "Message-ID": f"<{message.idempotency_key}@hopandbarley>",
+            "X-Idempotency-Key": message.idempotency_key,
+        },
+    ).send()
+
+
+def send_order_created_customer(message):
+    _order_email(
+        message,
+        lambda order: [order.user.email] if order.user.email else [],
+        "orders/emails/order_created_customer.txt",
+    )
+
+
+def send_order_created_staff(message):
+    _order_email(
+        message,
+        lambda order: settings.ORDER_NOTIFICATION_EMAILS,
+        "orders/emails/order_created_staff.txt",
+    )
+
+
+def refresh_rollups_day(message):
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        idempotency_key=f"{message.idempotency_key}:{message.pk}"
+    )
+    refresh_day_rollups(datetime.fromisoformat(message.payload["day"]))
+
+
+HANDLERS = {
+    "order_created_customer": send_order_created_customer,
+    "order_created_staff": send_order_created_staff,
+    "refresh_rollups": refresh_rollups_day,
+}
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after `attempts` failed deliveries."""
+    return min(
+        settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.OUTBOX_BACKOFF_MAX_SECONDS,
+    )
+
+
+def claim_batch(size):
+    """
+    Lease up to `size` due messages to this worker.
+
+    Claimed messages have their attempt counted and `available_at` pushed
+    `OUTBOX_LEASE_SECONDS` ahead, so concurrent workers skip them and a
+    crashed worker's batch becomes due again once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", available_at__lte=now)
+            .order_by("available_at", "id")[:size]
+        )
+        if batch:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in batch]).update(
+                attempts=models.F("attempts") + 1,
+                available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+            )
+            for message in batch:
+                message.attempts += 1
+    return batch
+
+
+def deliver(message):
+    """
+    Run the handler of one claimed message and record the outcome.
+
+    :return: The message's new status.
+    :rtype: str
+    """
+    claimed = OutboxMessage.objects.filter(pk=message.pk, attempts=message.attempts)
+    try:
+        HANDLERS[message.kind](message)
+    except Exception as exc:
+        logger.exception("Outbox delivery of %s failed", message)
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            status, retry_at = "failed", timezone.now()
+        else:
+            status = "pending"
+            retry_at = timezone.now() + timedelta(seconds=backoff(message.attempts))
+        claimed.update(
+            status=status, available_at=retry_at, last_error=repr(exc)[:2000]
+        )
+        return status
+    claimed.update(status="sent", sent_at=timezone.now(), last_error="")
+    return "sent"
+
+
+def _deliver_in_worker(message):
+    close_old_connections()
+    try:
+        return deliver(message)
+    finally:
+        close_old_connections()
+
+
+def drain(batch_size=100, workers=4, max_batches=None):
+    """
+    Deliver due messages batch by batch until none are left.
+
+    With more than one worker each batch is delivered by a thread pool;
+    with one, inline on the calling thread.
+
+    :return: Number of messages per resulting status.
+    :rtype: dict[str, int]
+    """
+    counts = {"sent": 0, "pending": 0, "failed": 0}
+    batches = 0
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            if pool is None:
+                statuses = map(deliver, batch)
+            else:
+                statuses = pool.map(_deliver_in_worker, batch)
+            for status in statuses:
+                counts[status] += 1
+            batches += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+
+def outbox_lag():
+    """
+    Describe the backlog: pending and failed counts and the age in seconds
+    of the oldest message still waiting to be delivered.
+
+    :rtype: dict
+    """
+    stats = OutboxMessage.objects.filter(status__in=["pending", "failed"]).aggregate(
+        pending=models.Count("id", filter=models.Q(status="pending")),
+        failed=models.Count("id", filter=models.Q(status="failed")),
+        oldest=models.Min("created_at", filter=models.Q(status="pending")),
+    )
+    oldest = stats.pop("oldest")
+    stats["lag_seconds"] = (
+        round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0
+    )
+    return stats
@@ -0,0 +1,282 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from orders.models import (
+    Order,
+    OrderItem,
+    ProductSalesRollup,
+    RollupDay,
+    SalesRollup,
+)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+# Statuses whose orders count as sales; cancelled orders are only reported.
+SALE_STATUSES = ("pending", "paid", "shipped", "delivered")
+TOP_PRODUCTS = 10
+# Unique constraint of each rollup model, upserted on by `_rebuild`.
+ROLLUP_CONSTRAINTS = {
+    SalesRollup: "sales_rollup_uniq",
+    ProductSalesRollup: "product_sales_rollup_uniq",
+}
+
+
+def hour_of(moment):
+    """Start of the hour holding `moment`, in the current time zone."""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_of(moment):
+    """Start of the day holding `moment`, in the current time zone."""
+    return hour_of(moment).replace(hour=0)
+
+
+def _rebuild(model, period, rows, fields, delete):
+    delete.delete()
+    # An upsert, so a refresh racing this one on a backend that does not
+    # honour the row locks still cannot fail on the unique constraint.
+    (constraint,) = (
+        constraint
+        for constraint in model._meta.constraints
+        if constraint.name == ROLLUP_CONSTRAINTS[model]
+    )
+    unique_fields = constraint.fields
+    model.objects.bulk_create(
+        [
+            model(period=period, **{field: row[key] for field, key in fields.items()})
+            for row in rows
+        ],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=[
+            field for field in fields if field not in ("bucket", "status", "product_id")
+        ],
+    )
+
+
+def refresh_rollups(start, end):
+    """
+    Recompute the rollups of the hours in `[start, end)` from the orders.
+
+    Hour rows are rebuilt with two grouped queries over the orders placed
+    in the range, then the day rows of every day the range touches are
+    rebuilt from the hour rows, so the cost depends on the orders of the
+    range and never on the size of the order history. Rebuilding rather
+    than adding deltas keeps the rollups exact whatever happened to the
+    orders in between, including bulk `update()` calls that bypass signals.
+
+    Everything happens in one transaction that first locks the `RollupDay`
+    rows of the days touched, so concurrent refreshes of the same day run
+    one after the other and the last to commit has read the latest orders,
+    while the orders themselves stay unlocked.
+    """
+    start, end = hour_of(start), hour_of(end - timedelta.resolution) + HOUR
+    first_day, last_day = day_of(start), day_of(end - timedelta.resolution) + DAY
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end)
+    items = OrderItem.objects.filter(
+        order__created_at__gte=start, order__created_at__lt=end
+    )
+
+    with transaction.atomic():
+        _lock_days(first_day, last_day)
+        order_totals = (
+            orders.order_by()
+            .annotate(hour=Trunc("created_at", "hour"))
+            .values("hour", "status")
+            .annotate(orders=models.Count("id"), revenue=models.Sum("total_price"))
+        )
+        product_totals = list(
+            items.order_by()
+            .annotate(hour=Trunc("order__created_at", "hour"))
+            .values("hour", "order__status", "product_id", "product__category_id")
+            .annotate(
+                orders=models.Count("order_id", distinct=True),
+                units=models.Sum("quantity"),
+                revenue=models.Sum(models.F("price") * models.F("quantity")),
+            )
+        )
+        units = {}
+        for row in product_totals:
+            key = (row["hour"], row["order__status"])
+            units[key] = units.get(key, 0) + row["units"]
+
+        _rebuild(
+            SalesRollup,
+            "hour",
+            (
+                {**row, "units": units.get((row["hour"], row["status"]), 0)}
+                for row in order_totals
+            ),
+            {
+                "bucket": "hour",
+                "status": "status",
+                "orders": "orders",
+                "units": "units",
+                "revenue": "revenue",
+            },
+            SalesRollup.objects.filter(
+                period="hour", bucket__gte=start, bucket__lt=end
+            ),
+        )
+        _rebuild(
+            ProductSalesRollup,
+            "hour",
+            product_totals,
+            {
+                "bucket": "hour",
+                "status": "order__status",
+                "product_id": "product_id",
+                "category_id": "product__category_id",
+                "orders": "orders",
+                "units": "units",
+                "revenue": "revenue",
+            },
+            ProductSalesRollup.objects.filter(
+                period="hour", bucket__gte=start, bucket__lt=end
+            ),
+        )
+        _rebuild_days(SalesRollup, first_day, last_day, {"status": "status"})
+        _rebuild_days(
+            ProductSalesRollup,
+            first_day,
+            last_day,
+            {"status": "status", "product_id": "product", "category_id": "category"},
+        )
+
+
+def _lock_days(first_day, last_day):
+    """Lock the `RollupDay` rows of `[first_day, last_day)`, creating them."""
+    days = []
+    day = first_day
+    while day < last_day:
+        days.append(day)
+        day = day_of(day + DAY + HOUR)
+    RollupDay.objects.bulk_create(
+        [RollupDay(day=day) for day in days], ignore_conflicts=True
+    )
+    locked = RollupDay.objects.filter(day__in=days)
+    list(locked.select_for_update().order_by("day").values_list("pk", flat=True))
+    locked.update(refreshed_at=timezone.now())
+
+
+def _rebuild_days(model, first_day, last_day, keys):
+    """Rebuild day rows of `model` from its hour rows, grouped by `keys`."""
+    rows = (
+        model.objects.filter(period="hour", bucket__gte=first_day, bucket__lt=last_day)
+        .order_by()
+        .annotate(day=Trunc("bucket", "day"))
+        .values("day", *keys.values())
+        .annotate(
+            total_orders=models.Sum("orders"),
+            total_units=models.Sum("units"),
+            total_revenue=models.Sum("revenue"),
+        )
+    )
+    _rebuild(
+        model,
+        "day",
+        list(rows),
+        {
+            "bucket": "day",
+            "orders": "total_orders",
+            "units": "total_units",
+            "revenue": "total_revenue",
+            **keys,
+        },
+        model.objects.filter(period="day", bucket__gte=first_day, bucket__lt=last_day),
+    )
+
+
+def refresh_day_rollups(moment):
+    """Recompute the rollups of the day holding `moment`."""
+    day = day_of(moment)
+    refresh_rollups(day, day_of(day + DAY + HOUR))
+
+
+def _change(current, previous):
+    if not previous:
+        return None
+    return round(float((current - previous) / previous * 100), 1)
+
+
+def dashboard_summary(days=7, now=None):
+    """
+    Everything the admin dashboard shows, read from the rollups only.
+
+    Four queries over at most a few rows per day of the window: the day
+    totals of the window and of the one before it (for the changes shown
+    on the cards), the last 24 hour totals, the best selling products and
+    the revenue per category.
+
+    :param days: Length of the window, ending today.
+    :return: `totals` and `changes` per card, `by_status`, `daily`,
+        `hourly`, `top_products` and `categories`.
+    :rtype: dict
+    """
+    now = now or timezone.now()
+    end = day_of(now) + DAY
+    start = end - days * DAY
+    previous_start = start - days * DAY
+
+    current, previous = _empty_totals(), _empty_totals()
+    by_status = {status: 0 for status, _ in Order.STATUSES}
+    daily = {start + n * DAY: Decimal("0.00") for n in range(days)}
+    rows = SalesRollup.objects.filter(
+        period="day", bucket__gte=previous_start, bucket__lt=end
+    ).values_list("bucket", "status", "orders", "units", "revenue")
+    for bucket, status, orders, units, revenue in rows:
+        in_window = bucket >= start
+        totals = current if in_window else previous
+        if in_window:
+            by_status[status] += orders
+        if status == "pending":
+            totals["pending"] += orders
+        if status not in SALE_STATUSES:
+            continue
+        totals["orders"] += orders
+        totals["units"] += units
+        totals["revenue"] += revenue
+        if in_window:
+            daily[timezone.localtime(bucket)] += revenue
+
+    first_hour = hour_of(now) - 23 * HOUR
+    hourly = {first_hour + n * HOUR: Decimal("0.00") for n in range(24)}
+    for bucket, revenue in SalesRollup.objects.filter(
+        period="hour",
+        bucket__gte=first_hour,
+        bucket__lt=first_hour + 24 * HOUR,
+        status__in=SALE_STATUSES,
+    ).values_list("bucket", "revenue"):
+        hourly[timezone.localtime(bucket)] += revenue
+
+    sales = ProductSalesRollup.objects.filter(
+        period="day", bucket__gte=start, bucket__lt=end, status__in=SALE_STATUSES
+    ).order_by()
+    top_products = (
+        sales.values("product_id", "product__name")
+        .annotate(units=models.Sum("units"), revenue=models.Sum("revenue"))
+        .order_by("-revenue", "product_id")[:TOP_PRODUCTS]
+    )
+    categories = (
+        sales.values("category_id", "category__name")
+        .annotate(units=models.Sum("units"), revenue=models.Sum("revenue"))
+        .order_by("-revenue", "category_id")
+    )
+    return {
+        "days": days,
+        "totals": current,
+        "changes": {key: _change(current[key], previous[key]) for key in current},
+        "by_status": by_status,
+        "daily": list(daily.items()),
+        "hourly": list(hourly.items()),
+        "top_products": list(top_products),
+        "categories": list(categories),
+    }
+
+
+def _empty_totals():
+    return {"revenue": Decimal("0.00"), "orders": 0, "units": 0, "pending": 0}
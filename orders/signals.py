@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from orders.models import Order
+from orders.outbox import enqueue_rollup_refresh
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def refresh_sales_rollups(sender, instance, raw=False, **kwargs):
+    """
+    Queue a recompute of the rollups of the order's day.
+
+    The refresh is left to the outbox worker, so checkout only pays for one
+    insert, a no-op while the day already has a refresh queued, and the
+    worker runs once the order items, written after the order, are
+    committed. `manage.py rollup_sales` reconciles anything this misses.
+    """
+    if raw:
+        return
+    enqueue_rollup_refresh(instance.created_at)
@@ -1,3 +1,461 @@
-from django.test import TestCase
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.cart import CART_SESSION_KEY, Cart, InsufficientStock
+from orders.checkout import CheckoutError, OutOfStock, place_order
+from orders.models import (
+    Order,
+    OrderItem,
+    OutboxMessage,
+    ProductSalesRollup,
+    RollupDay,
+    SalesRollup,
+    StockReservation,
+)
+from orders.outbox import HANDLERS, drain, enqueue_order_created, outbox_lag
+from orders.rollups import dashboard_summary
+from products.benchmarks import percentile
+from products.models import Category, Product
+from products.tests import CatalogTestCase
+
+
+class CartTests(CatalogTestCase):
+    def make_cart(self, session=None):
+        request = RequestFactory().get("/")
+        request.session = session or SessionStore()
+        return Cart(request)
+
+    def test_lines_resolve_in_constant_queries(self):
+        cart = self.make_cart()
+        for i in range(120):
+            cart.add(self.make_product(f"Hop {i}", price=Decimal("1.10")), 2)
+
+        cart = self.make_cart(cart.session)
+        with self.assertNumQueries(1):
+            lines = cart.lines
+            total = cart.total
+        self.assertEqual(len(lines), 120)
+        self.assertEqual(total, Decimal("264.00"))
+        self.assertEqual(len(cart), 240)
+
+    def test_validates_stock_and_availability(self):
+        product = self.make_product("Citra", stock=3)
+        cart = self.make_cart()
+        with self.assertRaises(InsufficientStock):
+            cart.add(product, 4)
+        cart.add(product, 3)
+
+        product.stock = 1
+        product.save()
+        line = self.make_cart(cart.session).lines[0]
+        self.assertEqual(line.problem, "Only 1 left in stock.")
+        self.assertFalse(self.make_cart(cart.session).is_valid)
+
+    def test_zero_quantity_removes_line_and_missing_products_are_skipped(self):
+        kept, gone = self.make_product("Citra"), self.make_product("Saaz")
+        cart = self.make_cart()
+        cart.add(kept, 2)
+        cart.add(gone, 1)
+        cart.add(kept, 0, override=True)
+        gone_pk = gone.pk
+        gone.delete()
+        self.assertEqual(cart.session[CART_SESSION_KEY], {str(gone_pk): 1})
+        self.assertEqual(cart.lines, [])
+
+    @override_settings(CART_RESERVATION_SECONDS=600)
+    def test_reservations_prevent_overselling(self):
+        product = self.make_product("Citra", stock=5)
+        first, second = self.make_cart(), self.make_cart()
+        first.add(product, 4)
+        with self.assertRaises(InsufficientStock) as raised:
+            second.add(product, 2)
+        self.assertEqual(raised.exception.available, 1)
+        second.add(product, 1)
+        self.assertEqual(second.lines[0].available, 1)
+
+        first.clear()
+        second.add(product, 5, override=True)
+        self.assertEqual(
+            StockReservation.objects.get(product=product).cart_id,
+            second.cart_id,
+        )
+
+    @override_settings(CART_RESERVATION_SECONDS=600)
+    def test_expired_reservations_release_stock(self):
+        product = self.make_product("Citra", stock=2)
+        first = self.make_cart()
+        first.add(product, 2)
+        StockReservation.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.make_cart().add(product, 2)
+
+
+class CartViewTests(CatalogTestCase):
+    @override_settings(CART_RESERVATION_SECONDS=600)
+    def test_signing_in_keeps_the_cart_reservations(self):
+        product = self.make_product("Citra", stock=3)
+        add_url = reverse("orders:cart-add", args=[product.pk])
+        self.client.post(add_url, {"quantity": 3})
+        session_key = self.client.session.session_key
+
+        self.client.post(
+            reverse("users:login"),
+            {"username": self.user.email, "password": "secret-pass"},
+        )
+        self.assertNotEqual(self.client.session.session_key, session_key)
+        line = self.client.get(reverse("orders:cart")).context["cart"].lines[0]
+        self.assertIsNone(line.problem)
+        self.client.post(add_url, {"quantity": 3, "override": "1"})
+        self.assertEqual(StockReservation.objects.get(product=product).quantity, 3)
+
+    def test_add_update_remove_and_render(self):
+        product = self.make_product("Citra", price=Decimal("5.99"))
+        add_url = reverse("orders:cart-add", args=[product.pk])
+
+        self.client.post(add_url, {"quantity": 2})
+        self.client.post(add_url, {"quantity": 3})
+        response = self.client.get(reverse("orders:cart"))
+        self.assertContains(response, "Citra")
+        self.assertContains(response, "29.95")
+
+        self.client.post(add_url, {"quantity": 1, "override": "1"})
+        self.assertEqual(self.client.session[CART_SESSION_KEY], {str(product.pk): 1})
+
+        self.client.post(reverse("orders:cart-remove", args=[product.pk]))
+        self.assertContains(self.client.get(reverse("orders:cart")), "empty")
+
+    def test_add_beyond_stock_reports_error(self):
+        product = self.make_product("Citra", stock=1)
+        response = self.client.post(
+            reverse("orders:cart-add", args=[product.pk]), {"quantity": 5}, follow=True
+        )
+        self.assertContains(response, "left in stock")
+        self.assertEqual(self.client.session.get(CART_SESSION_KEY, {}), {})
+
+
+class CheckoutTests(CatalogTestCase):
+    def test_places_order_in_fixed_queries(self):
+        products = [
+            self.make_product(f"Hop {i}", price=Decimal("2.50"), stock=5)
+            for i in range(50)
+        ]
+        quantities = {product.pk: 2 for product in products}
+
+        # SAVEPOINT, SELECT ... FOR UPDATE, UPDATE, INSERT order, INSERT
+        # rollup refresh, INSERT items, INSERT outbox messages, RELEASE.
+        with self.assertNumQueries(8):
+            order = place_order(self.user, quantities, "1 Brew Lane")
+
+        self.assertEqual(order.total_price, Decimal("250.00"))
+        self.assertEqual(order.items.count(), 50)
+        self.assertEqual(set(Product.objects.values_list("stock", flat=True)), {3})
+
+    def test_shortage_rolls_back_everything(self):
+        plenty = self.make_product("Citra", stock=10)
+        scarce = self.make_product("Saaz", stock=1)
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(self.user, {plenty.pk: 2, scarce.pk: 2}, "1 Brew Lane")
+        self.assertEqual(raised.exception.shortages, {scarce.pk: 1})
+        plenty.refresh_from_db()
+        self.assertEqual(plenty.stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(CART_RESERVATION_SECONDS=600)
+    def test_other_carts_reservations_are_not_sold(self):
+        product = self.make_product("Citra", stock=5)
+        StockReservation.objects.create(
+            product=product,
+            cart_id="other",
+            quantity=4,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        StockReservation.objects.create(
+            product=product,
+            cart_id="mine",
+            quantity=1,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(self.user, {product.pk: 2}, "1 Brew Lane", cart_id="mine")
+        self.assertEqual(raised.exception.shortages, {product.pk: 1})
+
+        place_order(self.user, {product.pk: 1}, "1 Brew Lane", cart_id="mine")
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 4)
+        self.assertEqual(
+            list(StockReservation.objects.values_list("cart_id", flat=True)),
+            ["other"],
+        )
+
+    def test_unavailable_and_empty_orders_are_rejected(self):
+        hidden = self.make_product("Citra", available=False)
+        with self.assertRaises(OutOfStock):
+            place_order(self.user, {hidden.pk: 1}, "1 Brew Lane")
+        with self.assertRaises(CheckoutError):
+            place_order(self.user, {}, "1 Brew Lane")
+
+    def test_checkout_view_creates_order_and_clears_cart(self):
+        product = self.make_product("Citra", price=Decimal("5.99"), stock=3)
+        self.client.force_login(self.user)
+        self.client.post(reverse("orders:cart-add", args=[product.pk]), {"quantity": 2})
+        response = self.client.post(
+            reverse("orders:checkout"),
+            {
+                "full_name": "Ann Brewer",
+                "phone": "555-0100",
+                "city": "Portland",
+                "address": "1 Brew Lane",
+                "payment_method": "cod",
+            },
+        )
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse("orders:order-detail", args=[order.pk]))
+        self.assertEqual(order.total_price, Decimal("11.98"))
+        self.assertIn("Portland", order.shipping_address)
+        self.assertEqual(self.client.session[CART_SESSION_KEY], {})
+        self.assertContains(self.client.get(response.url), "11.98")
+
+
+@override_settings(ORDER_NOTIFICATION_EMAILS=["staff@example.com"])
+class OutboxTests(CatalogTestCase):
+    def place(self):
+        product = self.make_product("Citra", price=Decimal("5.99"))
+        return place_order(self.user, {product.pk: 2}, "1 Brew Lane")
+
+    def test_order_emails_are_queued_then_sent_once(self):
+        order = self.place()
+        self.assertEqual(len(mail.outbox), 0)
+        # The two emails and the rollup refresh.
+        self.assertEqual(outbox_lag()["pending"], 3)
+
+        enqueue_order_created(order)
+        self.assertEqual(OutboxMessage.objects.count(), 3)
+
+        self.assertEqual(drain(workers=1), {"sent": 3, "pending": 0, "failed": 0})
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ["brewer@example.com", "staff@example.com"])
+        self.assertIn("11.98", mail.outbox[0].body)
+        self.assertEqual(
+            mail.outbox[0].extra_headers["Message-ID"],
+            f"<order:{order.pk}:customer@hopandbarley>",
+        )
+
+        self.assertEqual(drain(workers=1)["sent"], 0)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(outbox_lag(), {"pending": 0, "failed": 0, "lag_seconds": 0.0})
+
+    def test_plain_text_emails_are_not_html_escaped(self):
+        product = self.make_product("Brewer's Gold & Co", price=Decimal("3.00"))
+        place_order(self.user, {product.pk: 1}, "O'Hara & Sons <Dock 4>")
+        drain(workers=1)
+        for message in mail.outbox:
+            self.assertIn("Brewer's Gold & Co", message.body)
+            self.assertIn("O'Hara & Sons <Dock 4>", message.body)
+            self.assertNotIn("&amp;", message.body)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_BACKOFF_SECONDS=30)
+    def test_failures_back_off_then_give_up(self):
+        self.place()
+        failing = mock.Mock(side_effect=ConnectionRefusedError("smtp down"))
+        with (
+            mock.patch.dict(HANDLERS, order_created_customer=failing),
+            self.assertLogs("orders.outbox", "ERROR"),
+        ):
+            self.assertEqual(drain(workers=1)["pending"], 1)
+            message = OutboxMessage.objects.get(kind="order_created_customer")
+            self.assertEqual(message.attempts, 1)
+            self.assertIn("smtp down", message.last_error)
+            self.assertGreater(
+                message.available_at, timezone.now() + timedelta(seconds=25)
+            )
+            self.assertEqual(drain(workers=1)["pending"], 0)
+
+            OutboxMessage.objects.update(available_at=timezone.now())
+            self.assertEqual(drain(workers=1), {"sent": 0, "pending": 0, "failed": 1})
+        self.assertEqual(outbox_lag()["failed"], 1)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.console.EmailBackend")
+    def test_run_outbox_command_reports_lag(self):
+        self.place()
+        out, console = StringIO(), StringIO()
+        with redirect_stdout(console):
+            call_command("run_outbox", workers=1, stdout=out)
+        self.assertIn("sent=3", out.getvalue())
+        self.assertIn("backlog=0", out.getvalue())
+        self.assertIn("X-Idempotency-Key", console.getvalue())
+
+
+class SalesRollupTests(CatalogTestCase):
+    def place(self, quantities):
+        order = place_order(self.user, quantities, "1 Brew Lane")
+        drain(workers=1)
+        return order
+
+    def rollups(self):
+        return sorted(
+            SalesRollup.objects.values_list("period", "status", "orders", "units")
+        ), sorted(
+            ProductSalesRollup.objects.values_list(
+                "period", "status", "product_id", "units", "revenue"
+            )
+        )
+
+    def test_orders_and_status_changes_update_rollups(self):
+        citra = self.make_product("Citra", price=Decimal("5.00"))
+        saaz = self.make_product("Saaz", price=Decimal("2.50"))
+        first = self.place({citra.pk: 2, saaz.pk: 1})
+        self.place({citra.pk: 1})
+
+        day = SalesRollup.objects.get(period="day")
+        self.assertEqual((day.status, day.orders, day.units), ("pending", 2, 4))
+        self.assertEqual(day.revenue, Decimal("17.50"))
+        self.assertEqual(
+            ProductSalesRollup.objects.get(period="day", product=citra).revenue,
+            Decimal("15.00"),
+        )
+
+        first.status = "cancelled"
+        first.save()
+        self.assertEqual(SalesRollup.objects.get(period="day").orders, 2)
+        drain(workers=1)
+        summary = dashboard_summary(days=1)
+        self.assertEqual(summary["totals"]["revenue"], Decimal("5.00"))
+        self.assertEqual(summary["totals"]["orders"], 1)
+        self.assertEqual(summary["by_status"]["cancelled"], 1)
+        self.assertEqual(
+            [(row["product__name"], row["units"]) for row in summary["top_products"]],
+            [("Citra", 1)],
+        )
+        self.assertEqual(summary["categories"][0]["category__name"], "Hops")
+
+    def test_refreshes_of_a_day_are_coalesced(self):
+        product = self.make_product("Citra", price=Decimal("4.00"))
+        for _ in range(3):
+            place_order(self.user, {product.pk: 1}, "1 Brew Lane")
+        self.assertEqual(
+            OutboxMessage.objects.filter(kind="refresh_rollups").count(), 1
+        )
+
+        drain(workers=1)
+        self.assertEqual(SalesRollup.objects.get(period="day").orders, 3)
+        self.assertTrue(RollupDay.objects.get().refreshed_at)
+
+        place_order(self.user, {product.pk: 1}, "1 Brew Lane")
+        self.assertEqual(
+            OutboxMessage.objects.filter(
+                kind="refresh_rollups", status="pending"
+            ).count(),
+            1,
+        )
+        drain(workers=1)
+        self.assertEqual(SalesRollup.objects.get(period="day").orders, 4)
+
+    def test_command_reconciles_changes_that_bypass_signals(self):
+        product = self.make_product("Citra", price=Decimal("4.00"))
+        self.place({product.pk: 3})
+        old = self.place({product.pk: 1})
+        Order.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=3), status="paid"
+        )
+        self.assertEqual(
+            self.rollups()[0], [("day", "pending", 2, 4), ("hour", "pending", 2, 4)]
+        )
+
+        call_command("rollup_sales", all=True, stdout=StringIO())
+        self.assertEqual(
+            self.rollups()[0],
+            [
+                ("day", "paid", 1, 1),
+                ("day", "pending", 1, 3),
+                ("hour", "paid", 1, 1),
+                ("hour", "pending", 1, 3),
+            ],
+        )
+        self.assertEqual(
+            dashboard_summary(days=7)["totals"]["revenue"], Decimal("16.00")
+        )
+
+    def test_dashboard_reads_only_rollups(self):
+        product = self.make_product("Citra")
+        for _ in range(3):
+            self.place({product.pk: 1})
+        staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="x", is_staff=True
+        )
+        self.client.force_login(staff)
+        url = reverse("admin-dashboard")
+        # Session, user, then the four rollup queries of `dashboard_summary`.
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {"days": 30})
+        self.assertContains(response, "$30.00")
+        self.assertContains(response, "Citra")
+
+        self.client.logout()
+        self.assertRedirects(
+            self.client.get(url), f"{reverse('admin:login')}?next={url}"
+        )
+
+
+class CheckoutContentionTests(TransactionTestCase):
+    threads = 16
+    stock = 5
+
+    def test_concurrent_buyers_never_oversell(self):
+        category = Category.objects.create(name="Hops")
+        product = Product.objects.create(
+            name="Citra",
+            description="Last units.",
+            category=category,
+            price=Decimal("10.00"),
+            stock=self.stock,
+        )
+        buyer = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", image=""
+        )
+        start = threading.Barrier(self.threads)
+        outcomes, latencies = [], []
+
+        def buy():
+            start.wait()
+            began = time.perf_counter()
+            try:
+                place_order(buyer, {product.pk: 1}, "1 Brew Lane")
+                outcomes.append("ok")
+            except OutOfStock:
+                outcomes.append("sold out")
+            finally:
+                latencies.append(time.perf_counter() - began)
+                close_old_connections()
+
+        workers = [threading.Thread(target=buy) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        self.assertEqual(outcomes.count("ok"), self.stock)
+        self.assertEqual(outcomes.count("sold out"), self.threads - self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(OrderItem.objects.count(), self.stock)
+        self.assertLess(percentile(latencies, 0.99), 5.0)
+
+        # Two emails per order and one rollup refresh for the day.
+        self.assertEqual(drain(workers=4)["sent"], self.stock * 2 + 1)
+        self.assertEqual(SalesRollup.objects.get(period="day").orders, self.stock)
+        self.assertEqual(len(mail.outbox), self.stock * 2)
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from orders import views
+
+app_name = "orders"
+
+urlpatterns = [
+    path("cart/", views.CartView.as_view(), name="cart"),
+    path("cart/add/<int:product_id>/", views.CartAddView.as_view(), name="cart-add"),
+    path(
+        "cart/remove/<int:product_id>/",
+        views.CartRemoveView.as_view(),
+        name="cart-remove",
+    ),
+    path("checkout/", views.CheckoutView.as_view(), name="checkout"),
+    path("<int:pk>/", views.OrderDetailView.as_view(), name="order-detail"),
+]
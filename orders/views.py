@@ -1,3 +1,135 @@
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import get_object_or_404, redirect
+from django.views import View
+from django.views.generic import DetailView, FormView, TemplateView
 
-# Create your views here.
+from orders.cart import LINE_FIELDS, Cart, InsufficientStock
+from orders.checkout import CheckoutError, place_order
+from orders.forms import CartAddForm, CheckoutForm
+from orders.models import Order
+from orders.rollups import dashboard_summary
+from products.models import Product
+
+
+class CartView(TemplateView):
+    """
+    Shows the shopper's cart.
+
+    All lines are resolved by `Cart` in a fixed number of queries, so the
+    page costs the same with one line or a few hundred.
+    """
+
+    template_name = "orders/cart.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cart"] = Cart(self.request)
+        return context
+
+
+class CartAddView(View):
+    """
+    Adds a product to the cart, or sets its quantity when `override` is sent.
+
+    A quantity of zero removes the line.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request, product_id):
+        product = get_object_or_404(Product.objects.only(*LINE_FIELDS), pk=product_id)
+        form = CartAddForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Please enter a valid quantity.")
+            return redirect("orders:cart")
+        try:
+            Cart(request).add(
+                product,
+                quantity=form.cleaned_data["quantity"],
+                override=form.cleaned_data["override"],
+            )
+        except InsufficientStock as exc:
+            messages.error(request, str(exc))
+        return redirect("orders:cart")
+
+
+class CartRemoveView(View):
+    http_method_names = ["post"]
+
+    def post(self, request, product_id):
+        Cart(request).remove(product_id)
+        return redirect("orders:cart")
+
+
+class CheckoutView(LoginRequiredMixin, FormView):
+    """
+    Collects shipping details and places the order for the cart's contents.
+
+    The order is created by `place_order`, which locks and decrements stock
+    in one transaction; on success the cart (and any stock it reserved) is
+    cleared.
+    """
+
+    form_class = CheckoutForm
+    template_name = "orders/checkout.html"
+
+    def dispatch(self, request, *args, **kwargs):
+        self.cart = Cart(request)
+        if not self.cart:
+            return redirect("orders:cart")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cart"] = self.cart
+        return context
+
+    def form_valid(self, form):
+        try:
+            order = place_order(
+                self.request.user,
+                self.cart.items,
+                form.shipping_address(),
+                cart_id=self.cart.cart_id,
+            )
+        except CheckoutError as exc:
+            messages.error(self.request, str(exc))
+            return redirect("orders:cart")
+        self.cart.clear()
+        return redirect("orders:order-detail", pk=order.pk)
+
+
+class OrderDetailView(LoginRequiredMixin, DetailView):
+    template_name = "orders/order_detail.html"
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            "items__product"
+        )
+
+
+class SalesDashboardView(TemplateView):
+    """
+    Admin dashboard of sales over the last `days` days (`?days=`).
+
+    Everything shown comes from the sales rollups, so the page costs the
+    same few queries however long the order history grows. It is mounted
+    behind `admin.site.admin_view`, which restricts it to staff.
+    """
+
+    template_name = "admin/dashboard.html"
+    ranges = (1, 7, 30, 90)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            days = int(self.request.GET.get("days", 7))
+        except ValueError:
+            days = 7
+        if days not in self.ranges:
+            days = 7
+        summary = dashboard_summary(days)
+        peak = max((revenue for _, revenue in summary["daily"]), default=0)
+        context.update(summary, ranges=self.ranges, peak=peak or 1)
+        return context
@@ -0,0 +1,92 @@
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError
+
+from products.models import CARD_FIELDS
+
+
+def _decimal(value, request):
+    return None if value is None else str(value)
+
+
+def _image(value, request):
+    return request.build_absolute_uri(default_storage.url(value)) if value else None
+
+
+# Public field name -> (`values()` path, optional converter). Converters
+# produce what `ProductSerializer` would for the same column.
+PRODUCT_FIELDS = {
+    "id": ("id", None),
+    "name": ("name", None),
+    "slug": ("slug", None),
+    "description": ("description", None),
+    "short_description": ("short_description", None),
+    "price": ("price", _decimal),
+    "currency": ("currency", None),
+    "price_base": ("price_base", _decimal),
+    "unit_measure": ("unit_measure", None),
+    "stock": ("stock", None),
+    "available": ("available", None),
+    "category": ("category_id", None),
+    "category_slug": ("category__slug", None),
+    "rating_avg": ("rating_avg", _decimal),
+    "rating_count": ("rating_count", None),
+    "image": ("image", _image),
+    "created_at": ("created_at", None),
+    "updated_at": ("updated_at", None),
+}
+DETAIL_FIELDS = tuple(PRODUCT_FIELDS)
+LIST_FIELDS = tuple(name for name in PRODUCT_FIELDS if name != "description")
+# Named fieldsets accepted in `?fields=`, such as `?fields=card,stock`.
+FIELD_SETS = {
+    "card": tuple(
+        name for name, (path, _) in PRODUCT_FIELDS.items() if path in CARD_FIELDS
+    ),
+}
+
+
+def requested_fields(params, default):
+    """
+    Parse a sparse fieldset from `?fields=name,price,...`.
+
+    Names of `FIELD_SETS` expand to their fields, so `?fields=card` returns
+    what the storefront's product cards show.
+
+    :param params: Query parameters of the request.
+    :param default: Fields returned when none are requested.
+    :raises ValidationError: If an unknown field is requested.
+    :rtype: tuple[str, ...]
+    """
+    raw = params.get("fields", None)
+    if not raw:
+        return default
+    names = (name.strip() for name in raw.split(",") if name)
+    fields = tuple(
+        dict.fromkeys(
+            field for name in names for field in FIELD_SETS.get(name, (name,))
+        )
+    )
+    unknown = [name for name in fields if name not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}."})
+    return fields
+
+
+def value_paths(fields, *extra):
+    """The `values()` paths needed to render `fields` plus internal `extra`."""
+    return tuple(dict.fromkeys([*(PRODUCT_FIELDS[name][0] for name in fields), *extra]))
+
+
+def serialize_rows(rows, fields, request):
+    """
+    Turn `values()` dicts into API payloads without building model instances.
+
+    :rtype: list[dict]
+    """
+    spec = [(name, *PRODUCT_FIELDS[name]) for name in fields]
+    return [
+        {
+            name: convert(row[path], request) if convert else row[path]
+            for name, path, convert in spec
+        }
+        for row in rows
+    ]
@@ -0,0 +1,38 @@
+from rest_framework import serializers
+
+from products.models import Product
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    """
+    Model-instance serializer producing the same payload as the API views.
+
+    The API itself serializes `values()` rows (see `products.api.fields`);
+    this is kept as the reference implementation that `bench_api` and the
+    tests compare against.
+    """
+
+    category_slug = serializers.CharField(source="category.slug", read_only=True)
+
+    class Meta:
+        model = Product
+        fields = (
+            "id",
+            "name",
+            "slug",
+            "description",
+            "short_description",
+            "price",
+            "currency",
+            "price_base",
+            "unit_measure",
+            "stock",
+            "available",
+            "category",
+            "category_slug",
+            "rating_avg",
+            "rating_count",
+            "image",
+            "created_at",
+            "updated_at",
+        )
@@ -0,0 +1,201 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+
+from config.routers import ReplicaReadMixin
+from config.settings import API_MAX_PAGE_SIZE, API_PAGE_SIZE
+from products.api.fields import (
+    DETAIL_FIELDS,
+    LIST_FIELDS,
+    requested_fields,
+    serialize_rows,
+    value_paths,
+)
+from products.catalog import catalog_sort, filter_catalog, order_catalog
+from products.models import Product
+from products.pagination import CursorPaginator, InvalidCursor
+
+# Columns read for every row to compute validators, whatever `?fields=` says.
+VALIDATOR_PATHS = ("id", "updated_at", "rating_version")
+
+
+def compute_etag(fields, rows, *extra):
+    """
+    Weak ETag over the representation of `rows`.
+
+    `updated_at` misses rating changes, which are written with
+    `QuerySet.update`, so `rating_version` is hashed in as well.
+    """
+    digest = hashlib.md5(",".join(fields).encode(), usedforsecurity=False)
+    for row in rows:
+        digest.update(
+            f"|{row['id']}:{row['updated_at'].timestamp()}:{row['rating_version']}".encode()
+        )
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+class CatalogAPIView(ReplicaReadMixin, APIView):
+    """
+    Base of the public, read-only catalog endpoints.
+
+    Authentication, throttling and the browsable renderer are skipped:
+    the data is public and every request should cost as little as
+    possible beyond the query itself. Reads are served by the replicas.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def conditional_response(self, request, payload, etag, last_modified=None):
+        """
+        Answer `304 Not Modified` when the client's copy is current.
+
+        `If-None-Match` is checked against `etag` and, when absent and
+        `last_modified` is given, `If-Modified-Since` against it.
+        """
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = Response(payload)
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class ProductListAPIView(CatalogAPIView):
+    """
+    `GET /api/products/`: available products, filtered like the storefront.
+
+    Accepts the storefront's `categories`, `subcategories`, `min_price`,
+    `max_price`, `q` and `sort` parameters, plus `fields` for a sparse
+    fieldset and `page_size`.
+    Sorted listings are paginated with opaque `cursor` tokens; relevance
+    ranked search results with `page` numbers.
+
+    Rows are fetched with `values()` and serialized as plain dicts, so no
+    `Product` instances are built.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        fields = requested_fields(params, LIST_FIELDS)
+        page_size = self.get_page_size(params)
+        sort = catalog_sort(params)
+        queryset = filter_catalog(Product.objects.filter(available=True), params)
+        if sort is None:
+            paths = value_paths(fields, *VALIDATOR_PATHS, "search_rank")
+            queryset = order_catalog(queryset, None).values(*paths)
+            rows, next_url, previous_url = self.paginate_by_page(
+                request, queryset, page_size
+            )
+        else:
+            paths = value_paths(fields, *VALIDATOR_PATHS, sort.lstrip("-"))
+            queryset = queryset.values(*paths)
+            rows, next_url, previous_url = self.paginate_by_cursor(
+                request, queryset, sort, page_size
+            )
+        payload = {
+            "next": next_url,
+            "previous": previous_url,
+            "results": serialize_rows(rows, fields, request),
+        }
+        # No `Last-Modified`: the newest `updated_at` of the page misses
+        # rating changes and products that left the listing, which the
+        # ETag, hashed over the rows actually returned, does not.
+        return self.conditional_response(
+            request, payload, compute_etag(fields, rows, next_url, previous_url)
+        )
+
+    @staticmethod
+    def get_page_size(params):
+        try:
+            size = int(params.get("page_size", API_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({"page_size": "Must be an integer."})
+        return max(1, min(size, API_MAX_PAGE_SIZE))
+
+    @staticmethod
+    def paginate_by_cursor(request, queryset, sort, page_size):
+        paginator = CursorPaginator(queryset, sort, page_size)
+        try:
+            page = paginator.page(request.query_params.get("cursor", None))
+        except InvalidCursor:
+            raise ValidationError({"cursor": "Invalid cursor."})
+        url = remove_query_param(request.build_absolute_uri(), "page")
+        return (
+            page.object_list,
+            (
+                replace_query_param(url, "cursor", page.next_cursor)
+                if page.has_next()
+                else None
+            ),
+            (
+                replace_query_param(url, "cursor", page.previous_cursor)
+                if page.has_previous()
+                else None
+            ),
+        )
+
+    @staticmethod
+    def paginate_by_page(request, queryset, page_size):
+        try:
+            number = max(1, int(request.query_params.get("page", 1)))
+        except ValueError:
+            raise ValidationError({"page": "Must be an integer."})
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        url = remove_query_param(request.build_absolute_uri(), "cursor")
+        next_url = (
+            replace_query_param(url, "page", number + 1)
+            if len(rows) > page_size
+            else None
+        )
+        previous_url = (
+            replace_query_param(url, "page", number - 1) if number > 1 else None
+        )
+        return rows[:page_size], next_url, previous_url
+
+
+class ProductDetailAPIView(CatalogAPIView):
+    """`GET /api/products/<id>/`: one available product, `fields` supported."""
+
+    def get(self, request, pk):
+        fields = requested_fields(request.query_params, DETAIL_FIELDS)
+        row = (
+            Product.objects.filter(pk=pk, available=True)
+            .values(
+                *value_paths(
+                    fields,
+                    *VALIDATOR_PATHS,
+                    "rating_updated_at",
+                    "category__updated_at",
+                )
+            )
+            .first()
+        )
+        if row is None:
+            raise NotFound()
+        category_updated_at = row["category__updated_at"]
+        return self.conditional_response(
+            request,
+            serialize_rows([row], fields, request)[0],
+            compute_etag(fields, [row], category_updated_at.timestamp()),
+            max(
+                row["updated_at"],
+                category_updated_at,
+                row["rating_updated_at"] or category_updated_at,
+            ),
+        )
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using="default", **kwargs):
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        from products.search import ensure_sqlite_search_index
+
+        ensure_sqlite_search_index(connection)
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
+
+    def ready(self):
+        from products import signals  # noqa: F401
+
+        post_migrate.connect(restore_search_index, sender=self)
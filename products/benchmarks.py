@@ -0,0 +1,63 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class Rollback(Exception):
+    """Raised to discard the data a benchmark wrote."""
+
+
+@contextmanager
+def rolled_back(using="default"):
+    """
+    Run the block in a transaction that is always rolled back.
+
+    Benchmarks seed throwaway data into the configured database; wrapping
+    them in this context manager leaves the database as it was found.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(func, repeat=20, warmup=2, setup=None):
+    """
+    Time `func` and summarize its latency in milliseconds.
+
+    :param func: Zero-argument callable to time.
+    :param repeat: Number of timed calls.
+    :param warmup: Number of untimed calls made first.
+    :param setup: Zero-argument callable run, untimed, before every call.
+    :return: `runs`, `min`, `p50`, `p95`, `p99` and `max` latency.
+    :rtype: dict
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min": round(min(samples), 3),
+        "p50": round(statistics.median(samples), 3),
+        "p95": round(percentile(samples, 0.95), 3),
+        "p99": round(percentile(samples, 0.99), 3),
+        "max": round(max(samples), 3),
+    }
@@ -0,0 +1,153 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from config.settings import STOREFRONT_PAGE_CACHE_TIMEOUT
+
+CATALOG_VERSION_KEY = "storefront:catalog-version"
+STATS_KEY = "storefront:stats:{namespace}:{outcome}"
+STATS_NAMESPACES = ("page", "fragment")
+
+
+def catalog_version():
+    """Return the version that every cached storefront page is keyed on."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate all cached pages at once by moving to a new version."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 2, None)
+
+
+def record_cache_access(namespace, hit):
+    key = STATS_KEY.format(namespace=namespace, outcome="hits" if hit else "misses")
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def cache_stats():
+    """
+    Return hit/miss counters of the storefront caches.
+
+    :return: Per namespace `hits`, `misses` and `hit_ratio`.
+    :rtype: dict
+    """
+    keys = {
+        (namespace, outcome): STATS_KEY.format(namespace=namespace, outcome=outcome)
+        for namespace in STATS_NAMESPACES
+        for outcome in ("hits", "misses")
+    }
+    values = cache.get_many(keys.values())
+    stats = {}
+    for namespace in STATS_NAMESPACES:
+        hits = values.get(keys[(namespace, "hits")], 0)
+        misses = values.get(keys[(namespace, "misses")], 0)
+        total = hits + misses
+        stats[namespace] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(
+        STATS_KEY.format(namespace=namespace, outcome=outcome)
+        for namespace in STATS_NAMESPACES
+        for outcome in ("hits", "misses")
+    )
+
+
+# Query parameters whose mere presence shapes the page: an empty `?cursor=`
+# switches the catalog to cursor pagination.
+PRESENCE_PARAMS = ("cursor",)
+
+
+def normalize_query(query_dict, params):
+    """
+    Reduce a request's query string to the parameters that shape the page.
+
+    Parameter order, unknown parameters, empty values and the order of
+    comma separated categories don't produce distinct cache entries, except
+    for `PRESENCE_PARAMS` which change the page even when empty.
+    """
+    pairs = []
+    for name in sorted(params):
+        value = query_dict.get(name, "").strip()
+        if not value and not (name in PRESENCE_PARAMS and name in query_dict):
+            continue
+        if name == "categories":
+            value = ",".join(sorted({slug for slug in value.split(",") if slug}))
+        pairs.append((name, value))
+    return urlencode(pairs)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Cache whole rendered pages for anonymous visitors.
+
+    Entries are keyed on the URL path, the normalized query string and the
+    catalog version, which model signals bump whenever products, categories
+    or reviews change. Responses carry an `X-Cache: HIT` or `MISS` header.
+
+    :ivar page_cache_params: Query parameters that change the rendered page.
+    :type page_cache_params: tuple[str, ...]
+    :ivar page_cache_timeout: Seconds a rendered page is kept.
+    :type page_cache_timeout: int
+    """
+
+    page_cache_params = ()
+    page_cache_timeout = STOREFRONT_PAGE_CACHE_TIMEOUT
+
+    def get_page_cache_key(self, request):
+        query = normalize_query(request.GET, self.page_cache_params)
+        digest = hashlib.md5(
+            f"{request.path}?{query}".encode(), usedforsecurity=False
+        ).hexdigest()
+        return f"storefront:page:{catalog_version()}:{digest}"
+
+    def is_page_cacheable(self, request):
+        return (
+            self.page_cache_timeout
+            and request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = self.get_page_cache_key(request)
+        cached = cache.get(key)
+        record_cache_access("page", cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Cache"] = "HIT"
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        # A page that handed out a CSRF token is tied to that visitor.
+        if response.status_code == 200 and not request.META.get(
+            "CSRF_COOKIE_NEEDS_UPDATE"
+        ):
+            cache.set(
+                key,
+                (response.content, response["Content-Type"]),
+                self.page_cache_timeout,
+            )
+        response["X-Cache"] = "MISS"
+        return response
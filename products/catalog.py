@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from config.settings import PRODUCTS_CATEGORY_DESCENDANTS, PRODUCTS_QUERY_MAP
+from products.categories import get_category_tree
+from products.pagination import keyset_ordering
+from products.search import search_products
+
+
+def catalog_sort(params):
+    """
+    Return the ordering requested by `?sort=`, or `None` for relevance.
+
+    Search results are ranked by relevance unless a sort is given;
+    everything else defaults to the newest products first.
+
+    :param params: Query parameters of the request.
+    :type params: django.http.QueryDict
+    """
+    key = params.get("sort", None)
+    if key is None and params.get("q", None):
+        return None
+    return PRODUCTS_QUERY_MAP.get(key, PRODUCTS_QUERY_MAP["new"])
+
+
+def catalog_category_ids(params):
+    """
+    Return the category ids `?categories=` filters on, `None` without one.
+
+    Each slug is expanded into its whole subtree unless `subcategories=0`
+    (or `PRODUCTS_CATEGORY_DESCENDANTS` is off and `subcategories=1` isn't
+    given).
+    """
+    categories = params.get("categories", None)
+    if not categories:
+        return None
+    descendants = params.get(
+        "subcategories", "1" if PRODUCTS_CATEGORY_DESCENDANTS else "0"
+    )
+    return get_category_tree().resolve(
+        categories.split(","), include_descendants=descendants != "0"
+    )
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (TypeError, ArithmeticError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def catalog_price_range(params):
+    """
+    Return the `(min_price, max_price)` bounds of `?min_price=&max_price=`.
+
+    Prices are in `BASE_CURRENCY` and the range is half-open, `min_price`
+    included and `max_price` excluded, like the sidebar's price buckets; a
+    missing or malformed bound is `None`.
+    """
+    return _price(params.get("min_price", None)), _price(params.get("max_price", None))
+
+
+def filter_catalog(queryset, params):
+    """
+    Apply the storefront's `categories`, `subcategories`, `min_price`,
+    `max_price` and `q` filters.
+
+    Shared by the HTML catalog and the API so both accept the same query
+    string and return the same products.
+    """
+    # filter by category, optionally with its whole subtree
+    category_ids = catalog_category_ids(params)
+    if category_ids is not None:
+        queryset = queryset.filter(category_id__in=category_ids)
+
+    # filter by price range, a seek on the partial base price indexes
+    min_price, max_price = catalog_price_range(params)
+    if min_price is not None:
+        queryset = queryset.filter(price_base__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price_base__lt=max_price)
+
+    # search
+    to_search = params.get("q", None)
+    if to_search:
+        queryset = search_products(queryset, to_search)
+    return queryset
+
+
+def order_catalog(queryset, sort):
+    """Order by `sort` with an `id` tiebreak, or by relevance when `None`."""
+    if sort is None:
+        return queryset.order_by(
+            "-search_rank", *keyset_ordering(PRODUCTS_QUERY_MAP["new"])
+        )
+    return queryset.order_by(*keyset_ordering(sort))
@@ -0,0 +1,160 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import models
+
+from config.settings import CATEGORY_TREE_TIMEOUT
+from products.models import Category, Product
+
+TREE_CACHE_KEY = "products:category-tree"
+VERSION_CACHE_KEY = "products:category-tree:version"
+
+_local_tree = None
+
+
+class CategoryNode:
+    """
+    A category inside a prebuilt `CategoryTree`.
+
+    :ivar ancestor_ids: Ids from the root down to the parent of this node.
+    :type ancestor_ids: tuple[int, ...]
+    :ivar descendant_ids: Ids of this node and every category below it.
+    :type descendant_ids: frozenset[int]
+    :ivar product_count: Available products filed directly under the node.
+    :type product_count: int
+    :ivar total_count: Available products in the node and its descendants.
+    :type total_count: int
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "slug",
+        "parent_id",
+        "children",
+        "ancestor_ids",
+        "descendant_ids",
+        "product_count",
+        "total_count",
+    )
+
+    def __init__(self, id, name, slug, parent_id):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.parent_id = parent_id
+        self.children = []
+        self.ancestor_ids = ()
+        self.descendant_ids = frozenset()
+        self.product_count = 0
+        self.total_count = 0
+
+    @property
+    def depth(self):
+        return len(self.ancestor_ids)
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryTree:
+    """
+    The whole category hierarchy, built with two queries.
+
+    Ancestor paths, descendant id sets and available product counts are
+    computed once so the catalog never needs recursive queries to expand
+    a category into its subtree.
+    """
+
+    def __init__(self, rows, counts):
+        self.version = uuid.uuid4().hex
+        self.by_id = {row["id"]: CategoryNode(**row) for row in rows}
+        self.by_slug = {node.slug: node for node in self.by_id.values()}
+        self.roots = []
+        for node in sorted(self.by_id.values(), key=lambda n: n.name.lower()):
+            node.product_count = counts.get(node.id, 0)
+            parent = self.by_id.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+        for root in self.roots:
+            self._walk(root, ())
+
+    def _walk(self, node, ancestor_ids):
+        node.ancestor_ids = ancestor_ids
+        descendant_ids = {node.id}
+        total = node.product_count
+        for child in node.children:
+            if child.id in ancestor_ids:
+                continue
+            self._walk(child, ancestor_ids + (node.id,))
+            descendant_ids |= child.descendant_ids
+            total += child.total_count
+        node.descendant_ids = frozenset(descendant_ids)
+        node.total_count = total
+
+    @classmethod
+    def build(cls):
+        rows = Category.objects.order_by().values("id", "name", "slug", "parent_id")
+        counts = dict(
+            Product.objects.filter(available=True)
+            .order_by()
+            .values_list("category_id")
+            .annotate(n=models.Count("id"))
+        )
+        return cls(list(rows), counts)
+
+    def __iter__(self):
+        """Yield every node depth first, siblings ordered by name."""
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def ancestors(self, node):
+        return [self.by_id[pk] for pk in node.ancestor_ids]
+
+    def resolve(self, slugs, include_descendants=False):
+        """
+        Map category slugs to the ids a product filter should match.
+
+        :param slugs: Category slugs, unknown ones are ignored.
+        :param include_descendants: Whether to expand each category into its
+            whole subtree.
+        :rtype: set[int]
+        """
+        ids = set()
+        for slug in slugs:
+            node = self.by_slug.get(slug)
+            if node is None:
+                continue
+            ids |= node.descendant_ids if include_descendants else {node.id}
+        return ids
+
+
+def get_category_tree():
+    """
+    Return the cached category tree, rebuilding it when invalidated.
+
+    The tree is shared through the cache backend and memoized per process;
+    a request only pays for one cache lookup of the tree version.
+    """
+    global _local_tree
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is not None:
+        if _local_tree is not None and _local_tree.version == version:
+            return _local_tree
+        tree = cache.get(TREE_CACHE_KEY)
+        if tree is not None and tree.version == version:
+            _local_tree = tree
+            return tree
+    tree = CategoryTree.build()
+    cache.set_many(
+        {TREE_CACHE_KEY: tree, VERSION_CACHE_KEY: tree.version},
+        CATEGORY_TREE_TIMEOUT,
+    )
+    _local_tree = tree
+    return tree
+
+
+def invalidate_category_tree():
+    cache.delete_many([TREE_CACHE_KEY, VERSION_CACHE_KEY])
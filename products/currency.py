@@ -0,0 +1,218 @@
+import csv
+import time
+import uuid
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from products.caching import bump_catalog_version
+
+RATES_VERSION_KEY = "products:exchange-rates:version"
+CENT = Decimal("0.01")
+ONE = Decimal(1)
+
+_local_rates = None
+
+
+class ExchangeRates:
+    """
+    Every `ExchangeRate`, loaded with one query.
+
+    Currencies without a rate, `BASE_CURRENCY` included, convert at 1.
+
+    :ivar rates: Value of one unit of each currency in `BASE_CURRENCY`.
+    :type rates: dict[str, decimal.Decimal]
+    :ivar version: Shared version the rates were loaded at.
+    :type version: str
+    :ivar checked_at: Monotonic time the version was last compared.
+    :type checked_at: float
+    """
+
+    __slots__ = ("rates", "version", "checked_at")
+
+    def __init__(self, rates, version):
+        self.rates = rates
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version, currencies=None):
+        ExchangeRate = apps.get_model("products", "ExchangeRate")
+        rates = ExchangeRate.objects.all()
+        if currencies is not None:
+            rates = rates.filter(currency__in=currencies)
+        return cls(dict(rates.values_list("currency", "rate")), version)
+
+    def rate(self, currency):
+        return self.rates.get(currency, ONE)
+
+    def to_base(self, amount, currency):
+        """`amount` of `currency` in `BASE_CURRENCY`, rounded to the cent."""
+        return (amount * self.rate(currency)).quantize(CENT, ROUND_HALF_UP)
+
+    def from_base(self, amount, currency):
+        """`amount` of `BASE_CURRENCY` in `currency`, rounded to the cent."""
+        return (amount / self.rate(currency)).quantize(CENT, ROUND_HALF_UP)
+
+    def __contains__(self, currency):
+        return currency == settings.BASE_CURRENCY or currency in self.rates
+
+
+def get_exchange_rates():
+    """
+    Return the exchange rates, memoized per process, for display.
+
+    The memo is trusted for `EXCHANGE_RATES_RECHECK_SECONDS` without even a
+    cache lookup, so converting every price on a page costs nothing; then
+    it is compared with the version shared through the cache, which
+    `invalidate_exchange_rates` replaces. It can therefore lag behind
+    another process's rate change, so anything stored uses
+    `current_exchange_rates` instead.
+    """
+    global _local_rates
+    if (
+        _local_rates is not None
+        and time.monotonic() - _local_rates.checked_at
+        < settings.EXCHANGE_RATES_RECHECK_SECONDS
+    ):
+        return _local_rates
+    version = cache.get(RATES_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(RATES_VERSION_KEY, version, None)
+    elif _local_rates is not None and _local_rates.version == version:
+        _local_rates.checked_at = time.monotonic()
+        return _local_rates
+    _local_rates = ExchangeRates.load(version)
+    return _local_rates
+
+
+def invalidate_exchange_rates():
+    global _local_rates
+    _local_rates = None
+    cache.delete(RATES_VERSION_KEY)
+
+
+def current_exchange_rates(currencies=None):
+    """
+    Read the exchange rates from the database, bypassing the memo.
+
+    :param currencies: Only the rates of these currencies; all when `None`.
+        No query is made when they are all `BASE_CURRENCY`.
+    :rtype: ExchangeRates
+    """
+    if currencies is not None:
+        currencies = set(currencies) - {settings.BASE_CURRENCY}
+        if not currencies:
+            return ExchangeRates({}, None)
+    return ExchangeRates.load(None, currencies)
+
+
+def base_price(price, currency, rates=None):
+    """
+    `Product.price_base` of a product priced `price` in `currency`.
+
+    :param rates: From `current_exchange_rates`; read for `currency` alone
+        when `None`.
+    :type rates: ExchangeRates
+    """
+    if price is None:
+        return None
+    if rates is None:
+        rates = current_exchange_rates([currency])
+    return rates.to_base(Decimal(str(price)), currency)
+
+
+def recompute_base_prices(currencies=None):
+    """
+    Recompute `Product.price_base` with one `UPDATE` per currency.
+
+    `updated_at` is bumped too, as the API's ETag and `Last-Modified`, the
+    feed sections and the card fragments all key on it.
+
+    :param currencies: Only reprice products in these currencies; every
+        product when `None`.
+    :return: Number of products updated.
+    :rtype: int
+    """
+    Product = apps.get_model("products", "Product")
+    products = Product.objects.all()
+    if currencies is not None:
+        products = products.filter(currency__in=currencies)
+    rates = current_exchange_rates()
+    now = timezone.now()
+    updated = 0
+    for currency in products.order_by().values_list("currency", flat=True).distinct():
+        updated += products.filter(currency=currency).update(
+            price_base=Round(
+                models.F("price") * models.Value(rates.rate(currency)),
+                2,
+                output_field=Product._meta.get_field("price_base"),
+            ),
+            updated_at=now,
+        )
+    return updated
+
+
+def read_exchange_rates(stream):
+    """
+    Parse a `currency,rate` CSV file, with a header, into a rate table.
+
+    :raises ValueError: On a malformed currency code or rate.
+    :rtype: dict[str, decimal.Decimal]
+    """
+    rates = {}
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        currency = (row.get("currency") or "").strip().upper()
+        try:
+            rate = Decimal((row.get("rate") or "").strip())
+        except InvalidOperation:
+            rate = None
+        if len(currency) != 3 or not currency.isalpha():
+            raise ValueError(f"line {line}: bad currency code {currency!r}")
+        if rate is None or not rate.is_finite() or rate <= 0:
+            raise ValueError(f"line {line}: bad rate for {currency}")
+        rates[currency] = rate.quantize(Decimal("1e-8"))
+    return rates
+
+
+def load_exchange_rates(rates):
+    """
+    Replace the exchange rate table with `rates` and reprice what changed.
+
+    :param rates: Value of one unit of each currency in `BASE_CURRENCY`.
+    :type rates: dict[str, decimal.Decimal]
+    :return: Currencies whose rate was added, changed or removed.
+    :rtype: list[str]
+    """
+    ExchangeRate = apps.get_model("products", "ExchangeRate")
+    rates = {
+        currency: rate
+        for currency, rate in rates.items()
+        if currency != settings.BASE_CURRENCY
+    }
+    with transaction.atomic():
+        previous = dict(ExchangeRate.objects.values_list("currency", "rate"))
+        changed = sorted(
+            currency
+            for currency in previous.keys() | rates.keys()
+            if previous.get(currency) != rates.get(currency)
+        )
+        if not changed:
+            return []
+        ExchangeRate.objects.exclude(currency__in=rates).delete()
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency=c, rate=rate) for c, rate in rates.items()],
+            update_conflicts=True,
+            unique_fields=["currency"],
+            update_fields=["rate", "updated_at"],
+        )
+        recompute_base_prices(changed)
+    invalidate_exchange_rates()
+    bump_catalog_version()
+    return changed
@@ -0,0 +1,268 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, models
+
+from products.caching import catalog_version, normalize_query
+from products.catalog import (
+    catalog_category_ids,
+    catalog_price_range,
+    filter_catalog,
+)
+from products.models import Product
+
+# Query parameters that change the counts; sorting and paging don't.
+FACET_PARAMS = ("categories", "subcategories", "min_price", "max_price", "q")
+FACETS_KEY = "products:facets:v2:{digest}"
+REFRESH_KEY = "products:facets:refreshing:{digest}"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CatalogFacets:
+    """
+    Product counts of the catalog for one set of filters.
+
+    Each facet is counted under every filter but its own, so the sidebar
+    can show what picking another value would give.
+
+    :ivar total: Available products matching every filter.
+    :type total: int
+    :ivar category_counts: Products filed directly under each category id,
+        ignoring the category filter.
+    :type category_counts: dict[int, int]
+    :ivar price_buckets: `(low, high, count)` of every bucket of
+        `CATALOG_PRICE_BUCKETS`, in `BASE_CURRENCY`, ignoring the price
+        filter; `low` is inclusive, `high` exclusive and `None` for the
+        last bucket.
+    :type price_buckets: list[tuple]
+    :ivar unit_counts: Products per `unit_measure`.
+    :type unit_counts: dict[str, int]
+    :ivar currency_counts: Products per `currency`.
+    :type currency_counts: dict[str, int]
+    :ivar version: Catalog version the counts were computed at.
+    :type version: int
+    :ivar computed_at: Unix time the counts were computed at.
+    :type computed_at: float
+    """
+
+    __slots__ = (
+        "total",
+        "category_counts",
+        "price_buckets",
+        "unit_counts",
+        "currency_counts",
+        "version",
+        "computed_at",
+    )
+
+    def __init__(
+        self,
+        total,
+        category_counts,
+        version,
+        computed_at,
+        price_buckets=(),
+        unit_counts=None,
+        currency_counts=None,
+    ):
+        self.total = total
+        self.category_counts = category_counts
+        self.price_buckets = list(price_buckets)
+        self.unit_counts = unit_counts or {}
+        self.currency_counts = currency_counts or {}
+        self.version = version
+        self.computed_at = computed_at
+
+    def category_total(self, node):
+        """Products under the `CategoryTree` node `node` and its subtree."""
+        return sum(self.category_counts.get(pk, 0) for pk in node.descendant_ids)
+
+    def is_fresh(self):
+        return (
+            self.version == catalog_version()
+            and time.time() - self.computed_at < settings.CATALOG_FACETS_FRESH_SECONDS
+        )
+
+
+def price_bucket(edges):
+    """Expression numbering the bucket of `edges` each product's price is in."""
+    return models.Case(
+        *(models.When(price_base__lt=edge, then=n) for n, edge in enumerate(edges)),
+        default=len(edges),
+        output_field=models.IntegerField(),
+    )
+
+
+def in_price_range(min_price, max_price):
+    """Expression telling whether a product passes the price filter."""
+    condition = models.Q()
+    if min_price is not None:
+        condition &= models.Q(price_base__gte=min_price)
+    if max_price is not None:
+        condition &= models.Q(price_base__lt=max_price)
+    if not condition:
+        return models.Value(True, output_field=models.BooleanField())
+    return models.Case(
+        models.When(condition, then=True),
+        default=False,
+        output_field=models.BooleanField(),
+    )
+
+
+def compute_facets(params):
+    """
+    Count every facet of the catalog for `params` with one grouped query.
+
+    Products matching the search are grouped by category, unit, currency,
+    price bucket and whether they pass the price filter; each facet is then
+    summed from those groups under the filters it doesn't ignore.
+    """
+    version = catalog_version()
+    edges = [Decimal(edge) for edge in settings.CATALOG_PRICE_BUCKETS]
+    queryset = filter_catalog(
+        Product.objects.filter(available=True), {"q": params.get("q", "")}
+    )
+    groups = (
+        queryset.order_by()
+        .annotate(
+            bucket=price_bucket(edges),
+            in_price=in_price_range(*catalog_price_range(params)),
+        )
+        .values_list("category_id", "unit_measure", "currency", "bucket", "in_price")
+        .annotate(n=models.Count("id"))
+    )
+    category_ids = catalog_category_ids(params)
+    if category_ids is not None:
+        category_ids = set(category_ids)
+    total = 0
+    category_counts, unit_counts, currency_counts = Counter(), Counter(), Counter()
+    bucket_counts = [0] * (len(edges) + 1)
+    for category_id, unit, currency, bucket, in_price, n in groups:
+        in_categories = category_ids is None or category_id in category_ids
+        if in_categories:
+            bucket_counts[bucket] += n
+        if not in_price:
+            continue
+        category_counts[category_id] += n
+        if in_categories:
+            total += n
+            unit_counts[unit] += n
+            currency_counts[currency] += n
+    bounds = [Decimal(0), *edges, None]
+    price_buckets = [
+        (low, high, count)
+        for low, high, count in zip(bounds, bounds[1:], bucket_counts)
+    ]
+    return CatalogFacets(
+        total,
+        dict(category_counts),
+        version,
+        time.time(),
+        price_buckets=price_buckets,
+        unit_counts=dict(unit_counts),
+        currency_counts=dict(currency_counts),
+    )
+
+
+def facets_digest(params):
+    query = normalize_query(params, FACET_PARAMS)
+    return hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+
+
+def refresh_facets(params):
+    """Recompute the counts of `params` and cache them."""
+    digest = facets_digest(params)
+    try:
+        facets = compute_facets(params)
+        cache.set(
+            FACETS_KEY.format(digest=digest),
+            facets,
+            settings.CATALOG_FACETS_FRESH_SECONDS
+            + settings.CATALOG_FACETS_STALE_SECONDS,
+        )
+    finally:
+        cache.delete(REFRESH_KEY.format(digest=digest))
+    return facets
+
+
+def refresh_in_worker(params):
+    """Thread pool entry point around `refresh_facets`."""
+    close_old_connections()
+    try:
+        refresh_facets(params)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="catalog-facets"
+            )
+    return _executor
+
+
+def schedule_refresh(params):
+    """
+    Recompute the counts of `params` off the request path, once.
+
+    A short-lived cache lock keeps concurrent requests, in this process or
+    another, from queueing the same recomputation.
+    """
+    digest = facets_digest(params)
+    if not cache.add(
+        REFRESH_KEY.format(digest=digest), 1, settings.CATALOG_FACETS_FRESH_SECONDS
+    ):
+        return
+    params = {name: params.get(name, "") for name in FACET_PARAMS}
+    if settings.CATALOG_FACETS_ASYNC:
+        get_executor().submit(refresh_in_worker, params)
+    else:
+        refresh_facets(params)
+
+
+def cached_facets(params):
+    """
+    Return the cached counts of `params`, `None` when there are none.
+
+    Stale counts are returned as well, with a refresh scheduled.
+    """
+    facets = cache.get(FACETS_KEY.format(digest=facets_digest(params)))
+    if facets is not None and not facets.is_fresh():
+        schedule_refresh(params)
+    return facets
+
+
+def get_facets(params, wait=True):
+    """
+    Return the catalog counts of `params` with stale-while-revalidate.
+
+    Counts younger than `CATALOG_FACETS_FRESH_SECONDS`, computed at the
+    current catalog version, are returned as they are. Older ones, kept up
+    to `CATALOG_FACETS_STALE_SECONDS` longer, are still returned at once
+    while a refresh is scheduled, so a catalog edit never makes a visitor
+    wait for the counts.
+
+    :param params: Query parameters of the request.
+    :type params: django.http.QueryDict
+    :param wait: Whether to compute missing counts right away, or a callable
+        deciding it; otherwise a refresh is scheduled and `None` returned.
+    :rtype: CatalogFacets | None
+    """
+    facets = cached_facets(params)
+    if facets is not None:
+        return facets
+    if wait() if callable(wait) else wait:
+        return refresh_facets(params)
+    schedule_refresh(params)
+    return None
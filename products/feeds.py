@@ -0,0 +1,294 @@
+import gzip
+import json
+import os
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from django.templatetags.static import static
+from django.urls import reverse
+
+from products.models import Category, Product
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+MERCHANT_NS = "http://base.google.com/ns/1.0"
+SLUG_PLACEHOLDER = "__slug__"
+DEFAULT_IMAGE = "img/products/default-product.jpg"
+MANIFEST_NAME = "manifest.json"
+
+
+def _lastmod(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def _batched(pieces, size=500):
+    """Join generated XML fragments so a stream isn't one write per row."""
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer)
+
+
+def product_url_template(base_url):
+    """`Product.get_absolute_url` as a format string, reversed only once."""
+    path = reverse("products:product-detail", kwargs={"slug": SLUG_PLACEHOLDER})
+    return base_url + path.replace(SLUG_PLACEHOLDER, "{}")
+
+
+def available_products():
+    return Product.objects.filter(available=True)
+
+
+def section_of(size=None):
+    """Expression bucketing products into sections of `size` consecutive ids."""
+    size = size or settings.FEED_SECTION_SIZE
+    return models.ExpressionWrapper(
+        models.F("id") / size, output_field=models.IntegerField()
+    )
+
+
+def product_sections():
+    """
+    Summarize every non-empty product section in one grouped query.
+
+    Sections are fixed ranges of `FEED_SECTION_SIZE` ids, so a file never
+    exceeds the sitemap protocol's 50,000 URLs and an edit only invalidates
+    the section holding the edited product.
+
+    Checkout lowers `stock` with `QuerySet.update`, leaving `updated_at`
+    alone, so the products in stock are summarized too: their count and
+    the sum of their ids change whenever one sells out or is restocked.
+
+    :return: `count`, latest `updated_at` and `in_stock` per section number.
+    :rtype: dict[int, dict]
+    """
+    in_stock = models.Q(stock__gt=0)
+    rows = (
+        available_products()
+        .order_by()
+        .annotate(section=section_of())
+        .values("section")
+        .annotate(
+            count=models.Count("id"),
+            lastmod=models.Max("updated_at"),
+            in_stock_count=models.Count("id", filter=in_stock),
+            in_stock_ids=models.Sum("id", filter=in_stock),
+        )
+    )
+    return {
+        row["section"]: {
+            "count": row["count"],
+            "lastmod": row["lastmod"],
+            "in_stock": [row["in_stock_count"], row["in_stock_ids"] or 0],
+        }
+        for row in rows
+    }
+
+
+def category_summary():
+    return Category.objects.aggregate(
+        count=models.Count("id"), lastmod=models.Max("updated_at")
+    )
+
+
+def sitemap_index(location, sections, categories_lastmod=None, suffix=""):
+    """
+    Render the sitemap index pointing at the category and product sitemaps.
+
+    :param location: URL prefix the individual sitemaps are served under.
+    :param suffix: Appended to every file name, such as `".gz"`.
+    """
+    entries = [("sitemap-categories.xml", categories_lastmod)]
+    entries += [
+        (f"sitemap-products-{number}.xml", info["lastmod"])
+        for number, info in sorted(sections.items())
+    ]
+    body = "".join(
+        f"<sitemap><loc>{escape(location)}/{name}{suffix}</loc>"
+        + (f"<lastmod>{_lastmod(lastmod)}</lastmod>" if lastmod else "")
+        + "</sitemap>"
+        for name, lastmod in entries
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<sitemapindex xmlns="{SITEMAP_NS}">{body}</sitemapindex>\n'
+    )
+
+
+def category_sitemap(base_url, chunk_size=2000):
+    """Yield the category sitemap, built from `Category.get_absolute_url`."""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">'
+    categories = Category.objects.only("id", "slug", "updated_at").order_by("pk")
+    yield from _batched(
+        f"<url><loc>{escape(base_url + category.get_absolute_url())}</loc>"
+        f"<lastmod>{_lastmod(category.updated_at)}</lastmod></url>"
+        for category in categories.iterator(chunk_size=chunk_size)
+    )
+    yield "</urlset>\n"
+
+
+def product_sitemap(base_url, section, chunk_size=2000):
+    """Yield the sitemap of one product section, streaming its rows."""
+    url = product_url_template(base_url)
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">'
+    rows = (
+        available_products()
+        .filter(id__gte=section * settings.FEED_SECTION_SIZE)
+        .filter(id__lt=(section + 1) * settings.FEED_SECTION_SIZE)
+        .order_by("pk")
+        .values_list("slug", "updated_at")
+    )
+    yield from _batched(
+        f"<url><loc>{escape(url.format(slug))}</loc>"
+        f"<lastmod>{_lastmod(updated_at)}</lastmod></url>"
+        for slug, updated_at in rows.iterator(chunk_size=chunk_size)
+    )
+    yield "</urlset>\n"
+
+
+def merchant_feed(base_url, section, chunk_size=2000):
+    """
+    Yield a Google Merchant style RSS feed of one product section.
+
+    Rows are the named tuples of `Product.objects.cards(rows=True)`, read
+    straight from a server-side cursor where the database has one, so
+    memory stays flat whatever the size of the catalog.
+    """
+    url = product_url_template(base_url)
+    fallback_image = base_url + static(DEFAULT_IMAGE)
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<rss version="2.0" xmlns:g="{MERCHANT_NS}"><channel>'
+        f"<title>Hop &amp; Barley</title><link>{escape(base_url)}/</link>"
+        "<description>Hop &amp; Barley product feed</description>"
+    )
+    rows = (
+        available_products()
+        .filter(id__gte=section * settings.FEED_SECTION_SIZE)
+        .filter(id__lt=(section + 1) * settings.FEED_SECTION_SIZE)
+        .order_by("pk")
+        .cards("description", "stock", "category__name", rows=True)
+    )
+    yield from _batched(
+        _merchant_item(row, url, base_url, fallback_image)
+        for row in rows.iterator(chunk_size=chunk_size)
+    )
+    yield "</channel></rss>\n"
+
+
+def _merchant_item(row, url, base_url, fallback_image):
+    if row.image:
+        image_link = base_url + default_storage.url(row.image)
+    else:
+        image_link = fallback_image
+    availability = "in_stock" if row.stock else "out_of_stock"
+    return (
+        "<item>"
+        f"<g:id>{row.id}</g:id>"
+        f"<g:title>{escape(row.name)}</g:title>"
+        f"<g:description>{escape(row.description[:5000])}</g:description>"
+        f"<g:link>{escape(url.format(row.slug))}</g:link>"
+        f"<g:image_link>{escape(image_link)}</g:image_link>"
+        f"<g:price>{row.price} {escape(row.currency)}</g:price>"
+        f"<g:availability>{availability}</g:availability>"
+        f"<g:product_type>{escape(row.category__name)}</g:product_type>"
+        "<g:condition>new</g:condition>"
+        "</item>"
+    )
+
+
+def _write_gzip(path, chunks):
+    """Write `chunks` to `path` atomically, gzip-compressed."""
+    partial = f"{path}.partial"
+    with gzip.open(partial, "wt", encoding="utf-8") as stream:
+        for chunk in chunks:
+            stream.write(chunk)
+    os.replace(partial, path)
+
+
+def _signature(info):
+    """JSON-friendly `(count, lastmod, in_stock)` stored in the manifest."""
+    lastmod = info["lastmod"]
+    signature = {"count": info["count"], "lastmod": lastmod and lastmod.isoformat()}
+    if "in_stock" in info:
+        signature["in_stock"] = info["in_stock"]
+    return signature
+
+
+def build_feeds(directory, base_url, files_url=None, force=False):
+    """
+    Pre-build the sitemaps and merchant feeds as gzipped files.
+
+    A manifest records the `count` and latest `updated_at` of every section
+    written; later runs only rewrite sections whose signature changed, and
+    remove files of sections that no longer have products. Category edits
+    rebuild every merchant section since products carry the category name.
+
+    :param directory: Where to write the files.
+    :param base_url: Scheme and host prefixed to every URL.
+    :param files_url: URL the written files are served under, used by the
+        sitemap index; defaults to `base_url`.
+    :param force: Rebuild everything regardless of the manifest.
+    :return: Section numbers rebuilt and removed.
+    :rtype: dict
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    previous = {}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as stream:
+            previous = json.load(stream)
+    previous_sections = previous.get("sections", {})
+
+    summary = category_summary()
+    categories = _signature(summary)
+    categories_changed = categories != previous.get("categories")
+    if categories_changed:
+        _write_gzip(
+            os.path.join(directory, "sitemap-categories.xml.gz"),
+            category_sitemap(base_url),
+        )
+
+    sections = product_sections()
+    signatures = {str(n): _signature(info) for n, info in sections.items()}
+    rebuilt = []
+    for number in sorted(sections):
+        key = str(number)
+        if not categories_changed and previous_sections.get(key) == signatures[key]:
+            continue
+        _write_gzip(
+            os.path.join(directory, f"sitemap-products-{number}.xml.gz"),
+            product_sitemap(base_url, number),
+        )
+        _write_gzip(
+            os.path.join(directory, f"merchant-{number}.xml.gz"),
+            merchant_feed(base_url, number),
+        )
+        rebuilt.append(number)
+    removed = sorted(int(key) for key in previous_sections if key not in signatures)
+    for number in removed:
+        for name in (f"sitemap-products-{number}.xml.gz", f"merchant-{number}.xml.gz"):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    _write_gzip(
+        os.path.join(directory, "sitemap.xml.gz"),
+        [
+            sitemap_index(
+                files_url or base_url, sections, summary["lastmod"], suffix=".gz"
+            )
+        ],
+    )
+    with open(manifest_path, "w", encoding="utf-8") as stream:
+        json.dump({"categories": categories, "sections": signatures}, stream)
+    return {
+        "categories": categories_changed,
+        "rebuilt": rebuilt,
+        "removed": removed,
+    }
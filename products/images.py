@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from products.caching import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+FORMATS = {
+    "avif": {
+        "pil": "AVIF",
+        "ext": "avif",
+        "mime": "image/avif",
+        "options": {"quality": 55},
+    },
+    "webp": {
+        "pil": "WEBP",
+        "ext": "webp",
+        "mime": "image/webp",
+        "options": {"quality": 75, "method": 4},
+    },
+    "jpeg": {
+        "pil": "JPEG",
+        "ext": "jpg",
+        "mime": "image/jpeg",
+        "options": {"quality": 80, "optimize": True, "progressive": True},
+    },
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def enabled_formats():
+    """Configured derivative formats this Pillow build can encode."""
+    return [
+        name
+        for name in settings.IMAGE_DERIVATIVE_FORMATS
+        if name == "jpeg" or features.check(name)
+    ]
+
+
+def derivative_name(digest, width, fmt):
+    return f"{DERIVATIVES_DIR}/{digest[:2]}/{digest}/{width}.{FORMATS[fmt]['ext']}"
+
+
+def build_derivatives(field_file, storage=None):
+    """
+    Write resized copies of an uploaded image in every configured format.
+
+    Files are named after the SHA-256 of the original content, so
+    re-uploading the same picture reuses the existing derivatives and a
+    changed picture never collides with stale, cached URLs.
+
+    :param field_file: The `ImageField` file to process.
+    :return: A manifest suitable for the model's `image_derivatives` field.
+    :rtype: dict
+    """
+    storage = storage or default_storage
+    with storage.open(field_file.name, "rb") as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    width, height = image.size
+    widths = sorted({w for w in settings.IMAGE_DERIVATIVE_WIDTHS if w < width})
+    widths = widths or [width]
+    formats = enabled_formats()
+    for target in widths:
+        resized = image.copy()
+        resized.thumbnail((target, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            name = derivative_name(digest, target, fmt)
+            if storage.exists(name):
+                continue
+            spec = FORMATS[fmt]
+            mode = "RGBA" if has_alpha and fmt != "jpeg" else "RGB"
+            buffer = BytesIO()
+            resized.convert(mode).save(buffer, spec["pil"], **spec["options"])
+            storage.save(name, ContentFile(buffer.getvalue()))
+    return {
+        "source": field_file.name,
+        "hash": digest,
+        "width": width,
+        "height": height,
+        "widths": widths,
+        "formats": formats,
+    }
+
+
+def refresh_derivatives(model, pk):
+    """
+    Build the derivatives of one row's `image` and store their manifest.
+
+    The manifest is only written if the row still points at the same
+    image, so a newer upload processed concurrently always wins.
+    """
+    instance = model._default_manager.filter(pk=pk).only("id", "image").first()
+    if instance is None or not instance.image:
+        return None
+    try:
+        manifest = build_derivatives(instance.image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not build derivatives of %s", instance.image.name)
+        # Remember the failure so later saves don't retry the same file.
+        manifest = {"source": instance.image.name, "failed": True}
+    model._default_manager.filter(pk=pk, image=instance.image.name).update(
+        image_derivatives=manifest
+    )
+    bump_catalog_version()
+    return manifest
+
+
+def refresh_in_worker(model, pk):
+    """Thread pool entry point around `refresh_derivatives`."""
+    close_old_connections()
+    try:
+        refresh_derivatives(model, pk)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                thread_name_prefix="image-derivatives",
+            )
+    return _executor
+
+
+def schedule_derivatives(instance):
+    """
+    Queue derivative generation for a saved instance if its image changed.
+
+    Work starts once the surrounding transaction commits and runs in a
+    thread pool, off the request path, unless `IMAGE_DERIVATIVES_ASYNC`
+    is disabled.
+    """
+    image = instance.image
+    manifest = instance.image_derivatives or {}
+    if not image or manifest.get("source") == image.name:
+        return
+    model, pk = type(instance), instance.pk
+
+    def submit():
+        if settings.IMAGE_DERIVATIVES_ASYNC:
+            get_executor().submit(refresh_in_worker, model, pk)
+        else:
+            refresh_derivatives(model, pk)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,102 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework import generics
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from products.api.serializers import ProductSerializer
+from products.api.views import ProductListAPIView
+from products.benchmarks import measure, rolled_back
+from products.models import Category, Product
+
+
+class NaiveProductListAPIView(generics.ListAPIView):
+    """The textbook `ModelSerializer` listing the lean API is measured against."""
+
+    serializer_class = ProductSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+    page_size = 100
+
+    def get_queryset(self):
+        products = Product.objects.filter(available=True).select_related("category")
+        return products.order_by("-created_at", "-id")[: self.page_size]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of the catalog API against a naive "
+        "ModelSerializer listing. Seeded products are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory(HTTP_HOST="localhost")
+        page_size = options["page_size"]
+        variants = {
+            "naive": (
+                NaiveProductListAPIView.as_view(page_size=page_size),
+                "/api/products/",
+            ),
+            "lean": (
+                ProductListAPIView.as_view(),
+                f"/api/products/?page_size={page_size}",
+            ),
+            "lean-sparse": (
+                ProductListAPIView.as_view(),
+                f"/api/products/?page_size={page_size}&fields=id,name,price",
+            ),
+        }
+        results = []
+        with rolled_back():
+            self.seed(options["products"], random.Random(options["seed"]))
+            for name, (view, url) in variants.items():
+
+                def run():
+                    response = view(factory.get(url))
+                    response.render()
+
+                stats = measure(run, repeat=options["repeat"])
+                stats["rps"] = round(1000 / stats["p50"], 1) if stats["p50"] else None
+                results.append({"variant": name, **stats})
+                if not options["json"]:
+                    self.stdout.write(
+                        f"{name:<12} p50={stats['p50']:.2f}ms "
+                        f"p99={stats['p99']:.2f}ms rps={stats['rps']}"
+                    )
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "products": options["products"],
+                        "page_size": page_size,
+                        "results": results,
+                    }
+                )
+            )
+
+    @staticmethod
+    def seed(count, rng, batch_size=5000):
+        category = Category.objects.create(name="Bench", slug="bench-api")
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create(
+                Product(
+                    name=f"Bench product {n}",
+                    slug=f"bench-api-{n}",
+                    category=category,
+                    description=f"Benchmark product number {n}.",
+                    price=rng.randint(100, 10000) / 100,
+                    stock=rng.randint(0, 100),
+                )
+                for n in range(start, min(count, start + batch_size))
+            )
@@ -0,0 +1,108 @@
+import json
+import random
+import tracemalloc
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from products.benchmarks import measure, rolled_back
+from products.models import Category, Product
+
+
+def peak_memory(func, setup=None):
+    """Peak bytes Python allocated while calling `func`."""
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the latency and memory of one catalog page read as full "
+        "product rows, as `cards()` instances and as `cards(rows=True)` "
+        "named tuples, fetched alone and rendered as product cards. Seeded "
+        "products are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            action="append",
+            dest="page_sizes",
+            help="Products per page; repeatable (default: 24, 100 and 500).",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(available=True).order_by("-created_at", "-id")
+        variants = {
+            "full": products.select_related("category"),
+            "cards": products.cards(),
+            "card-rows": products.cards(rows=True),
+        }
+        request = RequestFactory(HTTP_HOST="localhost").get("/products/home/")
+        request.user = AnonymousUser()
+        results = []
+        with rolled_back():
+            self.seed(options["products"], random.Random(options["seed"]))
+            for page_size in options["page_sizes"] or [24, 100, 500]:
+                for name, queryset in variants.items():
+
+                    def fetch():
+                        return list(queryset.all()[:page_size])
+
+                    def render():
+                        render_to_string(
+                            "products/home.html", {"page_obj": fetch()}, request
+                        )
+
+                    row = {"variant": name, "page_size": page_size}
+                    # Cards are rendered afresh, not from the fragment cache.
+                    for stage, func, setup in (
+                        ("fetch", fetch, None),
+                        ("render", render, cache.clear),
+                    ):
+                        stats = measure(func, repeat=options["repeat"], setup=setup)
+                        row[stage] = {**stats, "peak_bytes": peak_memory(func, setup)}
+                    results.append(row)
+                    if not options["json"]:
+                        self.stdout.write(
+                            f"{name:<10} {page_size:>4}/page  "
+                            f"fetch p50={row['fetch']['p50']:8.2f}ms "
+                            f"peak={row['fetch']['peak_bytes'] / 1024:8.1f}KiB  "
+                            f"render p50={row['render']['p50']:8.2f}ms "
+                            f"peak={row['render']['peak_bytes'] / 1024:8.1f}KiB"
+                        )
+        if options["json"]:
+            self.stdout.write(
+                json.dumps({"products": options["products"], "results": results})
+            )
+
+    @staticmethod
+    def seed(count, rng, batch_size=5000):
+        category = Category.objects.create(name="Bench", slug="bench-cards")
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create(
+                Product(
+                    name=f"Bench product {n}",
+                    slug=f"bench-cards-{n}",
+                    category=category,
+                    # Long enough for skipping the column to show.
+                    description=f"Benchmark product number {n}. " * 40,
+                    price=rng.randint(100, 10000) / 100,
+                    stock=rng.randint(0, 100),
+                )
+                for n in range(start, min(count, start + batch_size))
+            )
@@ -0,0 +1,101 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from products.benchmarks import measure, rolled_back
+from products.models import Category, Product
+from products.search import get_search_backend, search_products
+
+NEEDLES = (
+    "citra mosaic cascade saaz centennial simcoe amarillo galaxy nelson "
+    "roasted tropical hazy resinous pine"
+).split()
+QUERIES = ("citra", "roasted malt", "tropical hazy", "pine resinous ale", "zzz")
+SYLLABLES = "ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu".split()
+
+
+def filler_vocabulary(rng, size=20000):
+    """Synthetic words that never collide with the benchmark queries."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=4)))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure catalog search latency while the product table grows. "
+        "Seeded products are rolled back when the run finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,100000,1000000",
+            help="Comma separated product counts to measure at.",
+        )
+        parser.add_argument(
+            "--matches",
+            type=int,
+            default=50,
+            help="Products mentioning the query terms, constant across sizes.",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        rng = random.Random(options["seed"])
+        vocabulary = filler_vocabulary(rng)
+        backend = type(get_search_backend()).__name__
+        results = []
+        with rolled_back():
+            category = Category.objects.create(name="Bench", slug="bench-search")
+            created = 0
+            for size in sizes:
+                created = self.grow(category, created, size, rng, vocabulary, options)
+                base = Product.objects.filter(available=True)
+                for query in QUERIES:
+
+                    def run():
+                        list(
+                            search_products(base, query)
+                            .order_by("-search_rank")
+                            .values_list("id", flat=True)[:24]
+                        )
+
+                    stats = measure(run, repeat=options["repeat"])
+                    results.append({"products": size, "query": query, **stats})
+                    if not options["json"]:
+                        self.stdout.write(
+                            f"{backend} {size:>9} {query!r:<22} "
+                            f"p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms"
+                        )
+        if options["json"]:
+            self.stdout.write(json.dumps({"backend": backend, "results": results}))
+
+    def grow(self, category, created, target, rng, vocabulary, options):
+        """Add products up to `target`, the first `--matches` mention needles."""
+        while created < target:
+            batch = []
+            for n in range(created, min(target, created + options["batch_size"])):
+                words = rng.choices(vocabulary, k=12)
+                if n < options["matches"]:
+                    words[rng.randrange(3)] = rng.choice(NEEDLES)
+                    words[rng.randrange(3, 12)] = rng.choice(NEEDLES + ["malt", "ale"])
+                batch.append(
+                    Product(
+                        name=" ".join(words[:3]).title(),
+                        slug=f"bench-search-{n}",
+                        category=category,
+                        description=" ".join(words) + ".",
+                        price=rng.randint(100, 10000) / 100,
+                        stock=rng.randint(0, 100),
+                    )
+                )
+            Product.objects.bulk_create(batch)
+            created += len(batch)
+        return created
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.feeds import build_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-build gzipped sitemaps and merchant feeds, rewriting only the "
+        "sections whose products changed since the last run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=str(settings.FEEDS_ROOT))
+        parser.add_argument("--base-url", default=settings.SITE_URL)
+        parser.add_argument(
+            "--files-url",
+            default=f"{settings.SITE_URL}/{settings.MEDIA_URL}feeds",
+            help="URL the written files are served under.",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Rebuild every section."
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = build_feeds(
+            options["output"],
+            options["base_url"].rstrip("/"),
+            files_url=options["files_url"].rstrip("/"),
+            force=options["force"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(result['rebuilt'])} product sections"
+                f"{' and the category sitemap' if result['categories'] else ''}, "
+                f"removed {len(result['removed'])} in {elapsed:.1f}s."
+            )
+        )
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from products.images import refresh_in_worker
+from products.models import Product
+
+MODELS = {"products": Product, "users": get_user_model()}
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image derivatives for existing uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=[*MODELS, "all"],
+            default="all",
+            help="Which uploads to process.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild even when a manifest for the current image exists.",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        models = (
+            MODELS.values() if options["model"] == "all" else [MODELS[options["model"]]]
+        )
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for model in models:
+                queued = 0
+                rows = (
+                    model._default_manager.exclude(image="")
+                    .exclude(image__isnull=True)
+                    .only("id", "image", "image_derivatives")
+                    .order_by("pk")
+                )
+                for row in rows.iterator(chunk_size=options["chunk_size"]):
+                    manifest = row.image_derivatives or {}
+                    if (
+                        not options["force"]
+                        and manifest.get("source") == row.image.name
+                    ):
+                        continue
+                    pool.submit(refresh_in_worker, model, row.pk)
+                    queued += 1
+                self.stdout.write(
+                    f"Queued {queued} {model._meta.verbose_name_plural} for derivatives."
+                )
+        self.stdout.write(self.style.SUCCESS("Image derivatives are up to date."))
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from products.caching import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the storefront page and fragment caches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters afterwards."
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        if options["json"]:
+            self.stdout.write(json.dumps(stats))
+        else:
+            for namespace, values in stats.items():
+                ratio = values["hit_ratio"]
+                self.stdout.write(
+                    f"{namespace:<10} hits={values['hits']} "
+                    f"misses={values['misses']} "
+                    f"hit_ratio={'n/a' if ratio is None else f'{ratio:.2%}'}"
+                )
+        if options["reset"]:
+            reset_cache_stats()
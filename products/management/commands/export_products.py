@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.transfer import FORMATS, detect_format, export_rows, open_text, write_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every product to a CSV or JSON Lines file (optionally .gz, or "
+        "- for stdout) in the format import_products reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--available-only",
+            action="store_true",
+            help="Skip products that aren't available.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        queryset = Product.objects.all()
+        if options["available_only"]:
+            queryset = queryset.filter(available=True)
+        rows = export_rows(queryset, chunk_size=options["chunk_size"])
+        started = time.perf_counter()
+        if path == "-":
+            self.stdout.ending = ""
+            write_rows(self.stdout, fmt, rows)
+            return
+        counted = _Counter(rows)
+        with open_text(path, "w") as stream:
+            write_rows(stream, fmt, counted)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {counted.count} products to {path} "
+                f"({counted.count / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
+
+
+class _Counter:
+    """Iterator wrapper counting the rows that pass through it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
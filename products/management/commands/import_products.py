@@ -0,0 +1,64 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.transfer import (
+    FORMATS,
+    ProductImporter,
+    detect_format,
+    open_text,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert products from a CSV or JSON Lines file (optionally .gz, or - "
+        "for stdin), matching existing products on slug. Each batch commits "
+        "on its own, so an interrupted import can simply be re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, or - for stdin.")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--create-categories",
+            action="store_true",
+            help="Create unknown category slugs instead of skipping their rows.",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=50000,
+            help="Report progress every N rows.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        importer = ProductImporter(
+            batch_size=options["batch_size"],
+            create_categories=options["create_categories"],
+        )
+        try:
+            stream = sys.stdin if path == "-" else open_text(path, "r")
+        except OSError as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+        with stream:
+            stats = importer.run(
+                read_rows(stream, fmt),
+                progress=self.report,
+                progress_every=options["progress_every"],
+            )
+        for line_number, message in importer.errors:
+            self.stderr.write(f"line {line_number}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {stats['rows']} rows, upserted {stats['upserted']}, "
+                f"skipped {stats['skipped']} ({stats['rate']:.0f} rows/s)."
+            )
+        )
+
+    def report(self, rows, rate):
+        self.stdout.write(f"{rows} rows ({rate:.0f} rows/s)")
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.currency import load_exchange_rates, read_exchange_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the exchange rates with a currency,rate CSV file, each rate "
+        "being what one unit of the currency is worth in BASE_CURRENCY, and "
+        "reprice the products of every currency whose rate changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with currency and rate columns.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            with open(path, encoding="utf-8", newline="") as stream:
+                rates = read_exchange_rates(stream)
+        except OSError as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+        except ValueError as exc:
+            raise CommandError(f"{path}: {exc}")
+        changed = load_exchange_rates(rates)
+        if not changed:
+            self.stdout.write("Exchange rates unchanged.")
+            return
+        self.stdout.write(
+            f"Loaded {len(rates)} rates to {settings.BASE_CURRENCY}; repriced "
+            f"products in {', '.join(changed)}."
+        )
@@ -0,0 +1,145 @@
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.benchmarks import percentile
+
+DEFAULT_PATHS = (
+    "/products/home/",
+    "/products/home/?sort=price_asc",
+    "/api/products/",
+    "/sitemap.xml",
+    "/static/css/main.css",
+)
+
+
+class Worker(threading.Thread):
+    """
+    Requests `paths` round-robin over one keep-alive connection until `stop`.
+
+    :ivar latencies: Milliseconds taken by every completed request.
+    :type latencies: list[float]
+    :ivar statuses: Responses per status code, `0` for connection errors.
+    :type statuses: collections.Counter
+    """
+
+    def __init__(self, base_url, paths, stop, offset=0):
+        super().__init__(daemon=True)
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.paths = paths
+        self.stop = stop
+        self.offset = offset
+        self.latencies = []
+        self.statuses = Counter()
+
+    def connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def run(self):
+        connection = self.connect()
+        n = self.offset
+        while not self.stop.is_set():
+            path = self.prefix + self.paths[n % len(self.paths)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers={"Accept-Encoding": "gzip"})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                self.statuses[0] += 1
+                connection.close()
+                connection = self.connect()
+                continue
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            self.statuses[response.status] += 1
+            if response.will_close:
+                connection.close()
+                connection = self.connect()
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test one or more running servers and compare their throughput, "
+        "for example the development server against the gunicorn production "
+        "profile: loadtest --url http://localhost:8001 --url http://localhost:8000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            dest="urls",
+            help="Base URL of a server to test; repeat to compare servers.",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help=f"Path to request; repeatable (default: {', '.join(DEFAULT_PATHS)}).",
+        )
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=15.0)
+        parser.add_argument("--warmup", type=float, default=2.0)
+        parser.add_argument("--json", action="store_true", help="Print JSON.")
+
+    def handle(self, *args, **options):
+        urls = options["urls"] or ["http://localhost:8000"]
+        paths = options["paths"] or list(DEFAULT_PATHS)
+        results = []
+        for url in urls:
+            if options["warmup"]:
+                self.run(url, paths, options["concurrency"], options["warmup"])
+            result = self.run(url, paths, options["concurrency"], options["duration"])
+            if not result["requests"]:
+                raise CommandError(f"No request to {url} succeeded.")
+            results.append(result)
+            if not options["json"]:
+                self.stdout.write(
+                    f"{url:<28} {result['rps']:>8.1f} req/s  "
+                    f"p50={result['p50']:.1f}ms p99={result['p99']:.1f}ms  "
+                    f"errors={result['errors']} statuses={result['statuses']}"
+                )
+        if options["json"]:
+            self.stdout.write(json.dumps({"paths": paths, "results": results}))
+        elif len(results) > 1:
+            baseline = results[0]["rps"]
+            for result in results[1:]:
+                self.stdout.write(
+                    f"{result['url']} serves {result['rps'] / baseline:.2f}x "
+                    f"the requests of {results[0]['url']}."
+                )
+
+    @staticmethod
+    def run(url, paths, concurrency, duration):
+        stop = threading.Event()
+        workers = [Worker(url, paths, stop, offset=n) for n in range(concurrency)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        time.sleep(duration)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        latencies = [ms for worker in workers for ms in worker.latencies]
+        statuses = sum((worker.statuses for worker in workers), Counter())
+        errors = statuses.pop(0, 0)
+        return {
+            "url": url,
+            "concurrency": concurrency,
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50": round(percentile(latencies, 0.5), 2) if latencies else None,
+            "p99": round(percentile(latencies, 0.99), 2) if latencies else None,
+        }
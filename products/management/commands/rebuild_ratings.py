@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_all_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored rating aggregates of every product from its reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products written per bulk update.",
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_all_ratings(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} products.")
+        )
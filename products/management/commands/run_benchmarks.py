@@ -0,0 +1,241 @@
+import itertools
+import json
+import math
+import subprocess
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from config.metrics import RequestMetrics
+from config.settings import PRODUCT_REVIEWS_PER_PAGE, PRODUCTS_QUERY_MAP
+from orders.models import Order
+from products.benchmarks import measure, rolled_back
+from products.catalog import filter_catalog
+from products.models import Category, Product, ProductReview
+from products.seeding import SEED_EMAIL_DOMAIN, SEED_PASSWORD
+from products.views import ProductListView
+
+# Query strings of the catalog filters every sort is combined with.
+LIST_FILTERS = {
+    "all": {},
+    "category": {"categories": "{root}"},
+    "category-direct": {"categories": "{leaf}", "subcategories": "0"},
+    "search": {"q": "citra"},
+    "search-category": {"q": "hops", "categories": "{root}"},
+    "price": {"min_price": "5", "max_price": "20"},
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the storefront's main pages against the current database, "
+        "usually filled by seed_catalog, and write the results as JSON. "
+        "Pass --compare with an earlier result file to spot regressions. "
+        "Writes made by the scenarios are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--auth-repeat",
+            type=int,
+            default=5,
+            help="Repeats of the password hashing registration and login.",
+        )
+        parser.add_argument(
+            "--only", help="Run scenarios whose name contains this text."
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep the page cache between calls instead of clearing it.",
+        )
+        parser.add_argument("--output", help="Write the JSON results here.")
+        parser.add_argument("--compare", help="Earlier JSON results to compare.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="p50 slowdown, as a fraction, reported as a regression.",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error when a scenario regressed.",
+        )
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            raise CommandError("No products; run seed_catalog first.")
+        client = Client(HTTP_HOST="localhost")
+
+        def setup():
+            # Every call comes from a new visitor, on a cold cache by default.
+            client.cookies.clear()
+            if not options["warm"]:
+                cache.clear()
+
+        results = []
+        with rolled_back():
+            for name, method, url, data, repeat in self.scenarios(options):
+                if options["only"] and options["only"] not in name:
+                    continue
+                request = self.request(client, method, url, data)
+                setup()
+                metrics = RequestMetrics()
+                with connection.execute_wrapper(metrics):
+                    status = request().status_code
+                stats = measure(request, repeat=repeat, setup=setup)
+                results.append(
+                    {
+                        "scenario": name,
+                        "status": status,
+                        "queries": metrics.queries,
+                        **stats,
+                    }
+                )
+                self.stdout.write(
+                    f"{name:<40} {status} q={metrics.queries:<3} "
+                    f"p50={stats['p50']:8.2f}ms p95={stats['p95']:8.2f}ms"
+                )
+
+        report = {"meta": self.meta(options), "results": results}
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options["compare"]:
+            regressions = self.compare(options["compare"], results, options)
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{regressions} scenarios regressed.")
+
+    @staticmethod
+    def request(client, method, url, data):
+        if method == "get":
+            return lambda: client.get(url, data)
+        if callable(data):
+            return lambda: client.post(url, data())
+        return lambda: client.post(url, data)
+
+    def scenarios(self, options):
+        """Yield `(name, method, url, data, repeat)` of every scenario."""
+        repeat = options["repeat"]
+        products = Product.objects.filter(available=True)
+        leaf = products.select_related("category").order_by("pk").first().category
+        root = leaf
+        while root.parent_id:
+            root = root.parent
+
+        list_url = reverse("products:product-list")
+        for (filter_name, params), sort in itertools.product(
+            LIST_FILTERS.items(), PRODUCTS_QUERY_MAP
+        ):
+            params = {
+                key: value.format(root=root.slug, leaf=leaf.slug)
+                for key, value in params.items()
+            }
+            # 90% of the way through the results, a deep OFFSET.
+            matches = filter_catalog(products, params).count()
+            deep = max(1, int(math.ceil(matches / ProductListView.paginate_by) * 0.9))
+            params["sort"] = sort
+            name = f"list/{filter_name}/{sort}"
+            yield f"{name}/first", "get", list_url, params, repeat
+            yield f"{name}/deep", "get", list_url, {**params, "page": deep}, repeat
+            yield f"{name}/cursor", "get", list_url, {**params, "cursor": ""}, repeat
+        yield "list/search/relevance/first", "get", list_url, {"q": "citra"}, repeat
+
+        popular = products.order_by("-rating_count", "pk").first()
+        quiet = products.order_by("rating_count", "pk").first()
+        for label, product in (("popular", popular), ("unreviewed", quiet)):
+            url = reverse("products:product-detail", args=[product.slug])
+            yield f"detail/{label}", "get", url, {}, repeat
+        reviews_url = reverse("products:product-reviews", args=[popular.slug])
+        review_pages = math.ceil(
+            ProductReview.objects.filter(product=popular).count()
+            / PRODUCT_REVIEWS_PER_PAGE
+        )
+        yield "reviews/first", "get", reviews_url, {}, repeat
+        yield "reviews/last", "get", reviews_url, {"page": review_pages}, repeat
+
+        auth_repeat = options["auth_repeat"]
+        counter = itertools.count()
+
+        def registration():
+            n = next(counter)
+            return {
+                "username": f"bench-{n}",
+                "email": f"bench-{n}@{SEED_EMAIL_DOMAIN}",
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "password1": SEED_PASSWORD,
+                "password2": SEED_PASSWORD,
+            }
+
+        register_url = reverse("users:register")
+        yield "auth/register", "post", register_url, registration, auth_repeat
+        user = (
+            get_user_model()
+            .objects.filter(email__endswith=f"@{SEED_EMAIL_DOMAIN}")
+            .first()
+        )
+        if user:
+            credentials = {"username": user.email, "password": SEED_PASSWORD}
+            login_url = reverse("users:login")
+            yield "auth/login", "post", login_url, credentials, auth_repeat
+
+    def meta(self, options):
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "warm_cache": options["warm"],
+            "repeat": options["repeat"],
+            "counts": {
+                "categories": Category.objects.count(),
+                "products": Product.objects.count(),
+                "reviews": ProductReview.objects.count(),
+                "users": get_user_model().objects.count(),
+                "orders": Order.objects.count(),
+            },
+        }
+
+    def compare(self, path, results, options):
+        """Print the p50 change of every scenario against `path`."""
+        with open(path, encoding="utf-8") as stream:
+            baseline = {row["scenario"]: row for row in json.load(stream)["results"]}
+        regressions = 0
+        self.stdout.write(f"\nCompared with {path}:")
+        for row in results:
+            before = baseline.get(row["scenario"])
+            if not before or not before["p50"]:
+                continue
+            change = row["p50"] / before["p50"] - 1
+            flag = ""
+            if change > options["threshold"]:
+                regressions += 1
+                flag = "  REGRESSED"
+            if row["queries"] > before["queries"]:
+                regressions += not flag
+                flag += f"  queries {before['queries']} -> {row['queries']}"
+            self.stdout.write(
+                f"{row['scenario']:<40} {before['p50']:8.2f}ms -> "
+                f"{row['p50']:8.2f}ms ({change:+.0%}){flag}"
+            )
+        return regressions
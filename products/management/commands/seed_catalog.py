@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import Category
+from products.seeding import SEED_PREFIX, clear_seeded, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a reproducible synthetic catalog: a category "
+        "tree, products, users, skewed reviews and orders. Used by "
+        "run_benchmarks; seeded rows are removed with --clear."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=60)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--reviews",
+            type=int,
+            default=200,
+            help="Reviews of the most reviewed product; others get fewer.",
+        )
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously seeded rows first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            clear_seeded()
+        elif Category.objects.filter(slug__startswith=SEED_PREFIX).exists():
+            raise CommandError("The catalog is already seeded; pass --clear.")
+        if options["categories"] < 1:
+            raise CommandError("At least one category is needed.")
+        with transaction.atomic():
+            counts = seed_catalog(
+                categories=options["categories"],
+                products=options["products"],
+                users=options["users"],
+                reviews=options["reviews"],
+                orders=options["orders"],
+                seed=options["seed"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Seeded " + ", ".join(f"{n} {name}" for name, n in counts.items())
+            )
+        )
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+import products.models
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductReview = apps.get_model("products", "ProductReview")
+    histograms = {}
+    rows = (
+        ProductReview.objects.order_by()
+        .values_list("product_id", "rating")
+        .annotate(n=models.Count("id"))
+    )
+    for product_id, rating, n in rows:
+        if 1 <= rating <= 5:
+            histograms.setdefault(product_id, [0] * 5)[rating - 1] = n
+    for product_id, histogram in histograms.items():
+        count = sum(histogram)
+        total = sum(star * n for star, n in enumerate(histogram, start=1))
+        Product.objects.filter(pk=product_id).update(
+            rating_avg=(Decimal(total) / Decimal(count)).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            ),
+            rating_count=count,
+            rating_histogram=histogram,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_productreview_title_alter_product_currency_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_histogram",
+            field=models.JSONField(default=products.models.empty_rating_histogram),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["available", "-rating_avg"], name="product_available_rating_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_product_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_available_rating_idx",
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["-created_at", "-id"],
+                name="product_available_new_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["price", "id"],
+                name="product_available_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["-rating_avg", "-id"],
+                name="product_available_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["category", "-created_at", "-id"],
+                name="product_cat_new_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["category", "price", "id"],
+                name="product_cat_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["category", "-rating_avg", "-id"],
+                name="product_cat_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productreview",
+            index=models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_latest_idx",
+            ),
+        ),
+    ]
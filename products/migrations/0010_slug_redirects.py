@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlugRedirect",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("model_label", models.CharField(max_length=100)),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("old_slug", models.SlugField(max_length=100)),
+                ("slug", models.SlugField(max_length=100)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["model_label", "object_id"],
+                        name="slug_redirect_object_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model_label", "old_slug"), name="slug_redirect_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+from products.text import shorten_description
+
+BATCH_SIZE = 2000
+
+
+def backfill_short_descriptions(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    rows = (
+        Product.objects.order_by("pk")
+        .values_list("pk", "description")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for pk, description in rows:
+        batch.append(Product(pk=pk, short_description=shorten_description(description)))
+        if len(batch) >= BATCH_SIZE:
+            Product.objects.bulk_update(batch, ["short_description"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["short_description"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_slug_redirects"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="short_description",
+            field=models.CharField(blank=True, editable=False, max_length=33),
+        ),
+        migrations.RunPython(backfill_short_descriptions, migrations.RunPython.noop),
+    ]
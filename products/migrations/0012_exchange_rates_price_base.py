@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:16
+
+from django.db import migrations, models
+
+
+def backfill_price_base(apps, schema_editor):
+    # No exchange rate is loaded yet, so every price converts at 1.
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(price_base=models.F("price"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_product_short_description"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("currency", models.CharField(max_length=3, unique=True)),
+                ("rate", models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                "verbose_name": "Exchange Rate",
+                "verbose_name_plural": "Exchange Rates",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_available_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_cat_price_idx",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="price_base",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=12
+            ),
+        ),
+        migrations.RunPython(backfill_price_base, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["price_base", "id"],
+                name="product_base_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["category", "price_base", "id"],
+                name="product_cat_base_price_idx",
+            ),
+        ),
+    ]
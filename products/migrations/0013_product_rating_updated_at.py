@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_exchange_rates_price_base"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_updated_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.contrib.auth import get_user_model
-from django.db import models
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.utils.text import slugify
+from django.db import models, transaction
 from django.urls import reverse
 
+from products.currency import base_price, current_exchange_rates
+from products.slugs import allocate_slugs, assign_slugs, record_slug_changes
+from products.text import ELLIPSIS, SHORT_DESCRIPTION_LENGTH, shorten_description
+
+
+def empty_rating_histogram():
+    """Per-star review counts, index 0 holding the 1-star reviews."""
+    return [0] * 5
+
 
 class JournalizedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -14,28 +22,151 @@ class JournalizedModel(models.Model):
         ordering = ["-created_at"]
 
 
-class Category(JournalizedModel):
+class SluggedQuerySet(models.QuerySet):
+    """
+    Keeps slugs unique and redirected through the bulk methods, which skip
+    `save()`: `bulk_create` allocates missing slugs for the whole batch and
+    `bulk_update` of `slug` records redirects from the old slugs.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        return super().bulk_create(assign_slugs(objs), *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            updated = super().bulk_update(objs, fields, *args, **kwargs)
+            if "slug" in fields:
+                record_slug_changes(
+                    self.model,
+                    [
+                        (obj.pk, obj._saved_slug, obj.slug)
+                        for obj in objs
+                        if getattr(obj, "_saved_slug", None) not in (None, obj.slug)
+                    ],
+                )
+                for obj in objs:
+                    obj._saved_slug = obj.slug
+        return updated
+
+
+# The columns a product card shows, links with, or is fragment cached and
+# keyset paginated by; see `ProductQuerySet.cards`.
+CARD_FIELDS = (
+    "id",
+    "slug",
+    "name",
+    "short_description",
+    "price",
+    "currency",
+    "price_base",
+    "image",
+    "image_derivatives",
+    "rating_avg",
+    "rating_count",
+    "rating_version",
+    "created_at",
+    "updated_at",
+)
+
+
+class ProductQuerySet(SluggedQuerySet):
+    """
+    Also fills in `short_description` and `price_base` in the bulk methods,
+    which skip `Product.save()`.
+    """
+
+    def cards(self, *extra, rows=False):
+        """
+        Select only the `CARD_FIELDS` columns, plus the `extra` ones.
+
+        :param extra: More field names or lookups such as `"category__name"`.
+        :param rows: Return named tuples instead of `Product` instances. They
+            have no `__dict__` and skip model initialization and signals,
+            and `image` is the stored file name rather than a `FieldFile`.
+        """
+        fields = tuple(dict.fromkeys((*CARD_FIELDS, *extra)))
+        if rows:
+            return self.values_list(*fields, named=True)
+        return self.only(*fields)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        rates = current_exchange_rates({product.currency for product in objs})
+        for product in objs:
+            product.short_description = shorten_description(product.description)
+            product.price_base = base_price(product.price, product.currency, rates)
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            if "description" in update_fields:
+                update_fields = [*update_fields, "short_description"]
+            if {"price", "currency"} & set(update_fields):
+                update_fields = [*update_fields, "price_base"]
+            kwargs["update_fields"] = update_fields
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if "description" in fields:
+            for product in objs:
+                product.short_description = shorten_description(product.description)
+            fields = [*fields, "short_description"]
+        if {"price", "currency"} & set(fields):
+            rates = current_exchange_rates({product.currency for product in objs})
+            for product in objs:
+                product.price_base = base_price(product.price, product.currency, rates)
+            fields = [*fields, "price_base"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class StableSlugMixin:
+    """
+    Gives a model a unique slug derived from its name once, then keeps it.
+
+    Renaming leaves the slug, and so every link to the page, alone. Changing
+    the slug itself records a `SlugRedirect` from the old one.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_slug = instance.__dict__.get("slug")
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "slug" not in update_fields:
+            return super().save(*args, **kwargs)
+        if not self.slug:
+            self.slug = allocate_slugs(type(self), [self.name])[0]
+        old_slug = getattr(self, "_saved_slug", None)
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            if old_slug and old_slug != self.slug:
+                record_slug_changes(type(self), [(self.pk, old_slug, self.slug)])
+        self._saved_slug = self.slug
+
+
+class Category(StableSlugMixin, JournalizedModel):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
     parent = models.ForeignKey("self", on_delete=models.CASCADE, blank=True, null=True)
 
+    objects = SluggedQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Category"
         verbose_name_plural = "Categories"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
-        return f"/products/category/{self.slug}/"
+        """The catalog filtered to the category, which has no page of its own."""
+        return f"{reverse('products:product-list')}?categories={self.slug}"
 
 
-class Product(JournalizedModel):
+class Product(StableSlugMixin, JournalizedModel):
     """
     Represents a product in the inventory system.
 
@@ -46,22 +177,27 @@ class Product(JournalizedModel):
 
     :ivar name: The name of the product.
     :type name: str
-    :ivar slug: A unique slug identifier for the product.
+    :ivar slug: A unique slug identifier for the product, derived from the
+        name on creation and kept when the product is renamed.
     :type slug: str
     :ivar category: The category associated with the product.
     :type category: Category
     :ivar description: A detailed description of the product with a maximum of
         1000 characters.
-        >>The first sentence of the description to be less than 30 chars and
-        would be used as a short description for product card in the List
-        View being truncated by final comma.
-        >>Otherwise first 30 chars would be used with no regards to comma split.
     :type description: str
+    :ivar short_description: The blurb on the product card, computed from
+        `description` on every write: its first sentence if shorter than 30
+        characters, otherwise its first 30 characters and an ellipsis.
+    :type short_description: str
     :ivar price: The price of the product, encompassing up to 10 digits with
         2 decimal places.
     :type price: decimal.Decimal
     :ivar currency: The currency code for the product price (ISO 4217 format).
     :type currency: str
+    :ivar price_base: `price` converted to `BASE_CURRENCY` at the stored
+        `ExchangeRate`, which catalog sorting and price filters use. Kept in
+        sync on every write and repriced in bulk when the rates change.
+    :type price_base: decimal.Decimal
     :ivar stock: The quantity of the product currently available in stock.
     :type stock: int
     :ivar unit_measure: The unit of measure for the product, defaulting to "kg".
@@ -70,22 +206,88 @@ class Product(JournalizedModel):
     :type image: models.ImageField
     :ivar available: Indicates whether the product is available (defaults to True).
     :type available: bool
+    :ivar image_derivatives: Manifest of the resized copies of `image`
+        written by `products.images`.
+    :type image_derivatives: dict
+    :ivar rating_avg: Average review rating, kept in sync with `ProductReview`
+        rows by signals and rebuilt in bulk by `rebuild_ratings`.
+    :type rating_avg: decimal.Decimal
+    :ivar rating_count: Number of reviews left for the product.
+    :type rating_count: int
+    :ivar rating_histogram: Review counts per star, from 1 to 5.
+    :type rating_histogram: list[int]
+    :ivar rating_version: Bumped on every review change, for cache keys.
+    :type rating_version: int
+    :ivar rating_updated_at: When the rating aggregates last changed, which
+        `updated_at` does not follow; `None` until the first review.
+    :type rating_updated_at: datetime
     """
 
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     description = models.TextField(max_length=1000)
+    short_description = models.CharField(
+        max_length=SHORT_DESCRIPTION_LENGTH + len(ELLIPSIS),
+        blank=True,
+        editable=False,
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default="USD")
+    price_base = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
     stock = models.PositiveIntegerField()
     unit_measure = models.TextField(max_length=5, default="kg")
     image = models.ImageField(upload_to="product_images/", null=True, blank=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     available = models.BooleanField(default=True)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=empty_rating_histogram)
+    rating_version = models.PositiveIntegerField(default=0)
+    rating_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "product"
         verbose_name_plural = "products"
+        # Catalog access paths: listing always filters `available` and
+        # orders by one sort key plus the `id` tiebreaker. The indexes are
+        # partial on `available` since SQLite can't seek on a bare boolean.
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="product_available_new_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["price_base", "id"],
+                name="product_base_price_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["-rating_avg", "-id"],
+                name="product_available_rating_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="product_cat_new_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["category", "price_base", "id"],
+                name="product_cat_base_price_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["category", "-rating_avg", "-id"],
+                name="product_cat_rating_idx",
+                condition=models.Q(available=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -94,10 +296,43 @@ class Product(JournalizedModel):
         return reverse("products:product-detail", kwargs={"slug": self.slug})
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "description" in update_fields:
+            self.short_description = shorten_description(self.description)
+            if update_fields is not None:
+                update_fields = kwargs["update_fields"] = {
+                    *update_fields,
+                    "short_description",
+                }
+        if update_fields is None or {"price", "currency"} & set(update_fields):
+            self.price_base = base_price(self.price, self.currency)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "price_base"}
         super().save(*args, **kwargs)
 
 
+class ExchangeRate(JournalizedModel):
+    """
+    Value of one unit of a currency in `BASE_CURRENCY`, loaded from a file
+    by `load_exchange_rates`.
+
+    :ivar currency: ISO 4217 code of the currency.
+    :type currency: str
+    :ivar rate: What one unit of `currency` is worth in `BASE_CURRENCY`.
+    :type rate: decimal.Decimal
+    """
+
+    currency = models.CharField(max_length=3, unique=True)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        verbose_name = "Exchange Rate"
+        verbose_name_plural = "Exchange Rates"
+
+    def __str__(self):
+        return f"{self.currency} {self.rate}"
+
+
 class ProductReview(JournalizedModel):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="reviews"
@@ -112,3 +347,47 @@ class ProductReview(JournalizedModel):
     class Meta:
         verbose_name = "Product Review"
         verbose_name_plural = "Product Reviews"
+        indexes = [
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_latest_idx",
+            ),
+        ]
+
+
+class SlugRedirect(JournalizedModel):
+    """
+    A slug a product or category used to have, and the slug it has now.
+
+    Written by `products.slugs.record_slug_changes` and looked up by
+    `resolve_slug_redirect` when a slug URL doesn't match any row.
+
+    :ivar model_label: `app_label.model_name` of the renamed row.
+    :type model_label: str
+    :ivar object_id: Primary key of the renamed row.
+    :type object_id: int
+    :ivar old_slug: The slug the row no longer uses.
+    :type old_slug: str
+    :ivar slug: The row's current slug.
+    :type slug: str
+    """
+
+    model_label = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    old_slug = models.SlugField(max_length=100)
+    slug = models.SlugField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model_label", "old_slug"], name="slug_redirect_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["model_label", "object_id"], name="slug_redirect_object_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.old_slug} -> {self.slug}"
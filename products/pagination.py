@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, models
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination token can't be decoded for the ordering."""
+
+
+def keyset_ordering(sort):
+    """
+    Complete a `PRODUCTS_QUERY_MAP` ordering with an `id` tiebreaker.
+
+    The tiebreaker follows the direction of the sort key so a single
+    composite index can serve the whole `ORDER BY`.
+
+    :param sort: Ordering such as `"-created_at"` or `"price"`.
+    :return: The ordering followed by `"id"` or `"-id"`.
+    :rtype: tuple[str, str]
+    """
+    return sort, "-id" if sort.startswith("-") else "id"
+
+
+def estimate_count(queryset, exact=True):
+    """
+    Return the planner's row estimate for `queryset`.
+
+    PostgreSQL reports it from `EXPLAIN` without scanning the rows; other
+    databases fall back to an exact `COUNT(*)`, or to `None` when `exact`
+    is false.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count() if exact else None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CountedPaginator(Paginator):
+    """
+    `Paginator` that takes its row count instead of running `COUNT(*)`.
+
+    The count may come from a cache or a planner estimate and be somewhat
+    off: pages past the real end are empty and the last page may be cut
+    short, which the catalog tolerates until the count is refreshed.
+
+    :ivar approximate: Whether `count` is an estimate.
+    :type approximate: bool
+    """
+
+    def __init__(self, object_list, per_page, count=None, approximate=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+        self.approximate = approximate
+
+
+class CursorPage:
+    """
+    One page of keyset-paginated rows with opaque navigation tokens.
+
+    :ivar object_list: Rows of the page, model instances or `values()` dicts.
+    :type object_list: list
+    :ivar next_cursor: Token of the following page, `None` on the last one.
+    :type next_cursor: str | None
+    :ivar previous_cursor: Token of the preceding page, `None` on the first.
+    :type previous_cursor: str | None
+    :ivar total_estimate: Estimated row count, only filled in when asked for.
+    :type total_estimate: int | None
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total_estimate = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a queryset ordered by one field plus `id`.
+
+    Each page seeks past the last row of the previous one with a
+    `(key, id)` comparison, so deep pages cost the same as the first one
+    and no `COUNT(*)` or `OFFSET` is ever issued.
+
+    :ivar queryset: Filtered, unordered queryset to paginate.
+    :type queryset: QuerySet
+    :ivar ordering: Sort key such as `"-created_at"`; `id` is appended.
+    :type ordering: str
+    :ivar per_page: Number of rows per page.
+    :type per_page: int
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = keyset_ordering(ordering)
+        self.per_page = per_page
+        self.key = ordering.lstrip("-")
+        self.descending = ordering.startswith("-")
+        self.field = queryset.model._meta.get_field(self.key)
+
+    def encode_cursor(self, row, reverse=False):
+        key, pk = self._row_value(row, self.field.attname), self._row_value(row, "id")
+        if key is not None and not isinstance(key, (int, float, str)):
+            key = self.field.value_to_string(_Row(self.field.attname, key))
+        payload = json.dumps({"k": key, "i": pk, "r": reverse}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            key = self.field.to_python(payload["k"])
+            return key, int(payload["i"]), bool(payload["r"])
+        except (
+            binascii.Error,
+            KeyError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ) as exc:
+            raise InvalidCursor(token) from exc
+
+    def page(self, cursor=None, with_total=False):
+        """
+        Return the page after (or, for previous tokens, before) `cursor`.
+
+        :param cursor: Token from a previous page, `None` for the first page.
+        :param with_total: Whether to fill in `CursorPage.total_estimate`.
+        :raises InvalidCursor: If the token is malformed.
+        """
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            key, pk, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(key, pk, reverse))
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_flip(field) for field in ordering)
+        rows = list(queryset.order_by(*ordering)[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        page = CursorPage(
+            rows,
+            self,
+            self.encode_cursor(rows[-1]) if rows and has_next else None,
+            (
+                self.encode_cursor(rows[0], reverse=True)
+                if rows and has_previous
+                else None
+            ),
+        )
+        if with_total:
+            page.total_estimate = estimate_count(self.queryset)
+        return page
+
+    def _seek(self, key, pk, reverse):
+        lookup = "lt" if self.descending != reverse else "gt"
+        # The leading range condition keeps the seek sargable for the
+        # (key, id) index; the OR only resolves ties on the key.
+        return models.Q(**{f"{self.key}__{lookup}e": key}) & (
+            models.Q(**{f"{self.key}__{lookup}": key})
+            | models.Q(**{self.key: key, f"id__{lookup}": pk})
+        )
+
+    @staticmethod
+    def _row_value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+
+class _Row:
+    """Minimal stand-in so `Field.value_to_string` can serialize a raw value."""
+
+    def __init__(self, attname, value):
+        setattr(self, attname, value)
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
@@ -0,0 +1,126 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models
+from django.utils import timezone
+
+from products.models import Product, ProductReview, empty_rating_histogram
+
+RATING_QUANTUM = Decimal("0.01")
+
+
+def summarize(histogram):
+    """
+    Turn a per-star histogram into the stored `(rating_avg, rating_count)` pair.
+
+    :param histogram: Review counts per star, index 0 holding 1-star reviews.
+    :type histogram: list[int]
+    :return: Average rating rounded to two decimals and the total count.
+    :rtype: tuple[decimal.Decimal, int]
+    """
+    count = sum(histogram)
+    if not count:
+        return Decimal("0.00"), 0
+    total = sum(star * n for star, n in enumerate(histogram, start=1))
+    avg = (Decimal(total) / Decimal(count)).quantize(
+        RATING_QUANTUM, rounding=ROUND_HALF_UP
+    )
+    return avg, count
+
+
+def collect_histograms(product_ids=None):
+    """
+    Build rating histograms with a single grouped query over reviews.
+
+    :param product_ids: Restrict the scan to these products, or all products
+        with reviews when omitted.
+    :return: Mapping of product id to its per-star histogram.
+    :rtype: dict[int, list[int]]
+    """
+    reviews = ProductReview.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+    rows = (
+        reviews.order_by()
+        .values_list("product_id", "rating")
+        .annotate(n=models.Count("id"))
+    )
+    histograms = defaultdict(empty_rating_histogram)
+    for product_id, rating, n in rows:
+        if 1 <= rating <= 5:
+            histograms[product_id][rating - 1] = n
+    return histograms
+
+
+def refresh_product_ratings(product_ids):
+    """
+    Recompute the stored rating aggregates of the given products.
+
+    Uses `QuerySet.update` so neither `Product.save` nor `updated_at` are
+    touched by a review being added, edited or deleted; `rating_updated_at`
+    records the change instead.
+    """
+    product_ids = set(product_ids)
+    now = timezone.now()
+    histograms = collect_histograms(product_ids)
+    for product_id in product_ids:
+        histogram = histograms.get(product_id, empty_rating_histogram())
+        rating_avg, rating_count = summarize(histogram)
+        Product.objects.filter(pk=product_id).update(
+            rating_avg=rating_avg,
+            rating_count=rating_count,
+            rating_histogram=histogram,
+            rating_version=models.F("rating_version") + 1,
+            rating_updated_at=now,
+        )
+
+
+def rebuild_all_ratings(batch_size=1000):
+    """
+    Rebuild the rating aggregates of every product.
+
+    :return: Number of products whose stored aggregates changed.
+    :rtype: int
+    """
+    histograms = collect_histograms()
+    now = timezone.now()
+    changed = []
+    updated = 0
+    products = Product.objects.only(
+        "id", "rating_avg", "rating_count", "rating_histogram", "rating_version"
+    ).order_by("pk")
+    for product in products.iterator(chunk_size=batch_size):
+        histogram = histograms.get(product.pk, empty_rating_histogram())
+        rating_avg, rating_count = summarize(histogram)
+        if (
+            product.rating_avg == rating_avg
+            and product.rating_count == rating_count
+            and product.rating_histogram == histogram
+        ):
+            continue
+        product.rating_avg = rating_avg
+        product.rating_count = rating_count
+        product.rating_histogram = histogram
+        product.rating_version += 1
+        product.rating_updated_at = now
+        changed.append(product)
+        if len(changed) >= batch_size:
+            updated += _flush(changed)
+    updated += _flush(changed)
+    return updated
+
+
+def _flush(products):
+    Product.objects.bulk_update(
+        products,
+        [
+            "rating_avg",
+            "rating_count",
+            "rating_histogram",
+            "rating_version",
+            "rating_updated_at",
+        ],
+    )
+    flushed = len(products)
+    products.clear()
+    return flushed
@@ -0,0 +1,177 @@
+import re
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from products.models import Product
+
+FTS_TABLE = f"{Product._meta.db_table}_fts"
+SEARCH_CONFIG = "english"
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class BaseSearchBackend:
+    """
+    Full-text search over product `name` and `description`.
+
+    A backend narrows a product queryset down to the rows matching the
+    user's query and annotates them with a `search_rank`, where a higher
+    rank means a more relevant product.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Portable fallback for databases without a full-text index."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            models.Q(name__icontains=query) | models.Q(description__icontains=query)
+        ).annotate(
+            search_rank=models.Case(
+                models.When(name__icontains=query, then=models.Value(2.0)),
+                default=models.Value(1.0),
+                output_field=models.FloatField(),
+            )
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Search through the FTS5 table that mirrors `products_product`.
+
+    The virtual table and the triggers keeping it in sync with product
+    inserts, updates and deletes are created by migration `0006`. Every term
+    of the query is matched as a prefix and all terms must be present.
+    Relevance is BM25 with the name weighted above the description.
+    """
+
+    @staticmethod
+    def to_match_expression(query):
+        terms = WORD_RE.findall(query.lower())
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        expression = self.to_match_expression(query)
+        if not expression:
+            return queryset.none().annotate(
+                search_rank=models.Value(0.0, output_field=models.FloatField())
+            )
+        # A join on the FTS table lets SQLite run the MATCH once and compute
+        # bm25() per matching row; a correlated subquery would re-run it.
+        return queryset.extra(
+            select={"search_rank": f"-bm25({FTS_TABLE}, 10.0, 1.0)"},
+            tables=[FTS_TABLE],
+            where=[
+                f"{FTS_TABLE}.rowid = {Product._meta.db_table}.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[expression],
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Search through the weighted `search_vector` column on PostgreSQL.
+
+    The column is a stored generated `tsvector` (name weighted `A`,
+    description `B`) with a GIN index, both created by migration `0006`.
+    The query accepts web search syntax and is ranked with `ts_rank_cd`.
+    """
+
+    tsquery_sql = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    match_sql = f"{Product._meta.db_table}.search_vector @@ {tsquery_sql}"
+    rank_sql = f"ts_rank_cd({Product._meta.db_table}.search_vector, {tsquery_sql})"
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            RawSQL(self.match_sql, (query,), output_field=models.BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                self.rank_sql, (query,), output_field=models.FloatField()
+            )
+        )
+
+
+SQLITE_FTS_TRIGGERS = {
+    f"{FTS_TABLE}_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON {Product._meta.db_table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    f"{FTS_TABLE}_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON {Product._meta.db_table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    f"{FTS_TABLE}_update": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF name, description ON {Product._meta.db_table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+
+def ensure_sqlite_search_index(connection):
+    """
+    Restore the FTS5 sync triggers if a table rebuild dropped them.
+
+    SQLite schema changes that Django applies by remaking
+    `products_product` drop its triggers, which would silently stop the
+    FTS table from following product edits. Missing triggers are
+    recreated and the index is rebuilt from the product table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = %s OR tbl_name = %s",
+            [FTS_TABLE, Product._meta.db_table],
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            return False
+        missing = [
+            sql for name, sql in SQLITE_FTS_TRIGGERS.items() if name not in existing
+        ]
+        if not missing:
+            return False
+        for sql in missing:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend(using="default"):
+    """
+    Return the search backend configured for the given database alias.
+
+    `PRODUCTS_SEARCH_BACKEND` may hold a dotted path to a backend class;
+    otherwise the backend is picked from the database vendor.
+    """
+    path = getattr(settings, "PRODUCTS_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    vendor = connections[using].vendor
+    return VENDOR_BACKENDS.get(vendor, SimpleSearchBackend)()
+
+
+def search_products(queryset, query):
+    """Filter `queryset` down to products matching `query`, ranked by relevance."""
+    return get_search_backend(queryset.db).search(queryset, query)
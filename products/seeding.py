@@ -0,0 +1,238 @@
+import math
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.text import slugify
+
+from orders.models import Order, OrderItem
+from products.caching import bump_catalog_version
+from products.categories import invalidate_category_tree
+from products.models import Category, Product, ProductReview
+from products.ratings import rebuild_all_ratings
+
+SEED_PREFIX = "seed-"
+SEED_EMAIL_DOMAIN = "seed.example"
+SEED_PASSWORD = "seed-password"
+
+KINDS = ("Hops", "Malt", "Yeast", "Adjunct", "Kit", "Equipment")
+VARIETIES = (
+    "Citra Mosaic Cascade Saaz Centennial Simcoe Amarillo Galaxy Nelson "
+    "Magnum Pilsner Munich Vienna Crystal Chocolate Roasted Wheat Rye Oat "
+    "Belgian Kolsch Hefeweizen Lager Ale Porter Stout"
+).split()
+STYLES = (
+    "Pale Amber Golden Dark Hazy Classic Imperial Session Noble Tropical "
+    "Resinous Floral Toasted Smooth"
+).split()
+PHRASES = (
+    "Brewed with care.",
+    "Bright citrus and pine aroma.",
+    "Rich caramel and toffee notes.",
+    "Clean fermentation with a dry finish.",
+    "A staple of West Coast IPAs.",
+    "Adds body and head retention.",
+    "Ferments fast between 15 and 22 C.",
+    "Earthy, spicy and floral.",
+)
+# Review ratings skew towards the top of the scale, as on real shops.
+RATING_WEIGHTS = (5, 7, 15, 33, 40)
+
+
+def _batches(objects, size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_categories(count, rng, max_depth=3):
+    """Create a forest of `count` categories, about one in six a root."""
+    roots = max(1, count // 6)
+    categories = []
+    depth = {}
+    for n in range(count):
+        parent = None
+        if n >= roots:
+            parent = rng.choice([c for c in categories if depth[c.pk] < max_depth - 1])
+        name = f"{rng.choice(STYLES)} {rng.choice(KINDS)} {n}"
+        category = Category.objects.create(
+            name=name, slug=f"{SEED_PREFIX}{slugify(name)}", parent=parent
+        )
+        depth[category.pk] = depth[parent.pk] + 1 if parent else 0
+        categories.append(category)
+    return categories
+
+
+def seed_products(count, categories, rng, batch_size=5000):
+    """Bulk create `count` products spread over the leaf-most categories."""
+    parents = {category.parent_id for category in categories}
+    leaves = [category for category in categories if category.pk not in parents]
+    created = []
+
+    def build():
+        for n in range(count):
+            category = rng.choice(leaves)
+            name = (
+                f"{rng.choice(STYLES)} {rng.choice(VARIETIES)} "
+                f"{rng.choice(KINDS)} {n}"
+            )
+            yield Product(
+                name=name,
+                slug=f"{SEED_PREFIX}{slugify(name)}",
+                category=category,
+                description=" ".join(rng.sample(PHRASES, 3)),
+                price=Decimal(str(round(math.exp(rng.gauss(2.5, 0.8)), 2))),
+                stock=0 if rng.random() < 0.1 else rng.randint(1, 500),
+                available=rng.random() < 0.95,
+            )
+
+    for batch in _batches(build(), batch_size):
+        created += Product.objects.bulk_create(batch)
+    return created
+
+
+def seed_users(count, batch_size=5000):
+    """Bulk create users who all share `SEED_PASSWORD`, hashed once."""
+    password = make_password(SEED_PASSWORD)
+    users = (
+        get_user_model()(
+            username=f"{SEED_PREFIX}user-{n}",
+            email=f"user-{n}@{SEED_EMAIL_DOMAIN}",
+            password=password,
+            image="",
+        )
+        for n in range(count)
+    )
+    created = []
+    for batch in _batches(users, batch_size):
+        created += get_user_model().objects.bulk_create(batch)
+    return created
+
+
+def seed_reviews(products, users, max_per_product, rng, batch_size=5000):
+    """
+    Review products with a Zipf-like skew.
+
+    Products are ranked at random; the product of rank `r` gets about
+    `max_per_product / r ** 0.8` reviews, so a few products carry most of
+    them and the long tail has none, as on real catalogs.
+    """
+    ranked = rng.sample(products, len(products))
+
+    def build():
+        for rank, product in enumerate(ranked, start=1):
+            for _ in range(int(max_per_product / rank**0.8)):
+                rating = rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]
+                yield ProductReview(
+                    product=product,
+                    user=rng.choice(users),
+                    rating=rating,
+                    title=f"{rating} stars",
+                    comment=" ".join(rng.sample(PHRASES, 2)),
+                )
+
+    total = 0
+    for batch in _batches(build(), batch_size):
+        ProductReview.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def seed_orders(count, users, products, rng, days=90):
+    """
+    Place `count` orders spread evenly over the last `days` days.
+
+    Order and item rows are bulk created a day at a time; `created_at` is
+    set afterwards since `auto_now_add` ignores values given to
+    `bulk_create`.
+    """
+    statuses = [status for status, _ in Order.STATUSES]
+    now = timezone.now()
+    per_day, extra = divmod(count, days)
+    for day in range(days):
+        orders, lines = [], []
+        for _ in range(per_day + (day < extra)):
+            picked = rng.sample(products, min(len(products), rng.randint(1, 4)))
+            quantities = [rng.randint(1, 5) for _ in picked]
+            orders.append(
+                Order(
+                    user=rng.choice(users),
+                    status=rng.choice(statuses),
+                    total_price=sum(p.price * q for p, q in zip(picked, quantities)),
+                    shipping_address="Seeded order",
+                )
+            )
+            lines.append(list(zip(picked, quantities)))
+        if not orders:
+            continue
+        orders = Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price=product.price, quantity=q)
+            for order, items in zip(orders, lines)
+            for product, q in items
+        )
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            created_at=now - timedelta(days=day, hours=rng.randint(0, 23))
+        )
+
+
+def clear_seeded():
+    """Delete everything `seed_catalog` created."""
+    get_user_model().objects.filter(email__endswith=f"@{SEED_EMAIL_DOMAIN}").delete()
+    Category.objects.filter(slug__startswith=SEED_PREFIX).delete()
+    invalidate_category_tree()
+    bump_catalog_version()
+
+
+def seed_catalog(
+    categories=60,
+    products=10000,
+    users=1000,
+    reviews=200,
+    orders=5000,
+    seed=42,
+):
+    """
+    Fill the database with a reproducible synthetic shop.
+
+    Everything is bulk created, so signal driven aggregates are rebuilt
+    at the end: product ratings, sales rollups, the category tree and the
+    page cache. Seeded rows are recognizable by their `SEED_PREFIX` slugs and
+    `SEED_EMAIL_DOMAIN` emails, and removed by `clear_seeded`.
+
+    :param reviews: Reviews of the most reviewed product; the rest follow
+        a skewed distribution.
+    :return: Number of rows created per model.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    created_categories = seed_categories(categories, rng)
+    created_products = seed_products(products, created_categories, rng)
+    created_users = seed_users(users)
+    review_count = 0
+    if created_users and created_products:
+        review_count = seed_reviews(created_products, created_users, reviews, rng)
+        seed_orders(orders, created_users, created_products, rng)
+        call_command("rollup_sales", all=True, stdout=StringIO())
+    else:
+        orders = 0
+    rebuild_all_ratings()
+    invalidate_category_tree()
+    bump_catalog_version()
+    return {
+        "categories": len(created_categories),
+        "products": len(created_products),
+        "users": len(created_users),
+        "reviews": review_count,
+        "orders": orders,
+    }
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from products.caching import bump_catalog_version
+from products.categories import invalidate_category_tree
+from products.images import schedule_derivatives
+from products.models import Category, Product, ProductReview
+from products.ratings import refresh_product_ratings
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_reviewed_product(sender, instance, **kwargs):
+    """Keep the previous product so moving a review refreshes both sides."""
+    instance._previous_product_id = None
+    if instance.pk:
+        instance._previous_product_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("product_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=ProductReview)
+def update_ratings_on_review_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    product_ids = {instance.product_id}
+    previous = getattr(instance, "_previous_product_id", None)
+    if previous:
+        product_ids.add(previous)
+    refresh_product_ratings(product_ids)
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_ratings_on_review_delete(sender, instance, **kwargs):
+    refresh_product_ratings([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_category_tree_on_change(sender, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_cached_pages(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=get_user_model())
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_derivatives(instance)
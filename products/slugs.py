@@ -0,0 +1,176 @@
+import secrets
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.utils.text import slugify
+
+MAX_NUMBERED_SUFFIX = 20
+REDIRECT_CACHE_KEY = "slugs:redirect:{label}:{slug}"
+
+
+def base_slug(name, max_length):
+    """`slugify(name)`, trimmed so a `-<suffix>` still fits `max_length`."""
+    return slugify(name)[: max_length - 9].strip("-") or "item"
+
+
+def allocate_slugs(model, names, field="slug", reserved=()):
+    """
+    Generate unique slugs for a batch of names with a bounded number of queries.
+
+    Each name gets `slugify(name)`; names whose slug is taken, in the
+    table or earlier in the batch, get the first free `-2` ... `-20`
+    suffix, and past that a random one. The table is checked with one
+    query for the plain slugs and at most one more for the numbered
+    candidates, so memory and queries stay bounded by the batch rather
+    than by the size of the table.
+
+    :param model: Model whose `field` must stay unique.
+    :param names: Names to derive slugs from, in order.
+    :type names: list[str]
+    :param reserved: Slugs to treat as taken although they aren't saved yet.
+    :return: One slug per name, in the same order.
+    :rtype: list[str]
+    """
+    max_length = model._meta.get_field(field).max_length
+    manager = model._default_manager
+    bases = [base_slug(name, max_length) for name in names]
+    taken = set(reserved)
+    taken |= set(
+        manager.filter(**{f"{field}__in": set(bases)}).values_list(field, flat=True)
+    )
+    slugs = [None] * len(names)
+    clashing = []
+    for index, base in enumerate(bases):
+        if base in taken:
+            clashing.append(index)
+        else:
+            slugs[index] = base
+            taken.add(base)
+    if not clashing:
+        return slugs
+
+    candidates = {
+        f"{bases[index]}-{n}"
+        for index in clashing
+        for n in range(2, MAX_NUMBERED_SUFFIX + 1)
+    }
+    taken |= set(
+        manager.filter(**{f"{field}__in": candidates}).values_list(field, flat=True)
+    )
+    for index in clashing:
+        base = bases[index]
+        for n in range(2, MAX_NUMBERED_SUFFIX + 1):
+            candidate = f"{base}-{n}"
+            if candidate not in taken:
+                break
+        else:
+            candidate = f"{base}-{secrets.token_hex(4)}"
+        slugs[index] = candidate
+        taken.add(candidate)
+    return slugs
+
+
+def assign_slugs(objects, field="slug"):
+    """
+    Fill in the missing slugs of unsaved `objects` of one model.
+
+    Slugs are derived from `name` by `allocate_slugs`, avoiding the slugs
+    the batch already carries.
+
+    :rtype: list
+    """
+    objects = list(objects)
+    missing = [obj for obj in objects if not getattr(obj, field)]
+    if missing:
+        reserved = {getattr(obj, field) for obj in objects if getattr(obj, field)}
+        slugs = allocate_slugs(
+            type(missing[0]), [obj.name for obj in missing], field, reserved
+        )
+        for obj, slug in zip(missing, slugs):
+            setattr(obj, field, slug)
+    return objects
+
+
+def redirect_cache_key(model, slug):
+    return REDIRECT_CACHE_KEY.format(label=model._meta.label_lower, slug=slug)
+
+
+def record_slug_changes(model, changes):
+    """
+    Redirect the old slugs of rows whose slug changed to their new one.
+
+    Earlier redirects of the same rows are pointed at the new slug too, so
+    a redirect never chains, and redirects from a slug a row now uses are
+    dropped. Cached lookups are updated in place.
+
+    :param changes: `(pk, old_slug, new_slug)` of every changed row.
+    :type changes: list[tuple[int, str, str]]
+    """
+    if not changes:
+        return
+    SlugRedirect = apps.get_model("products", "SlugRedirect")
+    redirects = SlugRedirect.objects.filter(model_label=model._meta.label_lower)
+    new_slugs = {pk: new for pk, old, new in changes}
+    redirects.filter(old_slug__in=new_slugs.values()).delete()
+    redirects.filter(object_id__in=new_slugs).update(
+        slug=models.Case(
+            *(
+                models.When(object_id=pk, then=models.Value(slug))
+                for pk, slug in new_slugs.items()
+            ),
+            output_field=models.SlugField(),
+        )
+    )
+    earlier = list(
+        redirects.filter(object_id__in=new_slugs).values_list("old_slug", "slug")
+    )
+    created = [
+        SlugRedirect(
+            model_label=model._meta.label_lower,
+            object_id=pk,
+            old_slug=old,
+            slug=new,
+        )
+        for pk, old, new in changes
+    ]
+    # A slug handed out again by `allocate_slugs` may still have a redirect.
+    SlugRedirect.objects.bulk_create(
+        created,
+        update_conflicts=True,
+        unique_fields=["model_label", "old_slug"],
+        update_fields=["object_id", "slug", "updated_at"],
+    )
+    cache.delete_many([redirect_cache_key(model, slug) for slug in new_slugs.values()])
+    cache.set_many(
+        {
+            redirect_cache_key(model, old): new
+            for old, new in earlier + [(r.old_slug, r.slug) for r in created]
+        },
+        settings.SLUG_REDIRECT_CACHE_TIMEOUT,
+    )
+
+
+def resolve_slug_redirect(model, slug):
+    """
+    Return the slug that `slug` of `model` moved to, or `None`.
+
+    Answers, misses included, are cached for `SLUG_REDIRECT_CACHE_TIMEOUT`;
+    a database lookup is one probe of the `(model_label, old_slug)` unique
+    index.
+    """
+    key = redirect_cache_key(model, slug)
+    target = cache.get(key)
+    if target is None:
+        SlugRedirect = apps.get_model("products", "SlugRedirect")
+        rows = (
+            SlugRedirect.objects.filter(
+                model_label=model._meta.label_lower, old_slug=slug
+            )
+            .order_by()
+            .values_list("slug", flat=True)[:1]
+        )
+        target = next(iter(rows), "")
+        cache.set(key, target, settings.SLUG_REDIRECT_CACHE_TIMEOUT)
+    return target or None
@@ -0,0 +1,18 @@
+from django import template
+
+from products.currency import get_exchange_rates
+
+register = template.Library()
+
+
+@register.filter
+def from_base(amount, currency):
+    """
+    Convert a `BASE_CURRENCY` amount such as `Product.price_base` to
+    `currency` with the per-process memoized exchange rates::
+
+        {{ product.price_base|from_base:display_currency }}
+    """
+    if amount is None or not currency:
+        return amount
+    return get_exchange_rates().from_base(amount, currency)
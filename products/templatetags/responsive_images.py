@@ -0,0 +1,83 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from products.images import FORMATS, derivative_name
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 600px) 100vw, 320px"
+
+
+def _srcset(manifest, fmt):
+    return ", ".join(
+        f"{default_storage.url(derivative_name(manifest['hash'], width, fmt))} {width}w"
+        for width in manifest["widths"]
+    )
+
+
+@register.simple_tag
+def responsive_image(
+    image,
+    derivatives=None,
+    alt="",
+    css_class="",
+    sizes=DEFAULT_SIZES,
+    fallback="img/products/default-product.jpg",
+):
+    """
+    Render a `<picture>` serving the best resized copy of `image`.
+
+    Usage::
+
+        {% responsive_image product.image product.image_derivatives alt=product.name css_class="product-card__image" %}
+
+    Falls back to a plain `<img>` of the original upload while its
+    derivatives are still being generated, and to the `fallback` static
+    file when there is no upload at all.
+    """
+    if not image:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy">',
+            static(fallback),
+            alt,
+            css_class,
+        )
+    manifest = derivatives or {}
+    if manifest.get("source") != image.name or not manifest.get("hash"):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy">',
+            image.url,
+            alt,
+            css_class,
+        )
+    formats = manifest["formats"]
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (FORMATS[fmt]["mime"], _srcset(manifest, fmt), sizes)
+            for fmt in formats
+            if fmt != "jpeg"
+        ),
+    )
+    if "jpeg" in formats:
+        src = default_storage.url(
+            derivative_name(manifest["hash"], manifest["widths"][-1], "jpeg")
+        )
+        srcset = _srcset(manifest, "jpeg")
+    else:
+        src, srcset = image.url, ""
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        sources,
+        src,
+        srcset,
+        sizes,
+        manifest["width"],
+        manifest["height"],
+        alt,
+        css_class,
+    )
@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from config.settings import STOREFRONT_FRAGMENT_CACHE_TIMEOUT
+from products.caching import record_cache_access
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        value = cache.get(key)
+        record_cache_access("fragment", value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value, STOREFRONT_FRAGMENT_CACHE_TIMEOUT)
+        return value
+
+
+@register.tag
+def fragmentcache(parser, token):
+    """
+    Cache a template fragment and count hits and misses.
+
+    Usage::
+
+        {% fragmentcache "product-card" product.id product.updated_at %}
+            ...
+        {% endfragmentcache %}
+
+    Like Django's `{% cache %}` but with the timeout taken from
+    `STOREFRONT_FRAGMENT_CACHE_TIMEOUT`. Key fragments on values that
+    change with the content, such as `updated_at` and `rating_version`.
+    """
+    nodelist = parser.parse(("endfragmentcache",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least a fragment name."
+        )
+    fragment_name = bits[1].strip("\"'")
+    vary_on = [parser.compile_filter(bit) for bit in bits[2:]]
+    return FragmentCacheNode(nodelist, fragment_name, vary_on)
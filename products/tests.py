@@ -1,3 +1,1291 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+
+from config.middleware import QueryBudgetExceeded
+from config.routers import PIN_COOKIE, ReplicaRouter, replica_reads
+from products.api.serializers import ProductSerializer
+from products.caching import cache_stats
+from products.categories import get_category_tree
+from products.currency import (
+    get_exchange_rates,
+    invalidate_exchange_rates,
+    load_exchange_rates,
+)
+from products.facets import get_facets
+from products.feeds import build_feeds
+from products.images import derivative_name, refresh_derivatives
+from products.models import (
+    Category,
+    ExchangeRate,
+    Product,
+    ProductReview,
+    SlugRedirect,
+)
+from products.seeding import seed_catalog
+from products.slugs import allocate_slugs, resolve_slug_redirect
+from products.views import ProductListView
+
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Hops")
+        cls.user = get_user_model().objects.create_user(
+            username="brewer", email="brewer@example.com", password="secret-pass"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def make_product(cls, name, **kwargs):
+        fields = {
+            "category": cls.category,
+            "description": f"{name} for brewing.",
+            "price": Decimal("10.00"),
+            "stock": 10,
+        }
+        fields.update(kwargs)
+        return Product.objects.create(name=name, **fields)
+
+    def review(self, product, rating, user=None):
+        return ProductReview.objects.create(
+            product=product, user=user or self.user, rating=rating, comment="ok"
+        )
+
+
+class RatingAggregateTests(CatalogTestCase):
+    def test_review_create_update_delete_keep_aggregates(self):
+        product = self.make_product("Citra")
+        first = self.review(product, 5)
+        self.review(product, 2)
+
+        product.refresh_from_db()
+        self.assertEqual(product.rating_count, 2)
+        self.assertEqual(product.rating_avg, Decimal("3.50"))
+        self.assertEqual(product.rating_histogram, [0, 1, 0, 0, 1])
+
+        first.rating = 3
+        first.save()
+        product.refresh_from_db()
+        self.assertEqual(product.rating_avg, Decimal("2.50"))
+        self.assertEqual(product.rating_histogram, [0, 1, 1, 0, 0])
+
+        first.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.rating_count, 1)
+        self.assertEqual(product.rating_avg, Decimal("2.00"))
+
+    def test_moving_review_refreshes_both_products(self):
+        source = self.make_product("Mosaic")
+        target = self.make_product("Saaz")
+        review = self.review(source, 4)
+
+        review.product = target
+        review.save()
+
+        source.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual(source.rating_count, 0)
+        self.assertEqual(source.rating_avg, Decimal("0.00"))
+        self.assertEqual(target.rating_count, 1)
+
+    def test_rebuild_command_repairs_stale_aggregates(self):
+        product = self.make_product("Cascade")
+        self.review(product, 4)
+        Product.objects.filter(pk=product.pk).update(
+            rating_avg=0, rating_count=0, rating_histogram=[0] * 5
+        )
+
+        call_command("rebuild_ratings", stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.rating_count, 1)
+        self.assertEqual(product.rating_avg, Decimal("4.00"))
+
+    def test_rating_sort_reads_stored_column(self):
+        low = self.make_product("Pilsner Malt")
+        high = self.make_product("Maris Otter")
+        self.review(low, 1)
+        self.review(high, 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("products:product-list"), {"sort": "rating"}
+            )
+
+        self.assertEqual(list(response.context["page_obj"]), [high, low])
+        for query in queries.captured_queries:
+            self.assertNotIn("products_productreview", query["sql"])
+
+
+class SearchTests(CatalogTestCase):
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse("products:product-list"), {"q": query, **params}
+        )
+        return list(response.context["page_obj"].paginator.object_list)
+
+    def test_matches_name_and_description_ranked_by_relevance(self):
+        in_description = self.make_product(
+            "Maris Otter", description="Pairs well with citra hops."
+        )
+        in_name = self.make_product("Citra", description="Bright and tropical.")
+        self.make_product("Saaz", description="Noble and spicy.")
+
+        self.assertEqual(self.search("citra"), [in_name, in_description])
+
+    def test_follows_product_edits_and_prefixes(self):
+        product = self.make_product("Mosaic", description="Berry notes.")
+        self.assertEqual(self.search("mosa"), [product])
+
+        product.name = "Galaxy"
+        product.save()
+
+        self.assertEqual(self.search("mosaic"), [])
+        self.assertEqual(self.search("galaxy"), [product])
+
+    def test_explicit_sort_overrides_relevance(self):
+        cheap = self.make_product("Pale Ale Kit", price=Decimal("5.00"))
+        dear = self.make_product("Ale Yeast", price=Decimal("50.00"))
+
+        self.assertEqual(self.search("ale", sort="price_desc"), [dear, cheap])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.make_product("Citra")
+        self.assertEqual(self.search('"*'), [])
+
+
+class CursorPaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for n, price in enumerate(["3.00", "1.00", "3.00", "2.00", "3.00"]):
+            cls.make_product(f"Malt {n}", price=Decimal(price))
+
+    def walk(self, sort):
+        url = reverse("products:product-list")
+        response = self.client.get(url, {"sort": sort, "cursor": ""})
+        pages = [list(response.context["page_obj"])]
+        while response.context["page_obj"].next_cursor:
+            cursor = response.context["page_obj"].next_cursor
+            response = self.client.get(url, {"sort": sort, "cursor": cursor})
+            pages.append(list(response.context["page_obj"]))
+        backwards = []
+        while response.context["page_obj"].previous_cursor:
+            cursor = response.context["page_obj"].previous_cursor
+            response = self.client.get(url, {"sort": sort, "cursor": cursor})
+            backwards.insert(0, list(response.context["page_obj"]))
+        return pages, backwards
+
+    def test_cursor_pages_match_offset_order_for_every_sort(self):
+        for sort, ordering in [
+            ("new", ("-created_at", "-id")),
+            ("price_asc", ("price", "id")),
+            ("price_desc", ("-price", "-id")),
+            ("rating", ("-rating_avg", "-id")),
+        ]:
+            with self.subTest(sort=sort):
+                pages, backwards = self.walk(sort)
+                expected = list(Product.objects.order_by(*ordering))
+                self.assertEqual([p for page in pages for p in page], expected)
+                self.assertEqual(backwards, pages[:-1])
+
+    def test_cursor_pages_skip_count_query(self):
+        get_category_tree()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("products:product-list"), {"cursor": ""})
+        for query in queries.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_total_only_when_asked_and_bad_cursor_restarts(self):
+        url = reverse("products:product-list")
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        page = response.context["page_obj"]
+        self.assertIsNone(page.total_estimate)
+        self.assertIsNone(page.previous_cursor)
+
+        response = self.client.get(url, {"cursor": "", "count": "1"})
+        self.assertEqual(response.context["page_obj"].total_estimate, 5)
+
+
+class CatalogFacetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        aroma = Category.objects.create(name="Aroma", parent=self.category)
+        self.malt = Category.objects.create(name="Malt")
+        self.make_product("Citra", category=aroma)
+        self.make_product("Saaz")
+        self.make_product("Pilsner", category=self.malt)
+        self.make_product("Retired", available=False)
+
+    def test_counts_per_category_with_one_grouped_query(self):
+        tree = get_category_tree()
+        params = QueryDict(f"categories={self.category.slug}")
+        with self.assertNumQueries(1):
+            facets = get_facets(params)
+        self.assertEqual(facets.total, 2)
+        self.assertEqual(facets.category_total(tree.by_slug[self.category.slug]), 2)
+        self.assertEqual(facets.category_total(tree.by_slug[self.malt.slug]), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_facets(params).total, 2)
+        self.assertEqual(get_facets(QueryDict("q=citra")).total, 1)
+
+    def test_price_range_and_its_facets(self):
+        self.make_product("Cascade", price=Decimal("3.00"), unit_measure="g")
+        get_category_tree()
+        params = QueryDict(f"categories={self.category.slug}&min_price=5")
+        with self.assertNumQueries(1):
+            facets = get_facets(params)
+        self.assertEqual(facets.total, 2)
+        self.assertEqual(
+            facets.category_counts,
+            {self.category.pk: 1, self.category.pk + 1: 1, self.malt.pk: 1},
+        )
+        self.assertEqual(
+            [count for _, _, count in facets.price_buckets], [1, 0, 2, 0, 0, 0]
+        )
+        self.assertEqual(facets.price_buckets[-1][:2], (Decimal(100), None))
+        self.assertEqual(
+            (facets.unit_counts, facets.currency_counts), ({"kg": 2}, {"USD": 2})
+        )
+
+        response = self.client.get(
+            reverse("products:product-list"), {"min_price": "1", "max_price": "5"}
+        )
+        self.assertEqual([p.name for p in response.context["page_obj"]], ["Cascade"])
+        self.assertEqual(response.context["price_buckets"][0], (0, 5, 1))
+        self.assertContains(response, 'data-min-price="0" data-max-price="5"')
+        invalid = self.client.get(reverse("products:product-list"), {"min_price": "x"})
+        self.assertEqual(invalid.context["paginator"].count, 4)
+
+        # A bucket's bounds select exactly the products it counts.
+        self.make_product("Magnum", price=Decimal("5.00"))
+        low, high, count = get_facets(QueryDict("max_price=5")).price_buckets[0]
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            get_facets(QueryDict(f"min_price={low}&max_price={high}")).total, count
+        )
+
+    def test_pagination_links_keep_every_filter(self):
+        self.make_product("Cascade", price=Decimal("30.00"))
+        self.make_product("Simcoe", price=Decimal("40.00"))
+        self.make_product("Galaxy", price=Decimal("50.00"))
+        url = reverse("products:product-list")
+        params = {"min_price": "20", "subcategories": "0", "utm": "x"}
+
+        response = self.client.get(url, params)
+        self.assertContains(
+            response, 'href="?subcategories=0&amp;min_price=20&amp;page=2"'
+        )
+        second = self.client.get(url, {"min_price": "20", "page": "2"})
+        self.assertEqual([p.name for p in second.context["page_obj"]], ["Cascade"])
+        cursor = self.client.get(url, {**params, "cursor": ""})
+        next_cursor = cursor.context["page_obj"].next_cursor
+        self.assertContains(
+            cursor, f'href="?subcategories=0&amp;min_price=20&amp;cursor={next_cursor}"'
+        )
+
+    @override_settings(CATALOG_FACETS_ASYNC=False)
+    def test_stale_counts_are_served_while_refreshing(self):
+        self.assertEqual(get_facets(QueryDict()).total, 3)
+        self.make_product("Cascade")
+        with mock.patch("products.facets.schedule_refresh") as schedule:
+            self.assertEqual(get_facets(QueryDict()).total, 3)
+        schedule.assert_called_once()
+        self.assertEqual(get_facets(QueryDict()).total, 3)
+        self.assertEqual(get_facets(QueryDict()).total, 4)
+
+    def test_list_paginates_with_cached_counts(self):
+        url = reverse("products:product-list")
+        response = self.client.get(url, {"q": "citra"})
+        self.assertEqual(response.context["paginator"].count, 1)
+        counts = {node.slug: n for node, n in response.context["category_counts"]}
+        self.assertEqual(counts, {self.category.slug: 1, "aroma": 1, self.malt.slug: 0})
+
+    @override_settings(CATALOG_FACETS_ASYNC=False)
+    def test_large_catalogs_paginate_with_the_estimate_first(self):
+        url = reverse("products:product-list")
+        with (
+            mock.patch("products.views.PRODUCTS_APPROXIMATE_COUNT_THRESHOLD", 100),
+            mock.patch("products.views.estimate_count", return_value=5000),
+        ):
+            paginator = self.client.get(url).context["paginator"]
+        self.assertEqual((paginator.count, paginator.approximate), (5000, True))
+        # The refresh scheduled meanwhile cached the exact count.
+        paginator = self.client.get(url, {"sort": "new"}).context["paginator"]
+        self.assertEqual((paginator.count, paginator.approximate), (3, False))
+
+
+class CatalogIndexTests(CatalogTestCase):
+    """Every catalog query shape must be served by an index, without a sort."""
+
+    shapes = [
+        {"sort": sort, **extra}
+        for sort in ("new", "price_asc", "price_desc", "rating")
+        for extra in ({}, {"categories": "hops"})
+    ] + [
+        # A price range seeks the price indexes, in price order already.
+        {"sort": sort, **extra}
+        for sort in ("price_asc", "price_desc")
+        for extra in (
+            {"min_price": "5", "max_price": "20"},
+            {"categories": "hops", "min_price": "5"},
+        )
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for n in range(20):
+            cls.make_product(f"Hop {n}", available=bool(n % 4))
+
+    def catalog_queryset(self, params):
+        view = ProductListView()
+        view.setup(RequestFactory().get("/", params))
+        return view.get_queryset()[: view.paginate_by]
+
+    def assert_indexed(self, plan):
+        if connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan on products_product", plan)
+            self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?Sort\b")
+        else:
+            self.assertNotRegex(plan, r"SCAN products_product(?! USING)")
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_catalog_shapes_use_indexes(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+                cursor.execute("SET enable_sort = off")
+        for params in self.shapes:
+            with self.subTest(**params):
+                self.assert_indexed(self.catalog_queryset(params).explain())
+
+
+class ProductReviewsTests(CatalogTestCase):
+    def add_reviews(self, product, count):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                username=f"u{product.pk}-{n}", email=f"{product.pk}-{n}@x.io"
+            )
+            for n in range(count)
+        )
+        for n, user in enumerate(users):
+            self.review(product, n % 5 + 1, user=user)
+
+    def test_detail_query_count_does_not_grow_with_reviews(self):
+        few = self.make_product("Few Reviews")
+        many = self.make_product("Many Reviews")
+        self.add_reviews(few, 2)
+        self.add_reviews(many, 25)
+
+        for product, shown in ((few, 2), (many, 3)):
+            with self.subTest(product=product.name), self.assertNumQueries(2):
+                response = self.client.get(product.get_absolute_url())
+            self.assertEqual(len(response.context["reviews"]), shown)
+
+    def test_detail_shows_latest_reviews_first(self):
+        product = self.make_product("Citra")
+        self.add_reviews(product, 5)
+
+        response = self.client.get(product.get_absolute_url())
+
+        expected = list(product.reviews.order_by("-created_at", "-id")[:3])
+        self.assertEqual(response.context["reviews"], expected)
+
+    def test_all_reviews_are_paginated(self):
+        product = self.make_product("Mosaic")
+        self.add_reviews(product, 12)
+        url = reverse("products:product-reviews", args=[product.slug])
+
+        first = self.client.get(url)
+        second = self.client.get(url, {"page": 2})
+
+        self.assertEqual(len(first.context["reviews"]), 10)
+        self.assertEqual(len(second.context["reviews"]), 2)
+        missing = reverse("products:product-reviews", args=["missing"])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+
+class CategoryTreeTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.aroma = Category.objects.create(name="Aroma", parent=cls.category)
+        cls.noble = Category.objects.create(name="Noble", parent=cls.aroma)
+        cls.malt = Category.objects.create(name="Malt")
+        cls.citra = cls.make_product("Citra", category=cls.aroma)
+        cls.saaz = cls.make_product("Saaz", category=cls.noble)
+        cls.pilsner = cls.make_product("Pilsner", category=cls.malt)
+
+    def listed(self, **params):
+        response = self.client.get(reverse("products:product-list"), params)
+        return set(response.context["page_obj"].paginator.object_list)
+
+    def test_tree_paths_descendants_and_counts(self):
+        tree = get_category_tree()
+        hops = tree.by_id[self.category.pk]
+        noble = tree.by_slug["noble"]
+
+        self.assertEqual([n.name for n in tree], ["Hops", "Aroma", "Noble", "Malt"])
+        self.assertEqual(tree.ancestors(noble), [hops, tree.by_id[self.aroma.pk]])
+        self.assertEqual(
+            hops.descendant_ids, {self.category.pk, self.aroma.pk, self.noble.pk}
+        )
+        self.assertEqual((hops.product_count, hops.total_count), (0, 2))
+
+    def test_category_filter_expands_to_subcategories(self):
+        self.assertEqual(self.listed(categories="hops"), {self.citra, self.saaz})
+        self.assertEqual(
+            self.listed(categories="hops,malt", subcategories="0"), {self.pilsner}
+        )
+        self.assertEqual(
+            self.listed(categories="aroma,malt", subcategories="0"),
+            {self.citra, self.pilsner},
+        )
+        self.assertEqual(self.listed(categories="unknown"), set())
+
+    def test_tree_is_cached_until_categories_change(self):
+        get_category_tree()
+        with self.assertNumQueries(0):
+            tree = get_category_tree()
+        self.assertNotIn("lager", tree.by_slug)
+
+        Category.objects.create(name="Lager", parent=self.malt)
+
+        self.assertIn("lager", get_category_tree().by_slug)
+
+
+class StorefrontCacheTests(CatalogTestCase):
+    def test_anonymous_pages_are_cached_per_normalized_query(self):
+        self.make_product("Citra")
+        url = reverse("products:product-list")
+
+        first = self.client.get(url, {"categories": "hops,malt", "utm": "x"})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {"categories": "malt,hops", "sort": ""})
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.client.get(url, {"sort": "price_asc"})["X-Cache"], "MISS")
+
+    def test_empty_cursor_is_cached_apart_from_page_numbers(self):
+        for name in ("Citra", "Saaz", "Mosaic"):
+            self.make_product(name)
+        url = reverse("products:product-list")
+
+        numbered = self.client.get(url)
+        cursor = self.client.get(url + "?cursor=")
+        self.assertEqual(cursor["X-Cache"], "MISS")
+        self.assertIsNone(getattr(numbered.context["page_obj"], "next_cursor", None))
+        self.assertTrue(cursor.context["page_obj"].next_cursor)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(url + "?cursor=")["X-Cache"], "HIT")
+
+    def test_model_changes_invalidate_cached_pages(self):
+        product = self.make_product("Citra")
+        self.client.get(product.get_absolute_url())
+
+        self.review(product, 4)
+        response = self.client.get(product.get_absolute_url())
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "brewer")
+
+    def test_signed_in_users_bypass_page_cache(self):
+        self.client.force_login(self.user)
+        url = reverse("products:guides-recipes")
+
+        self.client.get(url)
+
+        self.assertNotIn("X-Cache", self.client.get(url))
+
+    def test_product_cards_are_keyed_on_rating_version(self):
+        product = self.make_product("Citra")
+        url = reverse("products:product-list")
+        self.client.get(url)
+        self.client.get(url, {"sort": "price_asc"})
+        self.assertEqual(cache_stats()["fragment"]["hits"], 1)
+
+        self.review(product, 5)
+        response = self.client.get(url, {"sort": "price_desc"})
+
+        self.assertContains(response, "5.0 of 5")
+        self.assertEqual(
+            cache_stats()["page"], {"hits": 0, "misses": 3, "hit_ratio": 0.0}
+        )
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, size=(800, 600)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "orange").save(buffer, "PNG")
+        return SimpleUploadedFile("hops.png", buffer.getvalue(), "image/png")
+
+    def test_saving_an_image_builds_hashed_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.make_product("Citra", image=self.upload())
+
+        product.refresh_from_db()
+        manifest = product.image_derivatives
+        self.assertEqual(manifest["source"], product.image.name)
+        self.assertEqual(manifest["widths"], [320, 640])
+        self.assertIn("webp", manifest["formats"])
+        for fmt in manifest["formats"]:
+            name = derivative_name(manifest["hash"], 320, fmt)
+            self.assertTrue(default_storage.exists(name), name)
+            with default_storage.open(name) as derivative:
+                self.assertEqual(Image.open(derivative).width, 320)
+
+    def test_uploads_are_served_in_development(self):
+        product = self.make_product("Citra", image=self.upload((40, 30)))
+        response = self.client.get(product.image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+
+    def test_same_content_reuses_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.make_product("Citra", image=self.upload())
+            second = self.make_product("Mosaic", image=self.upload())
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        self.assertEqual(
+            first.image_derivatives["hash"], second.image_derivatives["hash"]
+        )
+
+    def test_template_tag_emits_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.make_product("Citra", image=self.upload((200, 100)))
+        product.refresh_from_db()
+
+        html = Template(
+            "{% load responsive_images %}"
+            "{% responsive_image product.image product.image_derivatives alt='x' %}"
+        ).render(Context({"product": product}))
+
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(" 200w", html)
+        self.assertIn('width="200" height="100"', html)
+
+    def test_missing_upload_is_not_retried(self):
+        product = self.make_product("Citra")
+        Product.objects.filter(pk=product.pk).update(image="product_images/gone.png")
+
+        with self.assertLogs("products.images", "ERROR"):
+            refresh_derivatives(Product, product.pk)
+
+        product.refresh_from_db()
+        self.assertTrue(product.image_derivatives["failed"])
+
+
+class CatalogAPITests(CatalogTestCase):
+    url = reverse_lazy("api:product-list")
+
+    def test_payload_matches_model_serializer(self):
+        product = self.make_product("Citra", price=Decimal("5.90"))
+        request = APIRequestFactory().get("/")
+        expected = ProductSerializer(product, context={"request": request}).data
+
+        response = self.client.get(reverse("api:product-detail", args=[product.pk]))
+        self.assertEqual(response.json(), json.loads(json.dumps(expected)))
+        listed = self.client.get(self.url).json()["results"][0]
+        self.assertEqual(
+            listed, {k: v for k, v in response.json().items() if k != "description"}
+        )
+
+    def test_filters_match_storefront_in_one_query(self):
+        malts = Category.objects.create(name="Malts")
+        for i in range(5):
+            self.make_product(f"Citra {i}")
+            self.make_product(f"Pale {i}", category=malts)
+        get_category_tree()
+        query = "?categories=hops&sort=price_asc&page_size=3"
+
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url + query).json()
+        second = self.client.get(first["next"]).json()
+        api_ids = [row["id"] for row in first["results"] + second["results"]]
+        view = ProductListView()
+        view.setup(RequestFactory().get("/" + query))
+        self.assertEqual(api_ids, [p.id for p in view.get_queryset()][:6])
+        self.assertIsNone(second["next"])
+
+        search = self.client.get(self.url + "?q=pale&fields=id,name").json()
+        self.assertEqual(
+            {row["name"] for row in search["results"]}, {f"Pale {i}" for i in range(5)}
+        )
+        self.assertEqual(set(search["results"][0]), {"id", "name"})
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(
+            self.client.get(self.url + "?fields=id,secret").status_code, 400
+        )
+        self.assertEqual(self.client.get(self.url + "?cursor=nope").status_code, 400)
+        hidden = self.make_product("Citra", available=False)
+        response = self.client.get(reverse("api:product-detail", args=[hidden.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_follows_edits_and_ratings(self):
+        product = self.make_product("Citra")
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=hour_ago)
+        Category.objects.update(updated_at=hour_ago)
+        detail = reverse("api:product-detail", args=[product.pk])
+        response = self.client.get(detail)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+            304,
+        )
+        listing = self.client.get(self.url)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=listing["ETag"]).status_code,
+            304,
+        )
+
+        self.assertFalse(listing.has_header("Last-Modified"))
+
+        self.review(product, 4)
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+            200,
+        )
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=listing["ETag"]).status_code,
+            200,
+        )
+
+    def test_listing_etag_follows_products_leaving_it(self):
+        self.make_product("A")
+        newest = self.make_product("B")
+        listing = self.client.get(self.url)
+        newest.available = False
+        newest.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=listing["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["name"] for row in response.json()["results"]], ["A"])
+
+    def test_conditional_get_follows_exchange_rate_loads(self):
+        product = self.make_product("Euro", currency="EUR")
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=hour_ago)
+        Category.objects.update(updated_at=hour_ago)
+        detail = reverse("api:product-detail", args=[product.pk])
+        before = {url: self.client.get(url) for url in (detail, self.url)}
+
+        self.addCleanup(invalidate_exchange_rates)
+        load_exchange_rates({"EUR": Decimal("2")})
+        for url, response in before.items():
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+                200,
+            )
+            if response.has_header("Last-Modified"):
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                    ).status_code,
+                    200,
+                )
+        self.assertEqual(self.client.get(detail).json()["price_base"], "20.00")
+
+    def test_bench_api_command(self):
+        out = StringIO()
+        call_command(
+            "bench_api", products=30, page_size=10, repeat=2, json=True, stdout=out
+        )
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual(
+            [r["variant"] for r in results], ["naive", "lean", "lean-sparse"]
+        )
+        self.assertFalse(Product.objects.exists())
+
+
+class SlugTests(CatalogTestCase):
+    def test_slugs_are_unique_and_survive_renames(self):
+        first, second = self.make_product("Citra"), self.make_product("Citra")
+        self.assertEqual((first.slug, second.slug), ("citra", "citra-2"))
+        first.name = "Citra Cryo"
+        first.stock = 3
+        first.save()
+        first.refresh_from_db()
+        self.assertEqual(first.slug, "citra")
+        self.assertFalse(SlugRedirect.objects.exists())
+        self.assertEqual(Category.objects.create(name="Hops").slug, "hops-2")
+
+    def test_changed_slugs_redirect_to_the_current_page(self):
+        product = self.make_product("Citra")
+        product.slug = "citra-pellets"
+        product.save()
+        url = reverse("products:product-detail", args=["citra"])
+        response = self.client.get(url, {"ref": "mail"})
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], "/products/citra-pellets/?ref=mail")
+        response = self.client.get(reverse("products:product-reviews", args=["citra"]))
+        self.assertRedirects(
+            response,
+            reverse("products:product-reviews", args=["citra-pellets"]),
+            status_code=301,
+        )
+
+        product = Product.objects.get(pk=product.pk)
+        product.slug = "citra-t90"
+        product.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_slug_redirect(Product, "citra"), "citra-t90")
+            self.assertEqual(
+                resolve_slug_redirect(Product, "citra-pellets"), "citra-t90"
+            )
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolve_slug_redirect(Product, "saaz"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_slug_redirect(Product, "saaz"))
+        self.assertEqual(
+            self.client.get(
+                reverse("products:product-detail", args=["saaz"])
+            ).status_code,
+            404,
+        )
+
+    def test_bulk_methods_allocate_and_redirect_slugs(self):
+        self.make_product("Citra")
+        with self.assertNumQueries(3):
+            created = Product.objects.bulk_create(
+                Product(name=name, category=self.category, price=1, stock=1)
+                for name in ("Citra", "Citra", "Saaz")
+            )
+        self.assertEqual([p.slug for p in created], ["citra-2", "citra-3", "saaz"])
+
+        products = list(Product.objects.filter(slug__in=["citra-2", "saaz"]))
+        for product in products:
+            product.slug = f"{product.slug}-new"
+        Product.objects.bulk_update(products, ["slug"])
+        self.assertEqual(
+            dict(SlugRedirect.objects.values_list("old_slug", "slug")),
+            {"citra-2": "citra-2-new", "saaz": "saaz-new"},
+        )
+
+
+class ShortDescriptionTests(CatalogTestCase):
+    def test_short_description_follows_every_write_path(self):
+        product = self.make_product("Citra", description="Citrus aroma. Resinous.")
+        self.assertEqual(product.short_description, "Citrus aroma.")
+        product.description = "A long first sentence without any period at all"
+        product.save(update_fields=["description"])
+        product.refresh_from_db()
+        self.assertEqual(product.short_description, "A long first sentence without...")
+
+        product.description = "Bulk. Updated."
+        Product.objects.bulk_update([product], ["description"])
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name="Saaz",
+                    category=self.category,
+                    description="Noble.",
+                    price=1,
+                    stock=1,
+                )
+            ]
+        )
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "short_description")),
+            {"Citra": "Bulk.", "Saaz": "Noble."},
+        )
+
+    def test_catalog_cards_leave_the_description_in_the_database(self):
+        self.make_product("Citra", description="Citrus aroma. " + "Long. " * 100)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("products:product-list"))
+        self.assertContains(response, "Citrus aroma.")
+        self.assertNotContains(response, "Long.")
+        listing = [q["sql"] for q in queries if '"short_description"' in q["sql"]]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('"description"', listing[0])
+
+    def test_card_projection_is_shared_by_list_api_and_feed(self):
+        product = self.make_product("Citra", description="Citrus aroma. More.")
+        instance = Product.objects.cards().get()
+        self.assertEqual(
+            instance.get_deferred_fields(),
+            {"category_id", "description", "stock", "unit_measure", "available"}
+            | {"rating_histogram", "rating_updated_at"},
+        )
+        row = Product.objects.cards("category__name", rows=True).get()
+        self.assertEqual((row.slug, row.category__name), (product.slug, "Hops"))
+        self.assertFalse(hasattr(row, "__dict__"))
+
+        card = self.client.get(reverse("api:product-list") + "?fields=card,stock")
+        self.assertEqual(
+            set(card.json()["results"][0]),
+            {"id", "name", "slug", "short_description", "price", "currency"}
+            | {"price_base"}
+            | {"rating_avg", "rating_count", "image", "created_at", "updated_at"}
+            | {"stock"},
+        )
+
+
+class ExchangeRateTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        invalidate_exchange_rates()
+        self.addCleanup(invalidate_exchange_rates)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def load(self, text):
+        path = f"{self.tmp}/rates.csv"
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write("currency,rate\n" + text)
+        call_command("load_exchange_rates", path, stdout=StringIO())
+
+    def listed(self, **params):
+        response = self.client.get(reverse("products:product-list"), params)
+        return [product.name for product in response.context["page_obj"]]
+
+    def test_sorting_and_price_filters_compare_base_prices(self):
+        self.make_product("Dollar", price=Decimal("10.00"))
+        euro = self.make_product("Euro", price=Decimal("10.00"), currency="EUR")
+        self.make_product("Pound", price=Decimal("9.00"), currency="GBP")
+        self.load("EUR,1.10\nGBP,1.25\n")
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "price_base")),
+            {"Dollar": Decimal("10.00"), "Euro": Decimal("11.00"), "Pound": 11.25},
+        )
+        self.assertEqual(self.listed(sort="price_asc"), ["Dollar", "Euro"])
+        self.assertEqual(
+            self.listed(sort="price_desc", min_price="11"), ["Pound", "Euro"]
+        )
+
+        self.load("EUR,0.90\nGBP,1.25\n")
+        euro.refresh_from_db()
+        self.assertEqual(euro.price_base, Decimal("9.00"))
+        self.assertEqual(self.listed(sort="price_asc"), ["Euro", "Dollar"])
+        euro.price = Decimal("20.00")
+        euro.save(update_fields=["price"])
+        euro.refresh_from_db()
+        self.assertEqual(euro.price_base, Decimal("18.00"))
+
+        with self.assertRaises(CommandError):
+            self.load("EURO,1\n")
+
+    def test_stored_base_prices_ignore_a_stale_memo(self):
+        self.load("EUR,1.10\n")
+        self.assertEqual(get_exchange_rates().rate("EUR"), Decimal("1.10"))
+        # As if another process loaded new rates while this one's memo is
+        # still trusted.
+        ExchangeRate.objects.filter(currency="EUR").update(rate=Decimal("0.50"))
+        self.assertEqual(get_exchange_rates().rate("EUR"), Decimal("1.10"))
+
+        euro = self.make_product("Euro", price=Decimal("10.00"), currency="EUR")
+        self.assertEqual(euro.price_base, Decimal("5.00"))
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name="Bulk",
+                    slug="bulk",
+                    description="Bulk.",
+                    category=self.category,
+                    price=Decimal("4.00"),
+                    currency="EUR",
+                    stock=1,
+                )
+            ]
+        )
+        self.assertEqual(Product.objects.get(slug="bulk").price_base, Decimal("2.00"))
+
+    def test_display_currency_converts_without_a_query_per_card(self):
+        self.make_product("Citra", price=Decimal("10.00"))
+        self.make_product("Saaz", price=Decimal("12.00"))
+        self.load("EUR,1.25\n")
+        # The first conversion loads the rates; later ones use the memo.
+        self.client.get(
+            reverse("products:product-list"), {"currency": "EUR", "sort": "new"}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("products:product-list"), {"currency": "eur"}
+            )
+        self.assertContains(response, "8.00")
+        self.assertContains(response, "9.60")
+        self.assertFalse([q for q in queries if "products_exchangerate" in q["sql"]])
+        self.assertContains(
+            self.client.get(reverse("products:product-list"), {"currency": "XYZ"}),
+            "USD",
+        )
+
+    def test_display_in_the_product_currency_shows_its_own_price(self):
+        self.make_product("Yen", price=Decimal("1234.00"), currency="JPY")
+        self.load("JPY,0.0064\n")
+        response = self.client.get(
+            reverse("products:product-list"), {"currency": "JPY"}
+        )
+        self.assertContains(response, "1234.00")
+        self.assertNotContains(response, "1234.38")
+
+
+class ImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, name, text):
+        path = f"{self.tmp}/{name}"
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(text)
+        return path
+
+    def test_allocate_slugs_avoids_table_batch_and_reserved(self):
+        self.make_product("Citra")
+        self.assertEqual(
+            allocate_slugs(
+                Product, ["Citra", "Citra", "Saaz", "Mosaic"], reserved={"saaz"}
+            ),
+            ["citra-2", "citra-3", "saaz-2", "mosaic"],
+        )
+
+    def test_csv_import_upserts_in_batches_and_reports_errors(self):
+        existing = self.make_product("Citra", price=Decimal("1.00"))
+        self.review(existing, 5)
+        path = self.write(
+            "products.csv",
+            "slug,name,category,description,price,stock,available\n"
+            "citra,Citra,hops,Updated.,4.50,7,yes\n"
+            ",Citra,hops,Another citra.,3.00,2,\n"
+            ",Mosaic,hops,Fruity.,5,1,0\n"
+            ",Saaz,malts,Unknown category.,1,1,1\n"
+            ",Cascade,hops,Bad price.,cheap,1,1\n",
+        )
+        out, err = StringIO(), StringIO()
+
+        # Category map, then per batch: plain slugs, numbered slugs (only
+        # when one clashes) and the upsert itself.
+        with self.assertNumQueries(6):
+            call_command("import_products", path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertIn("Read 5 rows, upserted 3, skipped 2", out.getvalue())
+        self.assertIn("line 5: unknown category 'malts'", err.getvalue())
+        self.assertIn("line 6: price and stock must be numbers", err.getvalue())
+        existing.refresh_from_db()
+        self.assertEqual((existing.price, existing.stock), (Decimal("4.50"), 7))
+        self.assertEqual(existing.rating_count, 1)
+        self.assertEqual(
+            dict(Product.objects.values_list("slug", "available")),
+            {"citra": True, "citra-2": True, "mosaic": False},
+        )
+
+    def test_export_round_trips_through_jsonl(self):
+        self.make_product("Citra", price=Decimal("2.25"), stock=3)
+        self.make_product("Saaz", available=False)
+        path = f"{self.tmp}/products.jsonl.gz"
+        call_command("export_products", path, stdout=StringIO())
+        Product.objects.update(price=Decimal("9.99"), stock=0)
+
+        call_command("import_products", path, create_categories=True, stdout=StringIO())
+
+        self.assertEqual(
+            list(
+                Product.objects.order_by("slug").values_list(
+                    "slug", "price", "stock", "available"
+                )
+            ),
+            [
+                ("citra", Decimal("2.25"), 3, True),
+                ("saaz", Decimal("10.00"), 10, False),
+            ],
+        )
+        out = StringIO()
+        call_command("export_products", format="csv", available_only=True, stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines()[1],
+            "citra,Citra,hops,Citra for brewing.,2.25,USD,3,kg,True",
+        )
+
+
+@override_settings(FEED_SECTION_SIZE=2)
+class FeedTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [self.make_product(f"Hop {i}") for i in range(4)]
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return ElementTree.fromstring(b"".join(response.streaming_content))
+
+    def test_sitemaps_stream_sections_of_available_products(self):
+        Product.objects.filter(pk=self.products[1].pk).update(available=False)
+        response = self.client.get(reverse("sitemap"))
+        index = ElementTree.fromstring(response.content)
+        sections = sorted({p.pk // 2 for p in self.products})
+        self.assertEqual(
+            [loc.text for loc in index.iterfind(".//{*}loc")],
+            ["http://testserver/sitemap-categories.xml"]
+            + [f"http://testserver/sitemap-products-{n}.xml" for n in sections],
+        )
+        self.assertEqual(self.client.get(reverse("sitemap"))["X-Cache"], "HIT")
+
+        urls = []
+        for number in sections:
+            tree = self.stream(reverse("sitemap-products", args=[number]))
+            urls += [loc.text for loc in tree.iterfind(".//{*}loc")]
+        expected = [p for p in self.products if p != self.products[1]]
+        self.assertEqual(
+            urls, [f"http://testserver{p.get_absolute_url()}" for p in expected]
+        )
+        categories = self.stream(reverse("sitemap-categories"))
+        self.assertEqual(
+            [loc.text for loc in categories.iterfind(".//{*}loc")],
+            [f"http://testserver{self.category.get_absolute_url()}"],
+        )
+        self.assertEqual(
+            self.client.get(self.category.get_absolute_url()).status_code, 200
+        )
+
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get(reverse("sitemap-categories"))
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        tree = ElementTree.fromstring(body)
+        self.assertEqual(
+            [loc.text for loc in tree.iterfind(".//{*}loc")],
+            [f"http://testserver{self.category.get_absolute_url()}"],
+        )
+
+    def test_merchant_feed_items(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=0, name="Hop <&>")
+        tree = self.stream(reverse("merchant-feed", args=[product.pk // 2]))
+        item = next(
+            item
+            for item in tree.iter("item")
+            if item.findtext("{*}id") == str(product.pk)
+        )
+        self.assertEqual(item.findtext("{*}title"), "Hop <&>")
+        self.assertEqual(item.findtext("{*}price"), "10.00 USD")
+        self.assertEqual(item.findtext("{*}availability"), "out_of_stock")
+        self.assertEqual(item.findtext("{*}product_type"), "Hops")
+
+    def test_build_feeds_only_rewrites_changed_sections(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sections = sorted({p.pk // 2 for p in self.products})
+
+        first = build_feeds(directory, "https://shop.example", "https://cdn.example")
+        self.assertEqual(first["rebuilt"], sections)
+        with gzip.open(f"{directory}/sitemap.xml.gz") as f:
+            locations = [loc.text for loc in ElementTree.parse(f).iterfind(".//{*}loc")]
+        self.assertEqual(
+            locations,
+            ["https://cdn.example/sitemap-categories.xml.gz"]
+            + [f"https://cdn.example/sitemap-products-{n}.xml.gz" for n in sections],
+        )
+        self.assertEqual(build_feeds(directory, "https://shop.example")["rebuilt"], [])
+
+        edited = self.products[3]
+        edited.description = "Changed."
+        edited.save()
+        self.assertEqual(
+            build_feeds(directory, "https://shop.example")["rebuilt"],
+            [edited.pk // 2],
+        )
+
+        sold_out = self.products[2]
+        # As checkout does, without touching `updated_at`.
+        Product.objects.filter(pk=sold_out.pk).update(stock=0)
+        self.assertEqual(
+            build_feeds(directory, "https://shop.example")["rebuilt"],
+            [sold_out.pk // 2],
+        )
+        with gzip.open(f"{directory}/merchant-{sold_out.pk // 2}.xml.gz") as f:
+            items = ElementTree.parse(f).iterfind(".//item")
+            availability = {
+                item.findtext("{*}id"): item.findtext("{*}availability")
+                for item in items
+            }
+        self.assertEqual(availability[str(sold_out.pk)], "out_of_stock")
+
+        Product.objects.filter(pk__in=[p.pk for p in self.products[:2]]).delete()
+        result = build_feeds(directory, "https://shop.example")
+        self.assertIn(self.products[0].pk // 2, result["removed"])
+        with gzip.open(f"{directory}/sitemap-products-{edited.pk // 2}.xml.gz") as f:
+            self.assertIn(
+                f"https://shop.example{edited.get_absolute_url()}".encode(), f.read()
+            )
+
+
+class RequestMetricsTests(CatalogTestCase):
+    def test_sampled_requests_report_server_timing(self):
+        self.make_product("Citra")
+        with self.assertLogs("config.metrics", "INFO") as logs:
+            response = self.client.get(reverse("products:product-list"))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^sql;dur=[\d.]+;desc="4 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "products:product-list")
+        self.assertEqual(record["queries"], 4)
+        self.assertGreater(record["template_ms"], 0)
+
+        with override_settings(REQUEST_METRICS_SAMPLE_RATE=0):
+            response = self.client.get(reverse("products:product-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(QUERY_BUDGETS={"products:product-list": 3})
+    def test_query_budgets_raise_when_strict_and_warn_otherwise(self):
+        self.make_product("Citra")
+        url = reverse("products:product-list")
+        with self.assertRaisesMessage(
+            QueryBudgetExceeded, "ran 4 queries, over its budget of 3"
+        ):
+            self.client.get(url)
+
+        cache.clear()
+        with (
+            override_settings(QUERY_BUDGET_STRICT=False),
+            self.assertLogs("config.metrics", "WARNING") as logs,
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertIn("over its budget of 3", logs.output[-1])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DATABASE_REPLICAS=["replica1"])
+    def test_router_reads_from_replicas_only_where_safe(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), "default")
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), "replica1")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Product), "default")
+            self.assertEqual(router.db_for_write(Product), "default")
+            self.assertEqual(router.db_for_read(Product), "default")
+        self.assertFalse(router.allow_migrate("replica1", "products"))
+
+    # Reads are routed to "default" under a replica name, so the queries run.
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_clients_that_wrote_are_pinned_to_the_primary(self):
+        category = Category.objects.create(name="Hops", slug="hops")
+        product = Product.objects.create(
+            name="Citra", slug="citra", category=category, price=10, stock=10
+        )
+        with mock.patch("config.routers.random.choice", wraps=random.choice) as pick:
+            self.client.get(reverse("products:product-list"))
+            self.assertTrue(pick.called)
+
+            pick.reset_mock()
+            response = self.client.post(
+                reverse("orders:cart-add", args=[product.pk]), {"quantity": 1}
+            )
+            self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+            self.assertFalse(pick.called)
+
+            self.client.get(reverse("api:product-list"))
+            self.assertFalse(pick.called)
+
+            self.client.cookies.pop(PIN_COOKIE)
+            self.client.get(reverse("api:product-list"))
+            self.assertTrue(pick.called)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_seed_then_benchmark_to_json(self):
+        counts = seed_catalog(
+            categories=12, products=60, users=5, reviews=20, orders=30, seed=1
+        )
+        self.assertEqual(
+            counts,
+            {
+                "categories": 12,
+                "products": 60,
+                "users": 5,
+                "reviews": 106,
+                "orders": 30,
+            },
+        )
+        top = Product.objects.order_by("-rating_count").first()
+        self.assertEqual(top.rating_count, 20)
+        self.assertEqual(Product.objects.filter(rating_count=0).count(), 18)
+        self.assertFalse(
+            Category.objects.filter(parent__parent__parent__isnull=False).exists()
+        )
+
+        output = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+        self.addCleanup(os.remove, output)
+        call_command(
+            "run_benchmarks",
+            only="detail/",
+            repeat=2,
+            output=output,
+            stdout=StringIO(),
+        )
+        with open(output) as stream:
+            report = json.load(stream)
+        self.assertEqual(report["meta"]["counts"]["products"], 60)
+        self.assertEqual(
+            [(row["scenario"], row["status"]) for row in report["results"]],
+            [("detail/popular", 200), ("detail/unreviewed", 200)],
+        )
+
+        out = StringIO()
+        call_command(
+            "run_benchmarks",
+            only="detail/popular",
+            repeat=2,
+            compare=output,
+            stdout=out,
+        )
+        self.assertIn("Compared with", out.getvalue())
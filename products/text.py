@@ -0,0 +1,18 @@
+SHORT_DESCRIPTION_LENGTH = 30
+ELLIPSIS = "..."
+
+
+def shorten_description(text, max_length=SHORT_DESCRIPTION_LENGTH):
+    """
+    Return the blurb shown for `text` on a product card.
+
+    That is the first sentence when it fits in `max_length` characters,
+    otherwise the first `max_length` characters followed by `ELLIPSIS`.
+    """
+    text = (text or "").strip()
+    first_period = text.find(".")
+    if first_period != -1 and first_period < max_length:
+        return text[: first_period + 1]
+    if len(text) > max_length:
+        return text[:max_length].rstrip() + ELLIPSIS
+    return text
@@ -0,0 +1,239 @@
+import csv
+import gzip
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.utils.text import slugify
+
+from products.caching import bump_catalog_version
+from products.categories import invalidate_category_tree
+from products.models import Category, Product
+from products.slugs import allocate_slugs
+
+COLUMNS = (
+    "slug",
+    "name",
+    "category",
+    "description",
+    "price",
+    "currency",
+    "stock",
+    "unit_measure",
+    "available",
+)
+# `values_list()` paths of `COLUMNS`, in the same order.
+EXPORT_PATHS = tuple("category__slug" if c == "category" else c for c in COLUMNS)
+UPDATE_FIELDS = (
+    "name",
+    "category",
+    "description",
+    "price",
+    "currency",
+    "stock",
+    "unit_measure",
+    "available",
+    "updated_at",
+)
+FORMATS = ("csv", "jsonl")
+MAX_PRICE = Decimal("1e8")
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+
+
+class RowError(ValueError):
+    """Raised for an import row that can't be turned into a product."""
+
+
+def detect_format(path, fmt=None):
+    """Return `fmt`, or guess it from the file extension (`.gz` ignored)."""
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def open_text(path, mode):
+    """Open `path` as UTF-8 text, decompressing or compressing `.gz` files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def read_rows(stream, fmt):
+    """Yield `(line_number, row)` pairs from a CSV or JSON Lines stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, RowError(f"invalid JSON: {exc.msg}")
+            continue
+        yield line_number, row
+
+
+def write_rows(stream, fmt, rows):
+    """Write `COLUMNS`-ordered tuples as CSV (with a header) or JSON Lines."""
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+        return
+    for row in rows:
+        record = dict(zip(COLUMNS, row))
+        record["price"] = str(record["price"])
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def export_rows(queryset=None, chunk_size=5000):
+    """
+    Stream products as `COLUMNS`-ordered tuples.
+
+    Rows come from a server-side cursor where the database has one, with
+    the category slug joined in, so memory stays flat for any table size.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    return (
+        queryset.order_by("pk")
+        .values_list(*EXPORT_PATHS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class ProductImporter:
+    """
+    Upserts products from a stream of row dicts in fixed-size batches.
+
+    Categories are resolved by slug from a map loaded once up front. Rows
+    with a `slug` update the product with that slug or create it; rows
+    without one create new products with slugs allocated per batch by
+    `allocate_slugs`. Each batch is one `bulk_create(update_conflicts=True)`,
+    and rating aggregates and `created_at` of existing products are left
+    untouched.
+
+    :ivar batch_size: Rows written per `INSERT ... ON CONFLICT` statement.
+    :type batch_size: int
+    :ivar create_categories: Create unknown category slugs instead of
+        rejecting their rows.
+    :type create_categories: bool
+    :ivar errors: `(line_number, message)` of the first rejected rows.
+    :type errors: list[tuple[int, str]]
+    """
+
+    max_reported_errors = 50
+
+    def __init__(self, batch_size=2000, create_categories=False):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.categories = dict(Category.objects.values_list("slug", "id"))
+        self.errors = []
+        self.rows = self.upserted = self.skipped = 0
+
+    def run(self, rows, progress=None, progress_every=50000):
+        """
+        Import `(line_number, row)` pairs as produced by `read_rows`.
+
+        :param progress: Called as `progress(rows, rows_per_second)` every
+            `progress_every` rows.
+        :return: Counts of `rows` read, `upserted` and `skipped`, plus the
+            overall `rate` in rows per second.
+        :rtype: dict
+        """
+        started = time.perf_counter()
+        batch = []
+        for line_number, row in rows:
+            self.rows += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                batch.append(self.build(row))
+            except RowError as exc:
+                self.reject(line_number, str(exc))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+            if progress and self.rows % progress_every == 0:
+                progress(self.rows, self.rows / (time.perf_counter() - started))
+        self.flush(batch)
+        if self.upserted:
+            invalidate_category_tree()
+            bump_catalog_version()
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "skipped": self.skipped,
+            "rate": round(self.rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def reject(self, line_number, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append((line_number, message))
+
+    def build(self, row):
+        if not isinstance(row, dict):
+            raise RowError("expected an object")
+        name = (row.get("name") or "").strip()
+        if not name:
+            raise RowError("name is required")
+        try:
+            price = Decimal(str(row.get("price", "")).strip())
+            stock = int(str(row.get("stock", "")).strip() or 0)
+        except (InvalidOperation, ValueError):
+            raise RowError("price and stock must be numbers")
+        if stock < 0 or not price.is_finite() or not 0 <= price < MAX_PRICE:
+            raise RowError("price or stock out of range")
+        available = row.get("available", True)
+        if not isinstance(available, bool):
+            flag = str(available).strip().lower() or "true"
+            if flag not in TRUE_VALUES | FALSE_VALUES:
+                raise RowError(f"invalid available flag {available!r}")
+            available = flag in TRUE_VALUES
+        return Product(
+            slug=slugify((row.get("slug") or "").strip()),
+            name=name[:100],
+            category_id=self.category_id((row.get("category") or "").strip()),
+            description=row.get("description") or "",
+            price=price.quantize(Decimal("0.01")),
+            currency=(row.get("currency") or "USD").strip()[:3],
+            stock=stock,
+            unit_measure=(row.get("unit_measure") or "kg").strip()[:5],
+            available=available,
+        )
+
+    def category_id(self, slug):
+        if slug in self.categories:
+            return self.categories[slug]
+        if not slug or not self.create_categories:
+            raise RowError(f"unknown category {slug!r}")
+        category = Category.objects.create(
+            name=slug.replace("-", " ").title(), slug=slug
+        )
+        self.categories[slug] = category.pk
+        return category.pk
+
+    def flush(self, batch):
+        if not batch:
+            return
+        unnamed = [product for product in batch if not product.slug]
+        explicit = {product.slug for product in batch if product.slug}
+        slugs = allocate_slugs(Product, [p.name for p in unnamed], reserved=explicit)
+        for product, slug in zip(unnamed, slugs):
+            product.slug = slug
+        # A statement can't upsert the same key twice; the last row wins.
+        unique = list({product.slug: product for product in batch}.values())
+        Product.objects.bulk_create(
+            unique,
+            update_conflicts=True,
+            unique_fields=["slug"],
+            update_fields=UPDATE_FIELDS,
+        )
+        self.upserted += len(unique)
+        self.skipped += len(batch) - len(unique)
+        batch.clear()
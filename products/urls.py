@@ -1,6 +1,11 @@
 from django.urls import path
 
-from .views import ProductDetailView, ProductListView, GuidesRecipesView
+from .views import (
+    ProductDetailView,
+    ProductListView,
+    GuidesRecipesView,
+    ProductReviewListView,
+)
 
 app_name = "products"
 
@@ -8,4 +13,9 @@ urlpatterns = [
     path("home/", ProductListView.as_view(), name="product-list"),
     path("guides/", GuidesRecipesView.as_view(), name="guides-recipes"),
     path("<slug:slug>/", ProductDetailView.as_view(), name="product-detail"),
+    path(
+        "<slug:slug>/reviews/",
+        ProductReviewListView.as_view(),
+        name="product-reviews",
+    ),
 ]
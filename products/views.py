@@ -1,29 +1,93 @@
 from tokenize import endpats
 from unicodedata import category
 
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import models
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponsePermanentRedirect,
+    QueryDict,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.views import View
 from django.views.generic import DetailView, ListView, TemplateView
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-from config.settings import PRODUCTS_QUERY_MAP
-from products.models import Product, ProductReview, Category
-from django.db import models
+from config.routers import ReplicaReadMixin
+from config.settings import (
+    BASE_CURRENCY,
+    PRODUCT_RECENT_REVIEWS,
+    PRODUCT_REVIEWS_PER_PAGE,
+    PRODUCTS_APPROXIMATE_COUNT_THRESHOLD,
+    PRODUCTS_CURSOR_PAGINATION,
+)
+from products.caching import AnonymousPageCacheMixin
+from products.catalog import catalog_sort, filter_catalog, order_catalog
+from products.categories import get_category_tree
+from products.currency import get_exchange_rates
+from products.facets import cached_facets, get_facets
+from products.feeds import (
+    category_sitemap,
+    category_summary,
+    merchant_feed,
+    product_sections,
+    product_sitemap,
+    sitemap_index,
+)
+from products.models import Category, Product, ProductReview
+from products.pagination import (
+    CountedPaginator,
+    CursorPaginator,
+    InvalidCursor,
+    estimate_count,
+)
+from products.slugs import resolve_slug_redirect
+
+
+class ProductSlugRedirectMixin:
+    """
+    Permanently redirects a product page requested by a slug the product
+    used to have to the same page under its current slug.
+
+    Only requests that would otherwise 404 look the slug up, and the
+    lookup is cached, so live pages pay nothing for it.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except Http404:
+            slug = resolve_slug_redirect(Product, kwargs["slug"])
+            if slug is None:
+                raise
+        url = reverse(request.resolver_match.view_name, kwargs={**kwargs, "slug": slug})
+        if request.META.get("QUERY_STRING"):
+            url = f"{url}?{request.META['QUERY_STRING']}"
+        return HttpResponsePermanentRedirect(url)
 
 
-class ProductDetailView(DetailView):
+class ProductDetailView(
+    ReplicaReadMixin, AnonymousPageCacheMixin, ProductSlugRedirectMixin, DetailView
+):
     """
     Handles the display of detailed information for a specific product.
 
     This view is responsible for rendering the details of a single
     `Product` instance. It uses the specified queryset to optimize
     database access by selecting related data for the `category` field
-    and prefetching recent `reviews` for the product. The template
-    used for rendering is defined in the `template_name` attribute.
+    and prefetching only the latest `PRODUCT_RECENT_REVIEWS` reviews, with
+    their authors, in a single windowed query. The template used for
+    rendering is defined in the `template_name` attribute.
 
     :ivar model: The model associated with this DetailView.
     :type model: Product
     :ivar queryset: Queryset to fetch the product instance along with
-         a related category and prefetch recent reviews.
+         a related category and prefetch the latest reviews.
     :type queryset: QuerySet
     :ivar template_name: Path to the template used for rendering the
         product details.
@@ -37,7 +101,9 @@ class ProductDetailView(DetailView):
         .prefetch_related(
             models.Prefetch(
                 "reviews",
-                queryset=ProductReview.objects.order_by("-created_at"),
+                queryset=ProductReview.objects.select_related("user").order_by(
+                    "-created_at", "-id"
+                )[:PRODUCT_RECENT_REVIEWS],
                 to_attr="recent_reviews",
             )
         )
@@ -46,45 +112,162 @@ class ProductDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["reviews"] = self.object.recent_reviews[:3]
+        context["reviews"] = self.object.recent_reviews
         return context
 
 
-class ProductListView(ListView):
+class ProductReviewListView(
+    AnonymousPageCacheMixin, ProductSlugRedirectMixin, ListView
+):
+    """
+    Paginated list of every review of a product, newest first.
+
+    :ivar paginate_by: Number of reviews per page.
+    :type paginate_by: int
+    """
+
+    template_name = "products/product_reviews.html"
+    context_object_name = "reviews"
+    paginate_by = PRODUCT_REVIEWS_PER_PAGE
+    page_cache_params = ("page",)
+
+    def get_queryset(self):
+        self.product = get_object_or_404(
+            Product.objects.only("id", "name", "slug"), slug=self.kwargs["slug"]
+        )
+        return (
+            ProductReview.objects.filter(product=self.product)
+            .select_related("user")
+            .order_by("-created_at", "-id")
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["product"] = self.product
+        return context
+
+
+class ProductListView(ReplicaReadMixin, AnonymousPageCacheMixin, ListView):
     model = Product
     template_name = "products/home.html"
     paginate_by = 2
     allow_empty = True
+    paginator_class = CountedPaginator
+    cursor_kwarg = "cursor"
+    count_estimate = None
+    page_cache_params = (
+        "categories",
+        "q",
+        "sort",
+        "page",
+        "cursor",
+        "count",
+        "subcategories",
+        "min_price",
+        "max_price",
+        "currency",
+    )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = Category.objects.all()
+        context["categories"] = list(get_category_tree())
+        facets = self.facets
+        context["category_counts"] = [
+            (node, facets.category_total(node) if facets else node.total_count)
+            for node in context["categories"]
+        ]
+        context["price_buckets"] = facets.price_buckets if facets else []
+        context["unit_counts"] = sorted(facets.unit_counts.items()) if facets else []
+        context["currency_counts"] = (
+            sorted(facets.currency_counts.items()) if facets else []
+        )
+        # Pagination links keep every filter but the page and cursor; only
+        # `page_cache_params`, so a cached page never echoes other parameters.
+        context["page_query"] = page_query = QueryDict(mutable=True)
+        for name in self.page_cache_params:
+            if name in self.request.GET and name not in (
+                self.page_kwarg,
+                self.cursor_kwarg,
+            ):
+                page_query.setlist(name, self.request.GET.getlist(name))
+        context["base_currency"] = BASE_CURRENCY
+        context["display_currency"] = self.display_currency()
+        if context["display_currency"]:
+            rates = get_exchange_rates()
+            context["display_rate"] = rates.rate(context["display_currency"])
         return context
 
-    def get_queryset(self):
-        qs = (
-            Product.objects.filter(available=True)
-            .select_related("category")
-            .annotate(rating=models.Avg("reviews__rating"))
+    def display_currency(self):
+        """The known currency `?currency=` asks prices to be shown in."""
+        currency = self.request.GET.get("currency", "").upper()
+        return currency if currency and currency in get_exchange_rates() else None
+
+    @cached_property
+    def facets(self):
+        """
+        Catalog counts of the requested filters, see `get_facets`.
+
+        `None` while counts missing from the cache are computed in the
+        background, which only happens for filters estimated to match more
+        than `PRODUCTS_APPROXIMATE_COUNT_THRESHOLD` products. Cursor pages
+        never count on the request path and only use cached counts.
+        """
+        if self.uses_cursor_pagination():
+            return cached_facets(self.request.GET)
+        return get_facets(self.request.GET, wait=self.count_is_cheap)
+
+    def count_is_cheap(self):
+        self.count_estimate = estimate_count(self.get_queryset(), exact=False)
+        return (
+            self.count_estimate is None
+            or self.count_estimate <= PRODUCTS_APPROXIMATE_COUNT_THRESHOLD
         )
-        # filter by category
-        categories = self.request.GET.get("categories", None)
-        if categories:
-            qs = qs.filter(category__slug__in=categories.split(","))
 
-        # search
-        to_search = self.request.GET.get("q", None)
-        if to_search:
-            qs = qs.filter(Q(name__icontains=to_search))
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """Paginate with the cached count, or the estimate while it's missing."""
+        if self.facets is not None:
+            count, approximate = self.facets.total, False
+        else:
+            count, approximate = self.count_estimate, True
+        return self.paginator_class(
+            queryset, per_page, count=count, approximate=approximate, **kwargs
+        )
 
-        # sort
-        qs_key = self.request.GET.get("sort", "new")
-        qs = qs.order_by(PRODUCTS_QUERY_MAP[qs_key])
+    def get_queryset(self):
+        qs = filter_catalog(Product.objects.filter(available=True), self.request.GET)
+        return order_catalog(qs.cards(), self.get_sort())
 
-        return qs
+    def get_sort(self):
+        """Return the requested ordering, or `None` for search relevance."""
+        return catalog_sort(self.request.GET)
+
+    def uses_cursor_pagination(self):
+        """
+        Whether to paginate with cursors instead of page numbers.
+
+        Cursor mode is opt-in through `?cursor=` or
+        `PRODUCTS_CURSOR_PAGINATION`. Relevance-ranked search results keep
+        page numbers since the rank is not a stored column.
+        """
+        requested = self.cursor_kwarg in self.request.GET or PRODUCTS_CURSOR_PAGINATION
+        return requested and self.get_sort() is not None
+
+    def paginate_by_cursor(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, self.get_sort(), page_size)
+        with_total = bool(self.request.GET.get("count", None))
+        try:
+            page = paginator.page(
+                self.request.GET.get(self.cursor_kwarg, None), with_total=with_total
+            )
+        except InvalidCursor:
+            page = paginator.page(None, with_total=with_total)
+        return (paginator, page, page.object_list, page.has_other_pages())
 
     def paginate_queryset(self, queryset, page_size):
         """Override to handle pagination errors gracefully"""
+        if self.uses_cursor_pagination():
+            return self.paginate_by_cursor(queryset, page_size)
+
         paginator = self.get_paginator(
             queryset,
             page_size,
@@ -113,5 +296,67 @@ class ProductListView(ListView):
             return (paginator, page, page.object_list, page.has_other_pages())
 
 
-class GuidesRecipesView(TemplateView):
+class GuidesRecipesView(AnonymousPageCacheMixin, TemplateView):
     template_name = "guides-recipes.html"
+
+
+class SitemapIndexView(AnonymousPageCacheMixin, View):
+    """
+    Sitemap index listing the category sitemap and every product section.
+
+    Built from one grouped query and cached with the storefront pages
+    until the catalog changes.
+    """
+
+    def get(self, request):
+        base_url = request.build_absolute_uri("/").rstrip("/")
+        xml = sitemap_index(base_url, product_sections(), category_summary()["lastmod"])
+        return HttpResponse(xml, content_type="application/xml")
+
+
+async def iterate_in_thread(iterable):
+    """
+    Iterate a synchronous iterable from async code.
+
+    Each step runs in the request's thread-sensitive executor, so database
+    cursors are always used from the thread that opened them.
+    """
+    iterator = iter(iterable)
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (item := await step(iterator, done)) is not done:
+        yield item
+
+
+class FeedStreamView(View):
+    """
+    Streams an XML document produced by `generate(base_url, **kwargs)`.
+
+    Rows are rendered as they come off the database cursor, so neither
+    the catalog nor the document is ever held in memory. Under ASGI the
+    generator is wrapped in an async iterator; Django would otherwise
+    buffer a synchronous one whole before sending it.
+    """
+
+    generate = None
+    content_type = "application/xml"
+
+    def get(self, request, **kwargs):
+        base_url = request.build_absolute_uri("/").rstrip("/")
+        content = type(self).generate(base_url, **kwargs)
+        if isinstance(request, ASGIRequest):
+            content = iterate_in_thread(content)
+        return StreamingHttpResponse(content, content_type=self.content_type)
+
+
+class CategorySitemapView(FeedStreamView):
+    generate = category_sitemap
+
+
+class ProductSitemapView(FeedStreamView):
+    generate = product_sitemap
+
+
+class MerchantFeedView(FeedStreamView):
+    generate = merchant_feed
+    content_type = "application/rss+xml"
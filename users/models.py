@@ -13,6 +13,7 @@ class User(AbstractUser):
         blank=True,
         default="profile_images/Default.png",
     )
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     phone = models.CharField(max_length=15, null=True, blank=True)
 